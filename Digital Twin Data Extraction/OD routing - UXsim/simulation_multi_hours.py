@@ -5,6 +5,8 @@ from datetime import datetime
 import time
 
 import uxsimulator.sim
+import uxsimulator.observers
+import uxsimulator.retention
 
 
 # Bool, wether to print updated status or not
@@ -23,6 +25,10 @@ list_seeds = [i for i in range(total_seeds)]
 # Demand threshold and size of the platoons
 demand_threshold = 10
 
+# Finished vehicles are released every 5 simulated minutes; above this resident memory (MB) a garbage
+# collection is also forced after each release (it is not a hard limit)
+max_memory_mb = 8*1024
+
 # Weights to distribute the daily demand between hours depending on the inflow
 list_inflow_weights = [0.01144457, 0.00486095, 0.00243493, 0.00260924, 0.00457556,
        0.01202913, 0.03529495, 0.06563432, 0.07102766, 0.05941337,
@@ -73,19 +79,27 @@ for i_seed in list_seeds:
         verbose=verbose
     )
 
+    retention_policy = uxsimulator.retention.RetentionPolicy(
+        namefile_output=f"{namefile_output_zones}_released_seed_{i_seed}",
+        max_memory_mb=max_memory_mb,
+        verbose=verbose
+    )
+    W = uxsimulator.observers.attach(W, retention_policy)
+
     W = uxsimulator.sim.execute(
         W=W,
         verbose=verbose, 
         duration=total_simulation_time
     )
 
-    uxsimulator.sim.print_analytics(W=W, verbose=verbose)
+    uxsimulator.sim.print_analytics(W=W, retention_policy=retention_policy, verbose=verbose)
 
     uxsimulator.sim.save(
         W=W, 
         name_iter=f"_seed_{i_seed}", 
         namefile_edges=namefile_output_edges,
         namefile_zones=namefile_output_zones,
+        retention_policy=retention_policy,
         verbose=verbose
     )
 
@@ -4,6 +4,7 @@ import sys
 sys.path.append(os.path.join(os.path.abspath("../.."), "functions"))
 
 import uxsimulator.sim
+import uxsimulator.observers
 
 # Bool, wether to print updated status or not
 verbose = True
@@ -44,6 +45,14 @@ namefile_to_in_demand = "results/flows_to_in_v7.csv"
 
 namefile_output_edges="results/UXsim_links/AreaVerde_links_single_hours"
 namefile_output_zones="results/UXsim_vehicles/AreaVerde_vehicles_ALL_single_hours"
+namefile_output_tables = {"IO": "AreaVerde_IO_single_hours", "S": "AreaVerde_S_single_hours", "T": "AreaVerde_T_single_hours"}
+
+# Partitioned dataset (run=/seed=/hour=) to save the links and vehicles to, instead of the flat files above (None to disable)
+dataset = None # e.g. "results/AreaVerde_dataset"
+run = "single_hours_v7"
+run_config = {"total_simulation_time": total_simulation_time, "vehicle_simulation_time": vehicle_simulation_time,
+              "demand_threshold": demand_threshold, "namefile_nodes": namefile_nodes, "namefile_edges": namefile_edges,
+              "namefile_demand": [namefile_in_demand, namefile_from_in_demand, namefile_to_in_demand]}
 
 # Main cycle of the simulation
 for i_seed in list_seeds:
@@ -73,6 +82,10 @@ for i_seed in list_seeds:
             verbose=verbose
         )
 
+        link_aggregator = uxsimulator.observers.LinkAggregator(W, slot_duration=60*5)
+        zone_aggregator = uxsimulator.observers.ZoneAggregator(W, namefile_nodes=namefile_nodes, namefile_edges=namefile_edges, first_hour=hour)
+        W = uxsimulator.observers.attach(W, link_aggregator, zone_aggregator)
+
         W = uxsimulator.sim.execute(
             W=W,
             duration=60*60,
@@ -81,13 +94,28 @@ for i_seed in list_seeds:
 
         uxsimulator.sim.print_analytics(W=W, verbose=verbose)
 
-        uxsimulator.sim.save(
-            W=W, 
-            name_iter=f"from_{hour}_to_{hour+1}_seed_{i_seed}", 
-            namefile_edges=namefile_output_edges,
-            namefile_zones=namefile_output_zones,
-            verbose=verbose
-        )
+        if dataset is not None:
+            uxsimulator.sim.save_to_dataset(
+                W=W,
+                dataset=dataset,
+                run=run,
+                seed=i_seed,
+                hour=hour,
+                config=run_config,
+                link_aggregator=link_aggregator,
+                verbose=verbose
+            )
+        else:
+            uxsimulator.sim.save(
+                W=W, 
+                name_iter=f"from_{hour}_to_{hour+1}_seed_{i_seed}", 
+                namefile_edges=namefile_output_edges,
+                namefile_zones=namefile_output_zones,
+                link_aggregator=link_aggregator,
+                verbose=verbose
+            )
+        for table_type, namefile_table in namefile_output_tables.items():
+            zone_aggregator.save(table_type=table_type, datapath="results", namefile_save=namefile_table, seed=i_seed)
 
         del W
         gc.collect()
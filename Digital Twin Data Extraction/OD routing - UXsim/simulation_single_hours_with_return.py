@@ -46,6 +46,7 @@ namefile_to_in_demand = "results/flows_to_in_v7.csv"
 
 namefile_output_edges=f"results/UXsim_links/AreaVerde_links_with_return_v5"
 namefile_output_zones=f"results/UXsim_vehicles/AreaVerde_vehicles_with_return_v5"
+namefile_output_snapshot=f"results/UXsim_snapshots/AreaVerde_snapshot_with_return_v5"
 
 # Main cycle of the simulation
 for i_seed in list_seeds:
@@ -71,10 +72,10 @@ for i_seed in list_seeds:
 
         if len(list_hours) > 1 and hour != list_hours[0]:
             name_prev_iter = f"from_23_to_24_seed_{i_seed}" if hour == 0 else f"from_{hour-1}_to_{hour}_seed_{i_seed}"
-            W = uxsimulator.sim.add_hourly_remaining_demand_to_scenario(
+            W = uxsimulator.sim.add_snapshot_demand_to_scenario(
                 W=W, 
                 name_iter=name_prev_iter, 
-                namefile_vehicles=namefile_output_zones,
+                namefile_snapshot=namefile_output_snapshot,
                 verbose=verbose
             )
 
@@ -104,6 +105,13 @@ for i_seed in list_seeds:
             verbose=verbose
         )
 
+        uxsimulator.sim.save_snapshot(
+            W=W,
+            name_iter=f"from_{hour}_to_{hour+1}_seed_{i_seed}",
+            namefile_snapshot=namefile_output_snapshot,
+            verbose=verbose
+        )
+
         del W
         gc.collect()
 
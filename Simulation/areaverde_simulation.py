@@ -1,4 +1,6 @@
+import hashlib
 import itertools
+import json
 import math
 import numbers
 import statistics
@@ -6,7 +8,7 @@ from typing import Any
 
 import numpy as np
 import pandas as pd
-from scipy import stats
+from scipy import interpolate, stats
 from matplotlib.colors import LinearSegmentedColormap
 from matplotlib.ticker import FuncFormatter
 import matplotlib.pyplot as plt
@@ -215,9 +217,12 @@ vehicle_starting = np.array(
      579.50875306, 556.3263212, 530.50311514, 501.61506706])
 
 # Load the inflow, starting and traffic for each zone # TODO: from data lake
-zone_io = pd.read_parquet('AreaVerde_IO_v13.parquet')
-# zone_starting = pd.read_parquet('AreaVerde_S_v13.parquet')
-zone_traffic = pd.read_parquet('AreaVerde_T_v13.parquet')
+# (the 5-minute series of zone_metrics.compute_slot_series if available, the hourly tables otherwise)
+namefile_zone_io = 'AreaVerde_IO_5min_v13.parquet' if os.path.exists('AreaVerde_IO_5min_v13.parquet') else 'AreaVerde_IO_v13.parquet'
+# namefile_zone_starting = 'AreaVerde_S_v13.parquet'
+namefile_zone_traffic = 'AreaVerde_T_5min_v13.parquet' if os.path.exists('AreaVerde_T_5min_v13.parquet') else 'AreaVerde_T_v13.parquet'
+# Directory of the per-zone model inputs, computed once per version of the input files
+ZONE_INPUTS_CACHE = 'model_inputs_cache'
 
 # Load the proportions of euro class
 euro_class_split = {
@@ -415,16 +420,52 @@ def ts_postpone(number_postponing, delta_to_end, p50_postponing):
     return number_postponed
 
 
-def upsample(values):
-    df = pd.DataFrame(values, columns=['values'])
-    df['n'] = df.index * 12 + 6
-    df = df.set_index('n').reindex(range(24 * 12))
-    df.loc[0, 'values'] = (values[0] + values[-1]) / 2
-    df.loc[24 * 12 - 1, 'values'] = df.loc[0, 'values']
+def upsample_batch(values):
+    # Cubic interpolation of each row of a (n, 24) matrix of hourly values to the 24 * 12 measures of the day:
+    # the hourly values are placed in the middle of their hour, and the first and last measures of the day
+    # get the average of the first and last hour
+    values = np.asarray(values, dtype=float)
+    edge = (values[:, :1] + values[:, -1:]) / 2
+    knots = np.concatenate(([0], np.arange(24) * 12 + 6, [24 * 12 - 1]))
+    upsampled = interpolate.interp1d(knots, np.concatenate([edge, values, edge], axis=1), kind='cubic', axis=1)(np.arange(24 * 12))
     # TODO: min 0
-    df = df.interpolate(method='cubic')
-    df[df['values'] < 0] = 0
-    return df['values'].values
+    upsampled[upsampled < 0] = 0
+    return upsampled
+
+
+def upsample(values):
+    return upsample_batch(np.asarray(values)[np.newaxis])[0]
+
+
+def zone_matrix(df, column):
+    # (zones, 24 * 12) matrix of a per-zone column: 5-minute series are used as they are, hourly values are split
+    # between the measures of the hour and upsampled (missing zones and hours are 0)
+    if 'slot' in df.columns:
+        return df.pivot(index='id_zone', columns='slot', values=column).reindex(index=zones, columns=range(24 * P_RECORD_FREQUENCY)).fillna(0).to_numpy()
+    hourly = df.pivot(index='id_zone', columns='hour', values=column).reindex(index=zones, columns=range(24)).fillna(0).to_numpy()
+    return upsample_batch(hourly / P_RECORD_FREQUENCY)
+
+
+def load_zone_inputs(namefile_io, namefile_traffic, cache_dir=ZONE_INPUTS_CACHE):
+    # Per-zone inflow and traffic series of the model, in the order of `zones`; they are saved in `cache_dir`,
+    # keyed on the hash of the input files, so that they are computed only once per version of the inputs
+    key = hashlib.sha256(json.dumps({'zones': zones, 'frequency': P_RECORD_FREQUENCY, 'version': 1}).encode())
+    for namefile in (namefile_io, namefile_traffic):
+        with open(namefile, 'rb') as f:
+            key.update(f.read())
+    namefile_cache = f"{cache_dir}/zone_inputs_{key.hexdigest()[:16]}.npz"
+    if os.path.exists(namefile_cache):
+        with np.load(namefile_cache) as cache:
+            return {name: cache[name] for name in cache.files}
+
+    zone_io = pd.read_parquet(namefile_io)
+    zone_traffic = pd.read_parquet(namefile_traffic)
+    inputs = {'inflow_from_inside': zone_matrix(zone_io, 'inflow_from_INSIDE_mean'),
+              'inflow_from_outside': zone_matrix(zone_io, 'inflow_from_OUTSIDE_mean'),
+              'traffic': zone_matrix(zone_traffic, 'traffic_in_zone_mean')}
+    os.makedirs(cache_dir, exist_ok=True)
+    np.savez(namefile_cache, **inputs)
+    return inputs
 
 
 ### Model definition ###
@@ -479,17 +520,14 @@ class Model:
         self.TS_inflow_zone = {}
         self.TS_traffic_zone = {}
 
-        for zone in zones:
-            zone_inside_inflow_values = zone_io[zone_io['id_zone'] == zone]['inflow_from_INSIDE_mean'].values / 12
-            zone_outside_inflow_values = zone_io[zone_io['id_zone'] == zone]['inflow_from_OUTSIDE_mean'].values / 12
-            zone_traffic_values = zone_traffic[zone_traffic['id_zone'] == zone]['traffic_in_zone_mean'].values / 12
-
-            self.TS_inflow_zone_from_inside[zone] = Index(f'zone {zone} inflow from inside', upsample(zone_inside_inflow_values))
-            self.TS_inflow_zone_from_outside[zone] = Index(f'zone {zone} inflow from outside', upsample(zone_outside_inflow_values))
+        zone_inputs = load_zone_inputs(namefile_zone_io, namefile_zone_traffic)
+        for i, zone in enumerate(zones):
+            self.TS_inflow_zone_from_inside[zone] = Index(f'zone {zone} inflow from inside', zone_inputs['inflow_from_inside'][i])
+            self.TS_inflow_zone_from_outside[zone] = Index(f'zone {zone} inflow from outside', zone_inputs['inflow_from_outside'][i])
             self.TS_inflow_zone[zone] = Index(f'zone {zone}  inflow', self.TS_inflow_zone_from_inside[zone] +
                                          self.TS_inflow_zone_from_outside[zone],
                                          [self.TS_inflow_zone_from_inside[zone], self.TS_inflow_zone_from_outside[zone]])
-            self.TS_traffic_zone[zone] = Index(f'zone {zone}  traffic', upsample(zone_traffic_values))
+            self.TS_traffic_zone[zone] = Index(f'zone {zone}  traffic', zone_inputs['traffic'][i])
 
         # Indices - current state
         self.I_traffic = TS_Index('reference traffic',
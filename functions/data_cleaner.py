@@ -1,5 +1,6 @@
 import pandas as pd
 import geopandas as gpd
+import shapely
 
 
 def OD_flows(
@@ -42,21 +43,13 @@ def AOI_OD_shapes(
     Returns:
         `gpd.GeoDataFrame`: Processed DataFrame with updated shape information.
     """
-    dictionary = dict()
-    df_shapes = df_shapes.set_index('id')
+    df_shapes = df_shapes.set_index('id').reset_index()
 
-    for this_id in df_shapes.index:
-        new_1zone = df_shapes[df_shapes.index==this_id]
-
-        inters = df_shapes.apply(lambda x: new_1zone.geometry.iloc[0].contains(x.geometry), axis=1).reset_index(name='overlap')
-        idz_overlaps = inters.loc[inters['overlap'], 'id']
-        idz_overlaps = idz_overlaps[idz_overlaps!=this_id]
-        
-        if len(idz_overlaps)>0:
-            dictionary[this_id] = idz_overlaps.tolist()
-
-    idx_remove = [i for c in [val for val in dictionary.values()] for i in c]
-    df_shapes = df_shapes.reset_index()
+    # All the (zone, other zone it contains) pairs, with a single query on a spatial index of the zones
+    geometries = df_shapes.geometry.values
+    idx_zone, idx_contained = shapely.STRtree(geometries).query(geometries, predicate='contains')
+    ids = df_shapes['id'].to_numpy()
+    idx_remove = ids[idx_contained][ids[idx_contained] != ids[idx_zone]]
 
     return df_shapes[~df_shapes['id'].isin(idx_remove)]
 
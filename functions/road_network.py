@@ -4,9 +4,14 @@ import osmnx as ox
 import numpy as np
 from shapely.geometry import Point, LineString
 from constants import CRS_LATLONG, CRS_PROJECTED
-from warnings import catch_warnings, simplefilter
 import networkx as nx
-import ast
+import hashlib
+import json
+import os
+import re
+import shapely
+from scipy import sparse
+from scipy.sparse import csgraph
 
 
 def create_road_data(
@@ -16,9 +21,11 @@ def create_road_data(
     edges_namefile: str = None, 
     nodes_namefile: str = None, 
     datapath: str = None,
+    cachepath: str|None = None,
 ):
     """
     Extracts and preprocesses road data using OSMNX. Optionally filters the largest connected component and saves the data.
+    With `cachepath`, the OSM extract is read from (or saved to) a local GraphML snapshot, see `_extract_osmnx_data`.
 
     Args:
         `df_BAV` (`gpd.GeoDataFrame`): GeoDataFrame representing the area of interest.
@@ -27,12 +34,13 @@ def create_road_data(
         `edges_namefile` (`str`, optional): Name of the file to save edges data. Defaults to `None`.
         `nodes_namefile` (`str`, optional): Name of the file to save nodes data. Defaults to `None`.
         `datapath` (`str`, optional): Directory path to save the files. Defaults to `None`.
+        `cachepath` (`str`, optional): Directory of the OSM extract snapshots. Defaults to `None` (no snapshot).
 
     Returns:
         `tuple`: Two GeoDataFrames, one for edges and one for nodes.
     """
     # Extract from OSMNX and preprocess the data
-    edges, nodes = get_osmxn_data(df_bav=df_BAV, relevant_highway=relevant_highway)
+    edges, nodes = get_osmxn_data(df_bav=df_BAV, relevant_highway=relevant_highway, cachepath=cachepath)
 
     # Fix the network manually
     if relevant_highway:
@@ -72,6 +80,7 @@ def save_road_data(
 def get_osmxn_data(
     df_bav: gpd.GeoDataFrame,
     relevant_highway: bool,
+    cachepath: str|None = None,
 ) -> tuple:
     """
     Extracts road data using OSMNX and then preprocesses the nodes and edges.
@@ -79,12 +88,13 @@ def get_osmxn_data(
     Args:
         `df_bav` (`gpd.GeoDataFrame`): GeoDataFrame representing the area of interest.
         `relevant_highway` (`bool`): Whether to filter for relevant highway types.
+        `cachepath` (`str`, optional): Directory of the OSM extract snapshots. Defaults to `None` (no snapshot).
 
     Returns:
         `tuple`: Two GeoDataFrames, one for edges and one for nodes.
     """
 
-    edges, nodes = _extract_osmnx_data(df_bav=df_bav, relevant_highway=relevant_highway)
+    edges, nodes = _extract_osmnx_data(df_bav=df_bav, relevant_highway=relevant_highway, cachepath=cachepath)
 
     nodes = _fix_osmnx_nodes(nodes)
     edges = _fix_osmnx_edges(edges)
@@ -95,13 +105,18 @@ def get_osmxn_data(
 def _extract_osmnx_data(
     df_bav: gpd.GeoDataFrame,
     relevant_highway: bool,
+    cachepath: str|None = None,
 ) -> tuple:
     """
     Extracts road network data from OSMNX using a custom filter.
+    With `cachepath`, the extract is saved as a GraphML snapshot keyed by the hash of the polygon and of the query,
+    and later extracts of the same polygon are loaded from it without network access. Only new or edited polygons
+    are downloaded.
 
     Args:
         `df_bav` (`gpd.GeoDataFrame`): GeoDataFrame representing the area of interest.
         `relevant_highway` (`bool`): Whether to filter for relevant highway types.
+        `cachepath` (`str`, optional): Directory of the GraphML snapshots. Defaults to `None` (no snapshot).
 
     Returns:
         `tuple`: Two GeoDataFrames, one for edges and one for nodes.
@@ -114,16 +129,34 @@ def _extract_osmnx_data(
     else:
         custom_filter=None
 
-    G = ox.graph_from_polygon(
-            polygon=df_bav.to_crs(CRS_LATLONG).geometry.iloc[0],
-            network_type='drive',
-            simplify=True, 
-            custom_filter=custom_filter
-        )
+    polygon = df_bav.to_crs(CRS_LATLONG).geometry.iloc[0]
+    query = {'network_type': 'drive', 'simplify': True, 'custom_filter': custom_filter}
+    namefile = f"{cachepath}/osm_{_extract_hash(polygon, query)}.graphml" if cachepath is not None else None
+
+    if namefile is not None and os.path.exists(namefile):
+        G = ox.load_graphml(namefile)
+    else:
+        G = ox.graph_from_polygon(polygon=polygon, **query)
+        if namefile is not None:
+            os.makedirs(cachepath, exist_ok=True)
+            ox.save_graphml(G, filepath=f"{namefile}.tmp")
+            os.replace(f"{namefile}.tmp", namefile)
     nodes, edges = ox.graph_to_gdfs(G)
     return edges, nodes
 
 
+def _extract_hash(
+    polygon,
+    query: dict
+) -> str:
+    """
+    Returns the hash of an OSM extract: the polygon (as WKB, in `CRS_LATLONG`) and the parameters of the query.
+    """
+    h = hashlib.sha256(shapely.to_wkb(polygon, hex=False, output_dimension=2))
+    h.update(json.dumps(query, sort_keys=True).encode())
+    return h.hexdigest()[:16]
+
+
 def _fix_osmnx_nodes(
     ox_nodes: gpd.GeoDataFrame,
 ) -> gpd.GeoDataFrame:
@@ -169,7 +202,7 @@ def _fix_osmnx_edges(
         .query('u != v')
     )
     
-    ox_edges['highway'] = ox_edges['highway'].astype(str).apply(lambda x: _process_columns(x, expected_type="str"))
+    ox_edges['highway'] = _first_tag(ox_edges['highway'])
     ox_edges['highway_ok'] = _check_highway_ok(ox_edges['highway'])
     ox_edges['maxspeed_imputed'] = _impute_missing_maxspeed(ox_edges) / 3.6 #moving to m/s
     ox_edges['lanes_imputed'] = _impute_missing_lane(ox_edges)
@@ -193,12 +226,8 @@ def _impute_missing_maxspeed(
     Returns:
         `pd.Series`: Series of imputed maxspeed values.
     """
-    df['maxspeed'] = df['maxspeed'].astype(str).apply(_process_columns, expected_type="int")
-    mean_maxspeed_by_highway = df.groupby('highway')['maxspeed'].transform('mean')
-    values_imp = df['maxspeed'].fillna(mean_maxspeed_by_highway, inplace=False)
-    values_imp = values_imp.fillna(na_fill)
-
-    return values_imp
+    df['maxspeed'] = _parse_numeric(df['maxspeed'])
+    return _impute_by_group(df['maxspeed'], groups=df['highway'], how='mean').fillna(na_fill)
 
 
 def _impute_missing_lane(
@@ -213,25 +242,12 @@ def _impute_missing_lane(
     Returns:
         `np.array`: Array of imputed lane values.
     """
-    df['lanes'] = df['lanes'].astype(str).apply(_process_columns, expected_type="int")
-    missing_lanes_mask = df['lanes'].isna()
-
-    with catch_warnings():
-        simplefilter("ignore", category=RuntimeWarning)
-        grouped = df.groupby(['oneway', 'highway'])['lanes']
-        group_medians = grouped.median()
-        group_medians = group_medians.reindex(pd.MultiIndex.from_product([df['oneway'].unique(), df['highway'].unique()]), fill_value=np.nan)
-        group_medians = group_medians.to_dict()
-
-    group_medians_series = pd.Series(group_medians)
+    df['lanes'] = _parse_numeric(df['lanes'])
+    lanes_imputed = _impute_by_group(df['lanes'], groups=[df['oneway'], df['highway']], how='median')
+    # Groups without any lane value: 1 lane for oneway roads, 2 otherwise
+    lanes_imputed = lanes_imputed.fillna(pd.Series(np.where(df['oneway'].to_numpy(), 1.0, 2.0), index=df.index))
 
-    lanes_imputed = df['lanes'].values
-    lanes_imputed[missing_lanes_mask] = df[missing_lanes_mask].apply(
-        lambda row: group_medians_series.get((row['oneway'], row['highway']), 1.0 if row['oneway'] else 2.0), axis=1
-    )
-    lanes_imputed[np.isnan(lanes_imputed)] = np.where(df['oneway'].values[np.isnan(lanes_imputed)], 1.0, 2.0)
-
-    return lanes_imputed
+    return lanes_imputed.to_numpy()
 
 
 def _check_highway_ok(
@@ -248,7 +264,9 @@ def _check_highway_ok(
     """
     good_highways = {'motorway', 'motorway_link', 'primary', 'secondary', 'tertiary', 'unclassified', 
                 'trunk', 'trunk_link','secondary_link','primary_link', 'tertiary_link'}
-    return [any(hw in entry for hw in good_highways) for entry in highway]
+    # Substring match of any of the good highways, as `hw in entry`
+    pattern = '|'.join(re.escape(hw) for hw in sorted(good_highways))
+    return pd.Series(highway, dtype=object).str.contains(pattern, regex=True).to_list()
         
 
 def fix_manually(
@@ -372,10 +390,8 @@ def get_largest_component(
     Returns:
         `tuple`: Filtered GeoDataFrames for edges and nodes.
     """
-    G1 = create_road_graph(df_edges=edges_tbf, df_nodes=nodes_tbf)
-    strong_components = list(nx.strongly_connected_components(G1))
-    largest_component = max(strong_components, key=len)
-    large_component_nodes =  list(largest_component)
+    graph = create_csr_graph(df_edges=edges_tbf, df_nodes=nodes_tbf)
+    large_component_nodes = largest_strong_component(graph)
 
     nodes_tbf = nodes_tbf[nodes_tbf['node_id'].isin(large_component_nodes)]
     edges_tbf = edges_tbf[edges_tbf['u'].isin(large_component_nodes) & edges_tbf['v'].isin(large_component_nodes)]
@@ -389,7 +405,7 @@ def create_road_graph(
     weight_col: str|None = None
 ) -> nx.MultiDiGraph:
     """
-    Creates a directed graph representation of a road network using NetworkX.
+    Creates a directed graph representation of a road network using NetworkX, through `create_csr_graph`.
 
     Args:
         `df_edges` (`pd.DataFrame`): DataFrame containing the edges of the road network. 
@@ -401,56 +417,215 @@ def create_road_graph(
     Returns:
         `nx.MultiDiGraph`: A directed graph of the road network with nodes and edges.
     """
+    graph = create_csr_graph(df_edges=df_edges, df_nodes=df_nodes, weight_cols=[weight_col] if weight_col is not None else None)
+    return to_networkx(graph, weight_col=weight_col)
+
+
+def create_csr_graph(
+    df_edges: pd.DataFrame,
+    df_nodes: pd.DataFrame|None = None,
+    weight_cols: list|None = None
+) -> dict:
+    """
+    Creates an array representation of a road network, built directly from the columns of the edges: the node ids
+    are encoded as integer codes and each edge is stored as a (`u`, `v`) pair of codes with its key and weights.
+    Sparse adjacency matrices for `scipy.sparse.csgraph` are built from it with `csr_adjacency`.
+
+    Args:
+        `df_edges` (`pd.DataFrame`): DataFrame containing the edges of the road network.
+            Must include columns `u`, `v`, and `key`.
+        `df_nodes` (`pd.DataFrame`, optional): DataFrame containing the nodes of the road network.
+            Must include a column `node_id`. Defaults to `None` (only the endpoints of the edges).
+        `weight_cols` (`list`, optional): Columns in `df_edges` to store as edge weights. Defaults to `None`.
+
+    Returns:
+        `dict`: With keys `node_ids` (`pd.Index` of the node id of each code, the nodes of `df_nodes` first and then
+            the other endpoints, as in `create_road_graph`), `u` and `v` (`np.ndarray` of node codes), `key`
+            (`np.ndarray`) and `weights` (`dict` of `np.ndarray`), the edges in the order of `df_edges`.
+    """
+    endpoints = np.column_stack([df_edges['u'].to_numpy(), df_edges['v'].to_numpy()]).ravel()
+    node_ids = endpoints if df_nodes is None else np.concatenate([df_nodes['node_id'].to_numpy(), endpoints])
+    node_ids = pd.Index(pd.unique(node_ids))
+    return {
+        'node_ids': node_ids,
+        'u': node_ids.get_indexer(df_edges['u']),
+        'v': node_ids.get_indexer(df_edges['v']),
+        'key': df_edges['key'].to_numpy(),
+        'weights': {col: df_edges[col].to_numpy(dtype=float) for col in (weight_cols or [])},
+    }
+
+
+def csr_adjacency(
+    graph: dict,
+    weight_col: str|None = None,
+    reverse: bool = False
+) -> sparse.csr_matrix:
+    """
+    Returns the (nodes x nodes) CSR adjacency matrix of a road network, with the smallest weight among parallel
+    edges (or `1` without `weight_col`). Zero weights are stored explicitly, so they are edges for `csgraph`.
+
+    Args:
+        `graph` (`dict`): The road network, as returned by `create_csr_graph`.
+        `weight_col` (`str`, optional): Weight of the edges, among the `weight_cols` of the graph. Defaults to `None`.
+        `reverse` (`bool`, optional): Whether to reverse the direction of the edges. Defaults to `False`.
+
+    Returns:
+        `sparse.csr_matrix`: The adjacency matrix.
+    """
+    u, v = (graph['v'], graph['u']) if reverse else (graph['u'], graph['v'])
+    weight = graph['weights'][weight_col] if weight_col is not None else np.ones(len(u))
+    n_nodes = len(graph['node_ids'])
+    # Smallest weight of the parallel edges, as the shortest paths on the multigraph
+    pair = u.astype(np.int64) * n_nodes + v
+    order = np.lexsort((weight, pair))
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = pair[order][1:] != pair[order][:-1]
+    keep = order[first]
+    return sparse.csr_matrix((weight[keep], (u[keep], v[keep])), shape=(n_nodes, n_nodes))
+
+
+def largest_strong_component(
+    graph: dict
+) -> np.ndarray:
+    """
+    Returns the node ids of the largest strongly connected component of a road network.
+
+    Args:
+        `graph` (`dict`): The road network, as returned by `create_csr_graph`.
+
+    Returns:
+        `np.ndarray`: The node ids of the component.
+    """
+    _, labels = csgraph.connected_components(csr_adjacency(graph), directed=True, connection='strong')
+    return graph['node_ids'][labels == np.bincount(labels).argmax()].to_numpy()
+
+
+def shortest_path_lengths(
+    graph: dict,
+    sources: list,
+    weight_col: str,
+    limit: float = np.inf,
+    min_only: bool = False,
+    reverse: bool = False
+) -> np.ndarray:
+    """
+    Computes the shortest path lengths from the given nodes to all the nodes of a road network with Dijkstra,
+    stopped at `limit`.
+
+    Args:
+        `graph` (`dict`): The road network, as returned by `create_csr_graph`.
+        `sources` (`list`): Node ids of the sources.
+        `weight_col` (`str`): Weight of the edges, among the `weight_cols` of the graph.
+        `limit` (`float`, optional): Maximum length; longer paths have length `inf`. Defaults to `inf`.
+        `min_only` (`bool`, optional): Whether to return only the shortest length from any of the sources.
+            Defaults to `False`.
+        `reverse` (`bool`, optional): Whether to compute the lengths from all the nodes to the sources instead.
+            Defaults to `False`.
+
+    Returns:
+        `np.ndarray`: The (sources x nodes) lengths, or the (nodes) lengths with `min_only`, with the nodes in the
+            order of `graph['node_ids']`.
+    """
+    indices = graph['node_ids'].get_indexer(sources)
+    if (indices < 0).any():
+        raise KeyError(f"Unknown nodes {list(np.asarray(sources)[indices < 0])}")
+    return csgraph.dijkstra(csr_adjacency(graph, weight_col=weight_col, reverse=reverse), directed=True,
+                            indices=indices, limit=limit, min_only=min_only)
+
+
+def to_networkx(
+    graph: dict,
+    weight_col: str|None = None
+) -> nx.MultiDiGraph:
+    """
+    Exports a road network to NetworkX, with the same nodes and edges as `create_road_graph`.
+
+    Args:
+        `graph` (`dict`): The road network, as returned by `create_csr_graph`.
+        `weight_col` (`str`, optional): Weight to set as the `weight` attribute of the edges. Defaults to `None`.
+
+    Returns:
+        `nx.MultiDiGraph`: A directed graph of the road network with nodes and edges.
+    """
+    node_ids = graph['node_ids'].to_numpy()
     G = nx.MultiDiGraph()
-    for idx, row in df_nodes.iterrows():
-        G.add_node(row['node_id'])
-    for idx, row in df_edges.iterrows():
-        if weight_col is None:
-            G.add_edge(row['u'], row['v'], key=row['key'])
-        else:
-            G.add_edge(row['u'], row['v'], key=row['key'], weight=row[weight_col])
+    G.add_nodes_from(node_ids)
+    if weight_col is None:
+        G.add_edges_from(zip(node_ids[graph['u']], node_ids[graph['v']], graph['key']))
+    else:
+        G.add_edges_from(zip(node_ids[graph['u']], node_ids[graph['v']], graph['key'],
+                             ({'weight': w} for w in graph['weights'][weight_col])))
     return G
 
 
-def _process_columns(
-    value: str,
-    expected_type: str = "int"):
+def _first_tag(
+    values: pd.Series
+) -> pd.Series:
     """
-    Process mixed integer values:
-    - For string integers (e.g., "60"), returns the integer
-    - For string lists (e.g., "['70','90']"), returns the average of the integers
-    - For other strings (e.g., "signals"), returns np.nan
-    
-    Process mixed string values:
-    - For signle string (e.g., "motorway"), returns the string
-    - For string lists (e.g., "['motorway','trunk']"), returns the first string
+    Normalizes the OSM string tags, on the values converted to strings: the first string of
+    the list literals (e.g. "['motorway','trunk']" -> "motorway", `NaN` if the first element is not a string) and
+    the other values unchanged.
 
     Args:
-        value (str or object) : The value to be processed
-        expected_type (str) : The expected type of the value, either 'int' or 'str'. Default to 'int'.
-    
+        `values` (`pd.Series`): The OSM tag values (strings, lists or missing values).
+
     Returns:
-        Processed value or np.nan for non-numeric values
+        `pd.Series`: The normalized values.
     """
-    if pd.isna(value):
-        return np.nan
-    
-    value_str = str(value)
-    
-    if value_str.startswith('[') and value_str.endswith(']'):
-        try:
-            parsed_list = ast.literal_eval(value_str)
-            if expected_type=="int":
-                integers = [int(x) for x in parsed_list]
-                return sum(integers) / len(integers)
-            elif expected_type=="str":
-                return parsed_list[0]
-        except (ValueError, SyntaxError, TypeError):
-            return np.nan
-        
-    if expected_type=="int" and value_str.isdigit():
-        return int(value_str)
-    elif expected_type=="str":
-        return value_str    
-    
-    return np.nan
\ No newline at end of file
+    codes, uniques = pd.factorize(values.astype(str))
+    values_unique = pd.Series(uniques, dtype=object)
+    is_list = values_unique.str.startswith('[') & values_unique.str.endswith(']')
+    first = values_unique[is_list].str.extract(r"""^\[\s*(?P<quote>['"])(?P<tag>.*?)(?P=quote)\s*[,\]]""", expand=True)['tag']
+    return pd.Series(values_unique.where(~is_list, first).to_numpy()[codes], index=values.index)
+
+
+def _parse_numeric(
+    values: pd.Series
+) -> pd.Series:
+    """
+    Parses the OSM numeric tags, on the values converted to strings, with pandas string
+    operations only: integer strings (e.g. "60") are parsed, list literals of integers (e.g. "['70','90']") give the
+    average of the integers, and everything else (e.g. "signals", "['70','signals']", missing values) gives `NaN`.
+    As with `int()`, unquoted decimal elements of a list are truncated (e.g. "[70.5, 90]" gives 80.0), while quoted
+    ones (e.g. "['70.5','90']") and decimal strings (e.g. "50.5") give `NaN`.
+
+    Args:
+        `values` (`pd.Series`): The OSM tag values (strings, lists or missing values).
+
+    Returns:
+        `pd.Series`: The parsed values, as floats.
+    """
+    # OSM tags have few distinct values: parse each of them once
+    codes, uniques = pd.factorize(values.astype(str))
+    values_unique = pd.Series(uniques, dtype=object)
+    parsed = pd.to_numeric(values_unique.where(values_unique.str.fullmatch(r'\d+')), errors='coerce').astype(float)
+
+    is_list = values_unique.str.startswith('[') & values_unique.str.endswith(']')
+    if is_list.any():
+        elements = values_unique[is_list].str.slice(1, -1).str.split(',').explode().str.strip()
+        # Elements that are quoted integers or unquoted numbers (truncated); a single invalid element invalidates the list
+        digits = elements.str.extract(r"""^(?:(?P<quote>['"])\s*(?P<integer>\d+)\s*(?P=quote)|(?P<number>\d+(?:\.\d*)?|\.\d+))$""",
+                                      expand=True)
+        numbers = np.trunc(pd.to_numeric(digits['integer'].where(digits['integer'].notna(), digits['number']), errors='coerce'))
+        grouped = numbers.groupby(level=0)
+        parsed[is_list] = grouped.mean().where(grouped.count() == grouped.size())
+    return pd.Series(parsed.to_numpy()[codes], index=values.index)
+
+
+def _impute_by_group(
+    values: pd.Series,
+    groups,
+    how: str = 'mean'
+) -> pd.Series:
+    """
+    Fills the missing values with the mean (or median) of the values of their group.
+
+    Args:
+        `values` (`pd.Series`): The values.
+        `groups`: The group of each value, as a `pd.Series` or a list of `pd.Series` (e.g. the highway class).
+        `how` (`str`, optional): Statistic of the group, `'mean'` or `'median'`. Defaults to `'mean'`.
+
+    Returns:
+        `pd.Series`: The imputed values (`NaN` where the group has no value).
+    """
+    return values.fillna(values.groupby(groups).transform(how))
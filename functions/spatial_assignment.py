@@ -1,6 +1,12 @@
+import hashlib
+import os
+
 import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
 from constants import CRS_PROJECTED
-from spatial_utils import is_left, nearest_lines, closest_point
+from spatial_utils import are_left, nearest_lines, closest_point
 
 
 def OD_to_AV(
@@ -67,34 +73,77 @@ def AOI_to_AV(
 
 def roads_to_AOI(
     df_edges: gpd.GeoDataFrame, 
-    df_aoi: gpd.GeoDataFrame
+    df_aoi: gpd.GeoDataFrame,
+    cachepath: str|None = None
 ) -> gpd.GeoDataFrame:
     """
-    Assigns roads (edges) to Areas of Interest (AOI) by checking intersections.
+    Assigns roads (edges) to Areas of Interest (AOI) by checking intersections: each road is assigned to the AOI
+    with the longest intersection (`'0'` if it does not intersect any AOI).
+    With `cachepath`, the assignment is saved keyed by the hash of the roads and of the AOI, and reused while they
+    do not change.
 
     Args:
         `df_edges` (`gpd.GeoDataFrame`): GeoDataFrame of road network edges.
         `df_aoi` (`gpd.GeoDataFrame`): GeoDataFrame of AOI geometries with `id_zone` attributes.
+        `cachepath` (`str`, optional): Directory of the saved assignments. Defaults to `None` (no cache).
 
     Returns:
         `gpd.GeoDataFrame`: Updated GeoDataFrame of edges with AOI zone assignments.
     """
     df_edges.set_crs(CRS_PROJECTED, inplace=True)
-    joined = gpd.sjoin(df_edges, df_aoi, how="left", predicate="intersects")
-    joined['id_zone'] = joined['id_zone'].fillna('0')
-    joined = joined.merge(df_aoi[['id_zone', 'geometry']], on='id_zone', how='left')
-    joined["intersection_length"] = joined.apply(
-        lambda row: row["geometry_x"].intersection(row["geometry_y"]).length if row["geometry_x"].intersects(row["geometry_y"]) else 0,
-        axis=1
+    namefile = f"{cachepath}/roads_to_AOI_{_roads_AOI_hash(df_edges, df_aoi)}.pkl" if cachepath is not None else None
+    if namefile is not None and os.path.exists(namefile):
+        return df_edges.merge(pd.read_pickle(namefile), on=['u','v','key'])
+
+    edges = df_edges[['u', 'v', 'key', 'geometry']].reset_index(drop=True)
+    aoi = df_aoi[['id_zone', 'geometry']].reset_index(drop=True)
+    edge_geometries = np.asarray(edges.geometry.values)
+    aoi_geometries = np.asarray(aoi.geometry.values)
+    idx_edge, idx_aoi = shapely.STRtree(aoi_geometries).query(edge_geometries, predicate="intersects")
+
+    # Length of each road-AOI intersection, over the aligned geometry arrays: the length of the road when it is
+    # inside the AOI (a fast test on the prepared AOI), the length of the intersection otherwise
+    shapely.prepare(aoi_geometries)
+    intersection_length = shapely.length(edge_geometries[idx_edge])
+    crossing = ~shapely.contains_properly(aoi_geometries[idx_aoi], edge_geometries[idx_edge])
+    intersection_length[crossing] = shapely.length(
+        shapely.intersection(edge_geometries[idx_edge[crossing]], aoi_geometries[idx_aoi[crossing]])
     )
-    joined_sorted = joined.sort_values(by="intersection_length", ascending=False)
-    unique_matches = joined_sorted.drop_duplicates(subset=["geometry_x"], keep="first")
-
-    df_edges = df_edges.merge(unique_matches[['u','v','key','id_zone']], on=['u','v','key'])
+    matches = pd.DataFrame({
+        'edge': idx_edge,
+        'id_zone': aoi['id_zone'].to_numpy()[idx_aoi],
+        'intersection_length': intersection_length,
+    })
+    # Dominant AOI of each road; roads without AOI get '0'
+    best = matches.loc[matches.groupby('edge')['intersection_length'].idxmax(), ['edge', 'id_zone']]
+    assignment = edges[['u', 'v', 'key']].assign(id_zone='0').astype({'id_zone': object})
+    assignment.loc[best['edge'].to_numpy(), 'id_zone'] = best['id_zone'].to_numpy()
+    assignment = assignment.drop_duplicates(subset=['u', 'v', 'key'])
+
+    if namefile is not None:
+        os.makedirs(cachepath, exist_ok=True)
+        assignment.to_pickle(namefile)
+
+    df_edges = df_edges.merge(assignment, on=['u','v','key'])
 
     return df_edges
 
 
+def _roads_AOI_hash(
+    df_edges: gpd.GeoDataFrame,
+    df_aoi: gpd.GeoDataFrame
+) -> str:
+    """
+    Returns the hash of the inputs of `roads_to_AOI`: the ids and geometries of the roads and of the AOI.
+    """
+    h = hashlib.sha256()
+    h.update(pd.util.hash_pandas_object(df_edges[['u', 'v', 'key']].astype(str), index=False).to_numpy().tobytes())
+    h.update(pd.util.hash_pandas_object(df_aoi['id_zone'].astype(str), index=False).to_numpy().tobytes())
+    for geometries in (df_edges.geometry.values, df_aoi.geometry.values):
+        h.update(b"".join(shapely.to_wkb(geometries, hex=False, output_dimension=2)))
+    return h.hexdigest()[:16]
+
+
 def nodes_to_AV(
     df_nodes: gpd.GeoDataFrame, 
     df_av: gpd.GeoDataFrame
@@ -139,9 +188,9 @@ def spira_to_road(
         on=['u','v','key']
     )
     # Apply the function to understand if the spira is on the left of the road
-    pt_series = gpd.GeoSeries(spira_close_roads['geometry_x'])
-    ln_series = gpd.GeoSeries(spira_close_roads['geometry_y'])
-    spira_close_roads['spira_left_location'] = [is_left(linestring=ln, point=pt) for ln, pt in zip(ln_series, pt_series)]
+    spira_close_roads['spira_left_location'] = are_left(
+        linestrings=spira_close_roads['geometry_y'].values, points=spira_close_roads['geometry_x'].values
+    )
     # Assign the real road
     spira_close_roads = spira_close_roads[
         (spira_close_roads['oneway']==True) | 
@@ -1,8 +1,8 @@
 import geopandas as gpd
 import pandas as pd
 import numpy as np
+import shapely
 from shapely.geometry import Polygon, LineString, Point
-import math
 
 
 def buffer_around(
@@ -86,8 +86,9 @@ def nearest_lines(
 ) -> pd.DataFrame:  
     """
     Finds the closest linestring(s) in a GeoDataFrame for each point in another GeoDataFrame.    
-    For each point, identifies all linestrings at the minimum distance and creates paired records
-    containing both the point data and the matching linestring data.
+    For each point, identifies all linestrings at the minimum distance, with a single nearest query on a
+    `shapely.STRtree` of the linestrings, and creates paired records containing both the point data and the
+    matching linestring data.
     
     Args:
         `pts` (`gpd.GeoDataFrame`): GeoDataFrame containing point geometries.
@@ -100,18 +101,15 @@ def nearest_lines(
                       with multiple rows possible for a single point if multiple linestrings
                       are at the minimum distance.
     """  
-    full_closest_linestrings = []
-    for idx, point in pts.iterrows():
-        distances = lns.geometry.distance(point.geometry)
-        min_distance = distances.min()
-        min_distance_indices = distances[distances == min_distance].index.tolist()
+    tree = shapely.STRtree(lns.geometry.values)
+    # All the lines at the minimum distance of each point (ties included), in the order of the points and of the lines
+    idx_pts, idx_lns = tree.query_nearest(pts.geometry.values, all_matches=True)
+    order = np.lexsort((idx_lns, idx_pts))
+    idx_pts, idx_lns = idx_pts[order], idx_lns[order]
 
-        for closest_index in min_distance_indices:
-            closest_linestring = lns[['u','v','key']].loc[closest_index]
-            combined_row = pd.concat([point, closest_linestring])
-            full_closest_linestrings.append(combined_row)
-
-    return pd.DataFrame(full_closest_linestrings)
+    closest = pts.iloc[idx_pts].reset_index(drop=True)
+    closest[['u', 'v', 'key']] = lns[['u', 'v', 'key']].iloc[idx_lns].reset_index(drop=True)
+    return pd.DataFrame(closest)
 
 
 def is_left(
@@ -119,17 +117,8 @@ def is_left(
     point: Point
 ) -> bool:    
     """
-    Determines if a point is to the left of the closest segment of a linestring.
-
-    This function finds the closest segment of the linestring to the given point,
-    then uses coordinate translation and rotation to determine if the point lies
-    to the left of that segment when looking from the first vertex toward the second.
-
-    The algorithm works by:
-    1. Finding the closest segment of the linestring to the point
-    2. Translating the coordinate system to make the first vertex the origin
-    3. Rotating the coordinate system to align the segment with the x-axis
-    4. Checking if the transformed point's y-coordinate is positive (left side)
+    Determines if a point is to the left of the closest segment of a linestring, looking from the first vertex
+    of the segment toward the second. See `are_left`.
 
     Args:
         linestring (LineString): A shapely LineString object to test against.
@@ -138,50 +127,62 @@ def is_left(
     Returns:
         bool: True if the point is to the left of the closest segment,
                 False if the point is to the right or on the segment.
-                None if no closest segment is found (should not occur).
+                None if the linestring has no segment.
     """
-    def translate_point(p, p0):
-        p[0] = p[0] - p0[0]
-        p[1] = p[1] - p0[1]
-        return p
-    def rotate_point(p, angle):
-        p = [p[0]*math.cos(angle)-p[1]*math.sin(angle),
-          p[0]*math.sin(angle)+p[1]*math.cos(angle) ]
-        return p
-    def convert_angle (angle, yy):
-        if yy < 0:
-            angle = - angle
-        return angle
-
-    dist = float('inf')
-    closest_segment_index = -1
-    for i in range(len(linestring.coords) - 1):
-        segment = LineString([linestring.coords[i], linestring.coords[i + 1]])
-        dist_temp = point.distance(segment)
-        if dist_temp < dist:
-            dist = dist_temp
-            closest_segment_index = i
-    if closest_segment_index == -1:
-        return None  # This should not happen
-
-    p1 = linestring.coords[closest_segment_index]
-    p2 = linestring.coords[closest_segment_index + 1]
-
-    p2 = translate_point([p2[0],p2[1]], [p1[0],p1[1]])
-    pp = translate_point([point.x,point.y],  [p1[0],p1[1]])
-
-    angle_p1p2 = math.acos(p2[0] / math.sqrt(p2[1]**2 + p2[0]**2))
-    angle_p1p2 = convert_angle(angle_p1p2, yy=p2[1])      
-
-    angle_p1p2 = -angle_p1p2
-    p2 = rotate_point(p2, angle_p1p2)
-    pp = rotate_point(pp, angle_p1p2)
-    
-    angle_p1point = math.acos((pp[0]) / math.sqrt(pp[1]**2 + pp[0]**2))
-    angle_p1point = convert_angle(angle_p1point, yy=pp[1])
+    if len(linestring.coords) < 2:
+        return None
+    return bool(are_left(linestrings=[linestring], points=[point])[0])
+
 
-    left_condition = angle_p1point > 0
-    return left_condition  # True if the point is to the left of the segment, False otherwise
+def are_left(
+    linestrings,
+    points
+) -> np.ndarray:
+    """
+    Vectorized `is_left` of pairs of linestrings and points: for each pair, finds the closest segment of the
+    linestring to the point (the first one on ties, up to a relative tolerance of 1e-12), then checks the sign of the cross product between the segment
+    and the vector from its first vertex to the point, all over the arrays of the segments of the linestrings.
+
+    Args:
+        linestrings (array-like of LineString): The linestrings.
+        points (array-like of Point): The points, one per linestring.
+
+    Returns:
+        np.ndarray: True where the point is to the left of the closest segment of its linestring, False where it
+                    is to the right or on the segment (or the linestring has no segment).
+    """
+    linestrings = np.asarray(linestrings, dtype=object)
+    points = shapely.get_coordinates(np.asarray(points, dtype=object))
+    coords, line_idx = shapely.get_coordinates(linestrings, return_index=True)
+
+    # Segments: consecutive vertices of the same linestring
+    is_segment = line_idx[:-1] == line_idx[1:]
+    seg_line = line_idx[:-1][is_segment]
+    start = coords[:-1][is_segment]
+    direction = coords[1:][is_segment] - start
+    to_point = points[seg_line] - start
+
+    # Distance between each point and each segment of its linestring
+    length2 = (direction**2).sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        t = np.where(length2 > 0, (to_point * direction).sum(axis=1) / length2, 0).clip(0, 1)
+    distance = np.hypot(*(to_point - t[:, None] * direction).T)
+
+    # Closest segment of each linestring: the first within a relative tolerance of the minimum distance (and of the
+    # magnitude of the coordinates, the rounding error of the distances), so that the adjacent segments at the
+    # closest vertex tie as with the distances of shapely (the segments of each linestring are contiguous and in order)
+    min_distance = np.full(len(linestrings), np.inf)
+    np.minimum.at(min_distance, seg_line, distance)
+    tolerance = 1e-12 * (min_distance[seg_line] + np.abs(start).max(axis=1) + np.sqrt(length2))
+    candidates = np.flatnonzero(distance <= min_distance[seg_line] + tolerance)
+    first = np.ones(len(candidates), dtype=bool)
+    first[1:] = seg_line[candidates][1:] != seg_line[candidates][:-1]
+    closest = candidates[first]
+
+    cross = direction[closest, 0] * to_point[closest, 1] - direction[closest, 1] * to_point[closest, 0]
+    left = np.zeros(len(linestrings), dtype=bool)
+    left[seg_line[closest]] = cross > 0
+    return left
 
 
 def direction_wrt_polygon(
@@ -1,6 +1,10 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
-import networkx as nx
-import math
+import numpy as np
+from scipy import sparse
+from scipy.sparse import csgraph
 
 import road_network
 
@@ -8,32 +12,65 @@ import road_network
 def find(
     df_nodes,
     df_edges, 
-    df_spiras
+    df_spiras,
+    time_threshold: float|None = None,
+    n_jobs: int = 1
 )-> pd.DataFrame:
     """
     Finds the catchment area for each spira by calculating time distances on the road network at free flow speed.
+    The time distance between the spira edge and another edge is the shortest path, in either direction, between
+    an endpoint of the one and an endpoint of the other. It is computed on the CSR graph of the network with a
+    Dijkstra from the endpoints of each spira edge only, stopped at `time_threshold`, so memory scales with the
+    catchment areas and not with the square of the network size.
 
     Args:
         `df_nodes` (`pd.DataFrame`): DataFrame containing road network nodes.
         `df_edges` (`pd.DataFrame`): DataFrame containing road network edges.
         `df_spiras` (`pd.DataFrame`): DataFrame containing spira information.
+        `time_threshold` (`float`|`None`, optional): Maximum duration of the roads of a catchment area. Defaults to
+            `None` (all the roads, with `inf` duration for the unreachable ones).
+        `n_jobs` (`int`, optional): Number of processes the spiras are split across; `-1` uses all the cores.
+            Defaults to `1`.
 
     Returns:
         `pd.DataFrame`: DataFrame containing the catchment area of each spira with road details and durations.
     """
-    G = road_network.create_road_graph(df_edges=df_edges, df_nodes=df_nodes, weight_col='free_flow_time')
-    all_shortest_paths = dict(nx.all_pairs_dijkstra_path_length(G, weight='weight'))
-
-    for iter in range(df_spiras.shape[0]): # tqdm(range(spira_close_roads.shape[0]), desc='Computing time distance between spiras and roads',bar_format='{l_bar}{bar}| {n_fmt}/{total_fmt} [{elapsed}]'):
-        ref_edge = (
-            df_spiras['u'][iter], 
-            df_spiras['v'][iter], 
-            df_spiras['key'][iter]
-        )
-        result = _find_edges_distance(graph=G, edge1=ref_edge, all_shortest_paths=all_shortest_paths)
-        result['spira_unique_id'] = df_spiras['spira_unique_id'][iter]
-        spira_catchment_area = result if iter == 0 else pd.concat([spira_catchment_area, result])
-    
+    graph = road_network.create_csr_graph(df_edges=df_edges, df_nodes=df_nodes, weight_cols=['free_flow_time'])
+    node_index = graph['node_ids']
+    forward = road_network.csr_adjacency(graph, weight_col='free_flow_time')
+    backward = road_network.csr_adjacency(graph, weight_col='free_flow_time', reverse=True)
+    edges = df_edges[['u', 'v', 'key']].drop_duplicates().reset_index(drop=True)
+    edge_u = node_index.get_indexer(edges['u'])
+    edge_v = node_index.get_indexer(edges['v'])
+    sources = [
+        [node for node in node_index.get_indexer([u, v]) if node >= 0]
+        for u, v in zip(df_spiras['u'], df_spiras['v'])
+    ]
+    limit = np.inf if time_threshold is None else time_threshold
+
+    if n_jobs is None or n_jobs < 0:
+        n_jobs = os.cpu_count()
+    n_jobs = max(1, min(n_jobs, len(sources)))
+    chunks = np.array_split(np.arange(len(sources)), n_jobs)
+    tasks = [([sources[i] for i in chunk], forward, backward, edge_u, edge_v, limit) for chunk in chunks]
+    if n_jobs == 1:
+        results = [_edges_distance(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            results = list(executor.map(_edges_distance, *zip(*tasks)))
+
+    spira_ids = df_spiras['spira_unique_id'].to_numpy()
+    frames = []
+    for chunk, (spira_pos, edge_pos, duration) in zip(chunks, results):
+        frames.append(pd.DataFrame({
+            'u': edges['u'].to_numpy()[edge_pos],
+            'v': edges['v'].to_numpy()[edge_pos],
+            'key': edges['key'].to_numpy()[edge_pos],
+            'spira_unique_id': spira_ids[chunk[spira_pos]],
+            'duration': duration,
+        }))
+    spira_catchment_area = pd.concat(frames, ignore_index=True)
+
     spira_catchment_area = pd.merge(
         spira_catchment_area[['u', 'v', 'key', 'spira_unique_id', 'duration']],
         df_edges[['u', 'v', 'key', 'free_flow_time', 'id_zone']],
@@ -43,36 +80,37 @@ def find(
     return spira_catchment_area
 
 
-def _find_edges_distance(
-    graph, 
-    edge1, 
-    all_shortest_paths
-):
-    edges_within_threshold = []
-
-    # Add edges to the set based on shortest path distance
-    for edge2 in graph.edges(keys=True):
-        if edge1 != edge2:
-            # Calculate the shortest path distance between the two edges
-            distances = []
-            for src in [edge1[0], edge1[1]]:
-                for tgt in [edge2[0], edge2[1]]:
-                    distance = all_shortest_paths.get(src, {}).get(tgt, math.inf)
-                    distances.append(distance)
-            d1 = min(distances)
-            # Calculate the shortest path distance between the two edges (inverse order)
-            distances = []
-            for src in [edge2[0], edge2[1]]:
-                for tgt in [edge1[0], edge1[1]]:
-                    distance = all_shortest_paths.get(src, {}).get(tgt, math.inf)
-                    distances.append(distance)
-            d2 = min(distances)
-            edges_within_threshold.append((edge2[0], edge2[1], edge2[2], min(d1,d2)))
+def _edges_distance(
+    sources: list,
+    forward_graph: sparse.csr_matrix,
+    backward_graph: sparse.csr_matrix,
+    edge_u: np.ndarray,
+    edge_v: np.ndarray,
+    limit: float
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Computes, for each list of source nodes (the endpoints of a spira edge), the time distance of the edges
+    within `limit` (on the adjacency matrices of the network and of the reversed network): the shortest path from a source to an endpoint of the edge, or from an endpoint of the edge
+    to a source.
+
+    Returns:
+        `tuple[np.ndarray, np.ndarray, np.ndarray]`: The position of the spira in `sources`, the position of the
+            edge and the duration of each edge within `limit`.
+    """
+    spira_pos, edge_pos, durations = [np.empty(0)], [np.empty(0)], [np.empty(0)]
+    for i, nodes in enumerate(sources):
+        if nodes:
+            forward = csgraph.dijkstra(forward_graph, directed=True, indices=nodes, limit=limit, min_only=True)
+            backward = csgraph.dijkstra(backward_graph, directed=True, indices=nodes, limit=limit, min_only=True)
+            duration = np.minimum.reduce([forward[edge_u], forward[edge_v], backward[edge_u], backward[edge_v]])
         else:
-            edges_within_threshold.append((edge2[0], edge2[1], edge2[2], 0))
-    
-    df = pd.DataFrame(edges_within_threshold, columns=['u', 'v', 'key', 'duration']) #time = time_distance
-    return df
+            duration = np.full(len(edge_u), np.inf)
+        within = np.flatnonzero(duration <= limit)
+        spira_pos.append(np.full(len(within), i))
+        edge_pos.append(within)
+        durations.append(duration[within])
+    return (np.concatenate(spira_pos).astype(int), np.concatenate(edge_pos).astype(int),
+            np.concatenate(durations).astype(float))
 
 
 def filter(
@@ -102,3 +140,44 @@ def filter(
     )
     return df_catch
 
+
+
+def weight_matrix(
+    df_catch: pd.DataFrame
+) -> dict:
+    """
+    Compiles a filtered catchment area into sparse matrices, to distribute spira counts with mat-muls.
+    Filtering the catchment area with another `time_threshold` and recompiling it is cheap, so the distribution
+    can be recomputed for many thresholds.
+
+    Args:
+        `df_catch` (`pd.DataFrame`): Filtered catchment area, as returned by `filter`.
+
+    Returns:
+        `dict`: With keys
+            - `matrix` (`sparse.csr_matrix`): The (roads x spiras) matrix of the `prop_t_imp` weights,
+            - `roads` (`pd.DataFrame`): The `u`, `v`, `key` and `id_zone` of the rows of `matrix`,
+            - `spiras` (`np.ndarray`): The `spira_unique_id` of the columns of `matrix`,
+            - `zone_matrix` (`sparse.csr_matrix`): The (zones x roads) matrix of the zone of each road,
+            - `zones` (`np.ndarray`): The `id_zone` of the rows of `zone_matrix`.
+    """
+    roads = (
+        df_catch[['u', 'v', 'key', 'id_zone']]
+        .drop_duplicates(subset=['u', 'v', 'key'])
+        .sort_values(['u', 'v', 'key'])
+        .reset_index(drop=True)
+    )
+    spiras = np.sort(df_catch['spira_unique_id'].unique())
+    zones = np.sort(roads['id_zone'].unique())
+
+    rows = pd.MultiIndex.from_frame(roads[['u', 'v', 'key']]).get_indexer(pd.MultiIndex.from_frame(df_catch[['u', 'v', 'key']]))
+    cols = pd.Index(spiras).get_indexer(df_catch['spira_unique_id'])
+    matrix = sparse.csr_matrix(
+        (df_catch['prop_t_imp'].to_numpy(dtype=float), (rows, cols)),
+        shape=(len(roads), len(spiras))
+    )
+    zone_matrix = sparse.csr_matrix(
+        (np.ones(len(roads)), (pd.Index(zones).get_indexer(roads['id_zone']), np.arange(len(roads)))),
+        shape=(len(zones), len(roads))
+    )
+    return {'matrix': matrix, 'roads': roads, 'spiras': spiras, 'zone_matrix': zone_matrix, 'zones': zones}
@@ -1,6 +1,8 @@
+import math
 import pandas as pd
 import numpy as np
 import datetime as dt
+from scipy import sparse
 from scipy.signal import savgol_filter
 from scipy.interpolate import make_smoothing_spline
 
@@ -8,39 +10,64 @@ import temporal_utils
 from io_utils import vprint
 
 
-def _per_road_deltaTime(
+def _windows(
+    first_datetime: dt.datetime,
+    last_datetime: dt.datetime,
+    deltaTime: int = 5
+) -> pd.DatetimeIndex:
+    """
+    Returns the starts of the time windows [first_datetime + k * deltaTime, first_datetime + (k+1) * deltaTime)
+    starting before `last_datetime + deltaTime`, with the resolution they get when assigned to a table.
+    """
+    delta = pd.Timedelta(minutes=deltaTime)
+    first_datetime = pd.Timestamp(first_datetime)
+    n_windows = max(0, math.ceil((pd.Timestamp(last_datetime) + delta - first_datetime) / delta))
+    window_dtype = pd.DataFrame(index=[0]).assign(DateTime=first_datetime)['DateTime'].dtype
+    return pd.DatetimeIndex(first_datetime + np.arange(n_windows) * delta, name='DateTime').astype(window_dtype)
+
+
+def _bucket_counts(
     spira_data: pd.DataFrame,
-    df_catch: pd.DataFrame
-):
-    spira_data = spira_data.groupby(['spira_unique_id']) \
-        .sum(numeric_only=True) \
+    first_datetime: dt.datetime,
+    last_datetime: dt.datetime,
+    deltaTime: int = 5
+) -> pd.DataFrame:
+    """
+    Sums the counts of each spira in each time window of `_windows`. The `DateTime` of each count is the start of its window.
+    """
+    delta = pd.Timedelta(minutes=deltaTime)
+    first_datetime = pd.Timestamp(first_datetime)
+    windows = _windows(first_datetime=first_datetime, last_datetime=last_datetime, deltaTime=deltaTime)
+    end_datetime = first_datetime + len(windows) * delta
+
+    spira_data = spira_data[(spira_data['DateTime'] >= first_datetime) & (spira_data['DateTime'] < end_datetime)]
+    return (
+        spira_data[['spira_unique_id', 'count']]
+        .assign(DateTime=(first_datetime + (spira_data['DateTime'] - first_datetime) // delta * delta).astype(windows.dtype))
+        .groupby(['DateTime', 'spira_unique_id'])
+        .sum(numeric_only=True)
         .reset_index()
+    )
+
 
-    counts_roads = pd.merge(df_catch, spira_data, on='spira_unique_id', how='inner')
+def _per_road_windows(
+    counts: pd.DataFrame,
+    df_catch: pd.DataFrame
+) -> pd.DataFrame:
+    """
+    Distributes the counts of each spira and window on the roads of its catchment area, and takes the median
+    across the spiras of each road and window.
+    """
+    counts_roads = pd.merge(df_catch, counts, on='spira_unique_id', how='inner')
     counts_roads['count_distributed'] = counts_roads['count'] * counts_roads['prop_t_imp'] 
 
     counts_roads = counts_roads \
         .drop(['prop_t_imp', 'count', 'spira_unique_id'], axis=1) \
-        .groupby(['u', 'v', 'key','id_zone']) \
+        .groupby(['DateTime', 'u', 'v', 'key','id_zone']) \
         .median(numeric_only=True)\
         .reset_index()
-    
-    return counts_roads
-    
-
-def _per_area_deltaTime(
-    spira_data: pd.DataFrame,
-    df_catch: pd.DataFrame
-):
-    counts_roads = _per_road_deltaTime(spira_data=spira_data, df_catch=df_catch)
-    
-    counts_areas = counts_roads \
-        .drop(['u','v','key'], axis=1) \
-        .groupby(['id_zone']) \
-        .sum(numeric_only=True) \
-        .reset_index()
 
-    return counts_areas
+    return counts_roads
 
 
 def per_road(
@@ -53,6 +80,7 @@ def per_road(
 ) -> pd.DataFrame:
     """
     Computes distributed traffic counts per road for specified time intervals.
+    The counts are bucketed in the time intervals, distributed and aggregated in a single pass over `spira_data`.
 
     Args:
         `spira_data` (`pd.DataFrame`): DataFrame containing spira traffic data with counts and timestamps.
@@ -64,25 +92,12 @@ def per_road(
     Returns:
         `pd.DataFrame`: DataFrame containing distributed traffic counts per road over time intervals.
     """
-    traffic = pd.DataFrame()
-    last_datetime = last_datetime + dt.timedelta(minutes=deltaTime)
-    this_datetime = first_datetime
-    
-    while this_datetime < last_datetime:
-        next_datetime = this_datetime + dt.timedelta(minutes=deltaTime)
-        spira_data_red = spira_data[spira_data['DateTime'].between(this_datetime, next_datetime, inclusive='left')] 
-        spira_data_red = spira_data_red[['spira_unique_id', 'count']]
-
-        traffic_road = _per_road_deltaTime(spira_data=spira_data_red, df_catch=df_catch)
-        traffic_road['DateTime'] = this_datetime
-
-        traffic = pd.concat([traffic, traffic_road], ignore_index=True)
+    counts = _bucket_counts(spira_data=spira_data, first_datetime=first_datetime, last_datetime=last_datetime, deltaTime=deltaTime)
+    traffic = _per_road_windows(counts=counts, df_catch=df_catch)
+    vprint(text=f"Traffic from {first_datetime} to {last_datetime} computed", verbose=verbose)
 
-        if this_datetime.day != next_datetime.day:
-            vprint(text=f"Traffic in day {this_datetime.day} computed", verbose=verbose)
-        
-        this_datetime = this_datetime + dt.timedelta(minutes=deltaTime)
-    return traffic
+    # Same column order as the road table of a window with its DateTime
+    return traffic[[col for col in traffic.columns if col != 'DateTime'] + ['DateTime']]
 
 
 def per_area(
@@ -95,6 +110,7 @@ def per_area(
 ) -> pd.DataFrame:
     """
     Computes aggregated traffic counts per area for specified time intervals.
+    The counts are bucketed in the time intervals, distributed and aggregated in a single pass over `spira_data`.
 
     Args:
         `spira_data` (`pd.DataFrame`): DataFrame containing spira traffic data with counts and timestamps.
@@ -106,26 +122,122 @@ def per_area(
     Returns:
         `pd.DataFrame`: DataFrame containing aggregated traffic counts per area over time intervals.
     """
-    traffic = pd.DataFrame()
-    last_datetime = last_datetime + dt.timedelta(minutes=deltaTime)
-    this_datetime = first_datetime
-    
     vprint(text="Starting the traffic computation", verbose=verbose)
-    while this_datetime < last_datetime:
-        next_datetime = this_datetime + dt.timedelta(minutes=deltaTime)
-        spira_data_red = spira_data[spira_data['DateTime'].between(this_datetime, next_datetime, inclusive='left')] 
-        spira_data_red = spira_data_red[['spira_unique_id', 'count']]
+    counts = _bucket_counts(spira_data=spira_data, first_datetime=first_datetime, last_datetime=last_datetime, deltaTime=deltaTime)
+    counts_roads = _per_road_windows(counts=counts, df_catch=df_catch)
 
-        traffic_area = _per_area_deltaTime(spira_data=spira_data_red, df_catch=df_catch)
-        traffic_area['DateTime'] = this_datetime
+    traffic = counts_roads \
+        .drop(['u','v','key'], axis=1) \
+        .groupby(['DateTime', 'id_zone']) \
+        .sum(numeric_only=True) \
+        .reset_index()
+    vprint(text=f"Traffic from {first_datetime} to {last_datetime} computed", verbose=verbose)
 
-        traffic = pd.concat([traffic, traffic_area], ignore_index=True)
+    # Same column order as the area table of a window with its DateTime
+    return traffic[[col for col in traffic.columns if col != 'DateTime'] + ['DateTime']]
 
-        if this_datetime.day != next_datetime.day:
-            vprint(text=f"Traffic in day {this_datetime.day}/{this_datetime.month}/{this_datetime.year} computed", verbose=verbose)
 
-        this_datetime = this_datetime + dt.timedelta(minutes=deltaTime)
-    return traffic
+def count_matrix(
+    spira_data: pd.DataFrame,
+    spiras: np.ndarray,
+    first_datetime: dt.datetime,
+    last_datetime: dt.datetime,
+    deltaTime: int = 5
+) -> tuple[sparse.csr_matrix, pd.DatetimeIndex]:
+    """
+    Builds the sparse (spiras x time windows) matrix of the counts of each spira in each time window, with the
+    windows of `per_road` and `per_area`.
+
+    Args:
+        `spira_data` (`pd.DataFrame`): DataFrame containing spira traffic data with counts and timestamps.
+        `spiras` (`np.ndarray`): The `spira_unique_id` of the rows (e.g. the `spiras` of `catchment_area.weight_matrix`).
+            Counts of other spiras are ignored.
+        `first_datetime` (`datetime`): The start of the time range for traffic computation.
+        `last_datetime` (`datetime`): The end of the time range for traffic computation.
+        `deltaTime` (`int`, optional): Duration of each time interval in minutes. Defaults to `5` minutes.
+
+    Returns:
+        `tuple[sparse.csr_matrix, pd.DatetimeIndex]`: The count matrix and the start of the time window of each column.
+    """
+    windows = _windows(first_datetime=first_datetime, last_datetime=last_datetime, deltaTime=deltaTime)
+    counts = _bucket_counts(spira_data=spira_data, first_datetime=first_datetime, last_datetime=last_datetime, deltaTime=deltaTime)
+    rows = pd.Index(spiras).get_indexer(counts['spira_unique_id'])
+    known = rows >= 0
+    matrix = sparse.csr_matrix(
+        (counts['count'].to_numpy(dtype=float)[known], (rows[known], windows.get_indexer(counts['DateTime'])[known])),
+        shape=(len(spiras), len(windows))
+    )
+    return matrix, windows
+
+
+def distribute(
+    weights: dict,
+    counts: sparse.spmatrix,
+    level: str = 'road'
+) -> sparse.csr_matrix:
+    """
+    Distributes a (spiras x time) count matrix on the roads of the catchment areas, with sparse mat-muls.
+    The traffic of a road in a window is the mean of the distributed counts of the spiras covering it that have a
+    count in the window, where `per_road` takes their median: the two are the same for the roads covered by one or
+    two spiras. At the `'zone'` level, the traffic of a zone is the sum of the traffic of its roads, as in `per_area`.
+
+    Args:
+        `weights` (`dict`): The catchment weights, as returned by `catchment_area.weight_matrix`.
+        `counts` (`sparse.spmatrix`): The count matrix, with the rows in the order of `weights['spiras']`
+            (e.g. as returned by `count_matrix`).
+        `level` (`str`, optional): `'road'` for a (roads x time) matrix, in the order of `weights['roads']`, or `'zone'`
+            for a (zones x time) matrix, in the order of `weights['zones']`. Defaults to `'road'`.
+
+    Returns:
+        `sparse.csr_matrix`: The traffic matrix.
+    """
+    if level not in ('road', 'zone'):
+        raise ValueError(f"Unknown level {level}, expected 'road' or 'zone'")
+    counts = sparse.csr_matrix(counts)
+    traffic = (weights['matrix'] @ counts).tocsr()
+
+    # Number of spiras of each road with a count in each window (the stored entries, zeros included)
+    covering = weights['matrix'].copy()
+    covering.data[:] = 1
+    present = counts.copy()
+    present.data[:] = 1
+    n_spiras = (covering @ present).tocsr()
+    n_spiras.data = 1 / n_spiras.data
+    traffic = traffic.multiply(n_spiras).tocsr()
+
+    if level == 'zone':
+        traffic = weights['zone_matrix'] @ traffic
+    return traffic.tocsr()
+
+
+def matrix_to_frame(
+    traffic: sparse.spmatrix,
+    index: pd.DataFrame|np.ndarray,
+    windows: pd.DatetimeIndex,
+    index_name: str = 'id_zone'
+) -> pd.DataFrame:
+    """
+    Converts a traffic matrix into a table in the format of `per_road` / `per_area`: the columns of `index`, the
+    `count_distributed` and the `DateTime`, one row per non-zero entry, sorted by `DateTime`.
+
+    Args:
+        `traffic` (`sparse.spmatrix`): The traffic matrix, as returned by `distribute`.
+        `index` (`pd.DataFrame` | `np.ndarray`): The rows of the matrix (`weights['roads']` or `weights['zones']`).
+        `windows` (`pd.DatetimeIndex`): The columns of the matrix, as returned by `count_matrix`.
+        `index_name` (`str`, optional): Name of the column of `index` when it is an array. Defaults to `'id_zone'`.
+
+    Returns:
+        `pd.DataFrame`: The traffic table.
+    """
+    traffic = sparse.coo_matrix(traffic)
+    order = np.lexsort((traffic.row, traffic.col))
+    rows, cols = traffic.row[order], traffic.col[order]
+    index = index if isinstance(index, pd.DataFrame) else pd.DataFrame({index_name: index})
+    return (
+        index.iloc[rows]
+        .reset_index(drop=True)
+        .assign(count_distributed=traffic.data[order], DateTime=windows[cols])
+    )
 
 
 def average(
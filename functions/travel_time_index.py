@@ -0,0 +1,294 @@
+import glob
+import hashlib
+import heapq
+import os
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.sparse import csgraph
+
+import road_network
+
+
+def build_index(
+    df_edges: pd.DataFrame,
+    df_nodes: pd.DataFrame|None = None,
+    weight_col: str = 'free_flow_time',
+    n_landmarks: int = 16,
+    landmarks: np.ndarray|None = None,
+    seed: int = 0
+) -> dict:
+    """
+    Builds a landmark (ALT) travel-time index of a road network: the shortest travel times from and to a few
+    landmarks, spread over the network, give lower bounds of the travel time between any two nodes (by the
+    triangle inequality), which guide the A* searches of `travel_time` and bound the Dijkstra of `travel_times`.
+
+    Args:
+        `df_edges` (`pd.DataFrame`): DataFrame containing the edges of the road network.
+            Must include columns `u`, `v`, `key` and `weight_col`.
+        `df_nodes` (`pd.DataFrame`, optional): DataFrame containing the nodes of the road network. Defaults to `None`.
+        `weight_col` (`str`, optional): Column in `df_edges` with the travel time of the edges. Defaults to `'free_flow_time'`.
+        `n_landmarks` (`int`, optional): Number of landmarks. Defaults to `16`.
+        `landmarks` (`np.ndarray`, optional): Node codes of the landmarks, to reuse the landmarks of another index
+            of the same network. Defaults to `None` (farthest-point selection).
+        `seed` (`int`, optional): Seed of the first landmark. Defaults to `0`.
+
+    Returns:
+        `dict`: The index, with the network (`node_ids`, CSR `indptr`, `indices` and `data`), the `landmarks`, the
+            travel times `from_landmarks` and `to_landmarks` (landmarks x nodes) and the `topology_hash` and
+            `weight_hash` of the network.
+    """
+    graph = road_network.create_csr_graph(df_edges=df_edges, df_nodes=df_nodes, weight_cols=[weight_col])
+    forward = road_network.csr_adjacency(graph, weight_col=weight_col)
+    backward = road_network.csr_adjacency(graph, weight_col=weight_col, reverse=True)
+    if landmarks is None:
+        landmarks = _select_landmarks(forward, backward, n_landmarks=n_landmarks, seed=seed)
+    landmarks = np.asarray(landmarks, dtype=np.int64)
+
+    index = {
+        'node_ids': graph['node_ids'],
+        'indptr': forward.indptr,
+        'indices': forward.indices,
+        'data': forward.data,
+        'landmarks': landmarks,
+        'from_landmarks': csgraph.dijkstra(forward, directed=True, indices=landmarks),
+        'to_landmarks': csgraph.dijkstra(backward, directed=True, indices=landmarks),
+        'topology_hash': _topology_hash(graph),
+        'weight_hash': _weight_hash(graph, weight_col=weight_col),
+    }
+    return _with_search_structures(index)
+
+
+def _select_landmarks(
+    forward,
+    backward,
+    n_landmarks: int,
+    seed: int = 0
+) -> np.ndarray:
+    """
+    Selects the landmarks by farthest-point selection: each new landmark is the node farthest (in either direction,
+    among the reachable ones) from the landmarks already selected.
+    """
+    n_nodes = forward.shape[0]
+    rng = np.random.default_rng(seed)
+    landmarks = [int(rng.integers(n_nodes))]
+    closest = np.full(n_nodes, np.inf)
+    while len(landmarks) < min(n_landmarks, n_nodes):
+        distance = np.minimum(
+            csgraph.dijkstra(forward, directed=True, indices=landmarks[-1]),
+            csgraph.dijkstra(backward, directed=True, indices=landmarks[-1])
+        )
+        closest = np.minimum(closest, distance)
+        candidates = np.where(np.isfinite(closest), closest, -1)
+        candidates[landmarks] = -1
+        if candidates.max() <= 0:
+            # The rest of the network is not reachable from the landmarks: start from one of its nodes
+            unreached = np.flatnonzero(np.isinf(closest) & ~np.isin(np.arange(n_nodes), landmarks))
+            if len(unreached) == 0:
+                break
+            landmarks.append(int(unreached[0]))
+        else:
+            landmarks.append(int(candidates.argmax()))
+    return np.array(landmarks, dtype=np.int64)
+
+
+def _topology_hash(
+    graph: dict
+) -> str:
+    """
+    Returns a hash of the nodes and of the edges of a road network, as returned by `road_network.create_csr_graph`.
+    """
+    h = hashlib.sha256()
+    h.update("\x1f".join(map(str, graph['node_ids'])).encode())
+    h.update(np.ascontiguousarray(graph['u'], dtype=np.int64).tobytes())
+    h.update(np.ascontiguousarray(graph['v'], dtype=np.int64).tobytes())
+    return h.hexdigest()[:16]
+
+
+def _weight_hash(
+    graph: dict,
+    weight_col: str
+) -> str:
+    """
+    Returns a hash of the weights of the edges of a road network, as returned by `road_network.create_csr_graph`.
+    """
+    return hashlib.sha256(np.ascontiguousarray(graph['weights'][weight_col], dtype=float).tobytes()).hexdigest()[:16]
+
+
+def _with_search_structures(
+    index: dict
+) -> dict:
+    """
+    Adds the CSR adjacency of the index as a sparse matrix, for `csgraph`, and as Python lists, faster to access
+    one element at a time in the A* searches.
+    """
+    n_nodes = len(index['node_ids'])
+    index['_graph'] = sparse.csr_matrix((index['data'], index['indices'], index['indptr']), shape=(n_nodes, n_nodes))
+    index['_adjacency'] = (index['indptr'].tolist(), index['indices'].tolist(), index['data'].tolist())
+    return index
+
+
+def save_index(
+    index: dict,
+    namefile: str
+):
+    """
+    Saves a travel-time index in `{namefile}.npz`.
+    """
+    node_ids = index['node_ids'].to_numpy()
+    np.savez(
+        f"{namefile}.npz",
+        node_ids=node_ids.astype(str) if node_ids.dtype == object else node_ids,
+        **{key: index[key] for key in ('indptr', 'indices', 'data', 'landmarks', 'from_landmarks', 'to_landmarks')},
+        topology_hash=index['topology_hash'], weight_hash=index['weight_hash']
+    )
+
+
+def load_index(
+    namefile: str
+) -> dict:
+    """
+    Loads a travel-time index saved by `save_index`.
+    """
+    with np.load(f"{namefile}.npz") as data:
+        index = {key: data[key] for key in data.files}
+    index['node_ids'] = pd.Index(index['node_ids'])
+    index['topology_hash'] = str(index['topology_hash'])
+    index['weight_hash'] = str(index['weight_hash'])
+    return _with_search_structures(index)
+
+
+def load_or_build_index(
+    df_edges: pd.DataFrame,
+    df_nodes: pd.DataFrame|None = None,
+    weight_col: str = 'free_flow_time',
+    cachepath: str = "data/results/travel_time_index",
+    name: str = "geo_v4",
+    n_landmarks: int = 16
+) -> dict:
+    """
+    Loads the travel-time index of a road network from `cachepath`, building and saving it if the network is not
+    indexed yet. The index is keyed by the hashes of the topology and of the weights of the network. When the network
+    changed (e.g. after `road_network.fix_manually` or a new maxspeed imputation), the landmarks of the last index
+    are reused, if still in the network, and only their travel times are recomputed.
+
+    Args:
+        `df_edges` (`pd.DataFrame`): DataFrame containing the edges of the road network.
+        `df_nodes` (`pd.DataFrame`, optional): DataFrame containing the nodes of the road network. Defaults to `None`.
+        `weight_col` (`str`, optional): Column in `df_edges` with the travel time of the edges. Defaults to `'free_flow_time'`.
+        `cachepath` (`str`, optional): Directory of the saved indexes. Defaults to `"data/results/travel_time_index"`.
+        `name` (`str`, optional): Name of the network, prefix of the saved indexes. Defaults to `"geo_v4"`.
+        `n_landmarks` (`int`, optional): Number of landmarks of a new index. Defaults to `16`.
+
+    Returns:
+        `dict`: The index, as returned by `build_index`.
+    """
+    graph = road_network.create_csr_graph(df_edges=df_edges, df_nodes=df_nodes, weight_cols=[weight_col])
+    topology_hash = _topology_hash(graph)
+    namefile = f"{cachepath}/{name}_{topology_hash}_{_weight_hash(graph, weight_col=weight_col)}"
+    if os.path.exists(f"{namefile}.npz"):
+        return load_index(namefile)
+
+    # Reuse the landmarks of the last index of the network, if they are still nodes of the network
+    landmarks = None
+    previous = sorted(glob.glob(f"{cachepath}/{name}_*.npz"), key=os.path.getmtime)
+    if previous:
+        with np.load(previous[-1]) as data:
+            landmarks = graph['node_ids'].get_indexer(data['node_ids'][data['landmarks']].astype(graph['node_ids'].dtype))
+        if (landmarks < 0).any():
+            landmarks = None
+    index = build_index(df_edges=df_edges, df_nodes=df_nodes, weight_col=weight_col, n_landmarks=n_landmarks,
+                        landmarks=landmarks)
+    os.makedirs(cachepath, exist_ok=True)
+    save_index(index, namefile)
+    return index
+
+
+def _lower_bounds(
+    index: dict,
+    target: int
+) -> np.ndarray:
+    """
+    Returns the landmark lower bounds of the travel time from every node to the node code `target`:
+    max over the landmarks L of d(L, target) - d(L, node) and d(node, L) - d(target, L).
+    """
+    from_landmarks = index['from_landmarks']
+    to_landmarks = index['to_landmarks']
+    with np.errstate(invalid='ignore'):
+        bounds = np.maximum(
+            from_landmarks[:, [target]] - from_landmarks,
+            to_landmarks - to_landmarks[:, [target]]
+        )
+    # inf - inf: the landmark gives no bound
+    return np.nan_to_num(bounds, nan=0.0, posinf=np.inf).max(axis=0).clip(min=0)
+
+
+def travel_time(
+    index: dict,
+    source,
+    target
+) -> float:
+    """
+    Computes the shortest travel time between two nodes with an A* search guided by the landmark lower bounds.
+
+    Args:
+        `index` (`dict`): The travel-time index, as returned by `build_index` or `load_or_build_index`.
+        `source`: Node id of the origin.
+        `target`: Node id of the destination.
+
+    Returns:
+        `float`: The travel time (`inf` if the destination is not reachable).
+    """
+    source = index['node_ids'].get_loc(source)
+    target = index['node_ids'].get_loc(target)
+    if source == target:
+        return 0.0
+    bounds = _lower_bounds(index, target)
+    if np.isinf(bounds[source]):
+        return np.inf
+    indptr, indices, data = index['_adjacency']
+
+    distance = {source: 0.0}
+    queue = [(bounds[source], source)]
+    done = set()
+    while queue:
+        _, node = heapq.heappop(queue)
+        if node == target:
+            return distance[node]
+        if node in done:
+            continue
+        done.add(node)
+        for position in range(indptr[node], indptr[node+1]):
+            neighbor = indices[position]
+            new_distance = distance[node] + data[position]
+            if new_distance < distance.get(neighbor, np.inf):
+                distance[neighbor] = new_distance
+                heapq.heappush(queue, (new_distance + bounds[neighbor], neighbor))
+    return np.inf
+
+
+def travel_times(
+    index: dict,
+    source,
+    targets: list
+) -> np.ndarray:
+    """
+    Computes the shortest travel times from a node to several nodes with a single Dijkstra, stopped at the largest
+    landmark upper bound of the travel times to the targets (min over the landmarks L of d(source, L) + d(L, target)).
+
+    Args:
+        `index` (`dict`): The travel-time index, as returned by `build_index` or `load_or_build_index`.
+        `source`: Node id of the origin.
+        `targets` (`list`): Node ids of the destinations.
+
+    Returns:
+        `np.ndarray`: The travel time to each destination (`inf` if not reachable).
+    """
+    source = index['node_ids'].get_loc(source)
+    targets = index['node_ids'].get_indexer(targets)
+    if (targets < 0).any():
+        raise KeyError("Unknown target nodes")
+    upper_bounds = (index['to_landmarks'][:, source][:, None] + index['from_landmarks'][:, targets]).min(axis=0)
+    limit = upper_bounds.max() if len(targets) else 0.0
+    return csgraph.dijkstra(index['_graph'], directed=True, indices=source, limit=limit)[targets]
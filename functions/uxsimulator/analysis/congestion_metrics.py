@@ -18,6 +18,38 @@ def _completed_vehicles(
     return df[df['link'] == 'trip_end']['vehicle_id'].tolist()
 
 
+def _vehicle_keys(
+    df: pd.DataFrame
+) -> list:
+    """
+    Columns identifying a vehicle: `vehicle_id`, preceded by `hour` when the DataFrame contains several hours
+    (vehicle names are reused in the simulation of each hour).
+    """
+    return ['hour', 'vehicle_id'] if 'hour' in df.columns else ['vehicle_id']
+
+
+def _ids(
+    df: pd.DataFrame,
+    keys: list
+) -> list:
+    """
+    Ids of the vehicles in `df`: vehicle ids, or (hour, vehicle id) tuples for several hours.
+    """
+    if len(keys) == 1:
+        return df[keys[0]].tolist()
+    return list(df[keys].itertuples(index=False, name=None))
+
+
+def _time_to_next_record(
+    df: pd.DataFrame,
+    keys: list
+) -> pd.Series:
+    """
+    Time between each record of a vehicle and its next one (NaN for the last record), without modifying `df`.
+    """
+    return -df.groupby(keys)['t'].diff(-1)
+
+
 def _are_stuck_vehicles(
     df: pd.DataFrame,
     n: int
@@ -27,33 +59,27 @@ def _are_stuck_vehicles(
 
     Args:
         `df` (`pd.DataFrame`): DataFrame containing vehicle trajectory data with
-                           columns `vehicle_id`, `link`, `t`.
+                           columns `vehicle_id`, `link`, `t` (and `hour`, for several hours).
         `n` (`int`): Number of consecutive minutes while stuck.
 
     Returns:
-        Id of the vehicles identified as stuck.
-    """
-    df_ended = _completed_vehicles(df)
-    df = df[~df['vehicle_id'].isin(df_ended)]
-    stuck_vehicles = []
-    grouped = df.groupby('vehicle_id')
-
-    for vehicle_id, group in grouped:
-        group = (
-            group
-            .sort_values(by='t', ascending=False)
-            .reset_index(drop=True)
-        )
-        if group.loc[0, 'link'] == "waiting_at_origin_node" or group.loc[0, 'link'] == "trip_aborted":
-            stuck_vehicles.append(vehicle_id)
-        elif len(group) == 1:
-            stuck_vehicles.append(vehicle_id)
-        else:
-            t1 = group.loc[0, 't']
-            t0 = group.loc[1, 't']
-            if t1-t0 > n * 60:
-                stuck_vehicles.append(vehicle_id)
-    return stuck_vehicles
+        Id of the vehicles identified as stuck (tuples `(hour, vehicle_id)` for several hours).
+    """
+    keys = _vehicle_keys(df)
+    ended = df.loc[df['link'] == 'trip_end', keys]
+    df = df[~pd.MultiIndex.from_frame(df[keys]).isin(pd.MultiIndex.from_frame(ended))]
+    df = df.sort_values(by=keys + ['t'], kind='stable')
+
+    grouped = df.groupby(keys, sort=False)
+    last = grouped.nth(-1)
+    t_previous = grouped['t'].shift(1).loc[last.index]
+
+    stuck = (
+        last['link'].isin(["waiting_at_origin_node", "trip_aborted"])
+        | t_previous.isna()
+        | (last['t'] - t_previous > n * 60)
+    )
+    return _ids(last[stuck], keys)
 
 
 def _have_been_stuck_vehicles(
@@ -66,16 +92,16 @@ def _have_been_stuck_vehicles(
 
     Args:
         `df` (`pd.DataFrame`): DataFrame containing vehicle trajectory data with
-                        columns `vehicle_id` and `t`.
+                        columns `vehicle_id` and `t` (and `hour`, for several hours).
         `n` (`int`): Number of consecutive minutes while stuck.
 
     Returns:
-        Id of the vehicles identified as stuck.
+        Id of the vehicles identified as stuck (tuples `(hour, vehicle_id)` for several hours).
     """
-    df['duration_on_link'] = -df.groupby('vehicle_id')['t'].diff(-1)
-    df['is_stuck'] = df['duration_on_link'] > 60 * n
-    tmp = (df.groupby('vehicle_id')['is_stuck'].sum()>0).reset_index()
-    return list(tmp.loc[tmp['is_stuck'],'vehicle_id'].unique())      
+    keys = _vehicle_keys(df)
+    is_stuck = _time_to_next_record(df, keys) > 60 * n
+    stuck = df.loc[is_stuck, keys].drop_duplicates().sort_values(by=keys)
+    return _ids(stuck, keys)
 
 
 def identify_hourly_vehicles(
@@ -157,6 +183,38 @@ def count_hourly_vehicles(
         return 0
 
 
+def count_vehicles(
+    type_veh: str,
+    list_hours: list = [i for i in range(24)],
+    list_seeds: list = [0],
+    namefile_vehicles: str = "UXsim_vehicles/AreaVerde_vehicles_ALL_v7",
+    datapath: str = "data/results",
+    n_stuck: int|None = 5,
+    n_jobs: int = 1
+) -> pd.DataFrame:
+    """
+    Runs `count_hourly_vehicles` for all the hours and seeds, in parallel if `n_jobs` is not 1.
+
+    Args:
+        `type_veh` (`str`): Type of vehicles to count - "stuck", "full_stuck" or "completed".
+        `list_hours` (`list`, optional): Hours to process. Defaults to all the 24 hours.
+        `list_seeds` (`list`, optional): Seeds to process. Defaults to [0].
+        `namefile_vehicles` (`str`, optional): Base filename for vehicle data. Defaults to "UXsim_vehicles/AreaVerde_vehicles_ALL_v7".
+        `datapath` (`str`, optional): Path to the simulation output data files. Defaults to "data/results".
+        `n_stuck` (`int`, optional): Number of minutes to consider for detecting stuck vehicles. Defaults to 5.
+        `n_jobs` (`int`, optional): Number of processes, -1 to use all the cores. Defaults to 1.
+
+    Returns:
+        `pd.DataFrame`: The counts, with columns `seed`, `hour` and `count`.
+    """
+    tasks = [(hour, seed) for seed in list_seeds for hour in list_hours]
+    counts = uxsimulator.analysis.utils.map_hours_seeds(
+        count_hourly_vehicles, tasks=tasks, n_jobs=n_jobs, type_veh=type_veh,
+        namefile_vehicles=namefile_vehicles, datapath=datapath, n_stuck=n_stuck
+    )
+    return pd.DataFrame({'seed': [seed for _, seed in tasks], 'hour': [hour for hour, _ in tasks], 'count': counts})
+
+
 def _stucking_links(
     df: pd.DataFrame, 
     n: int = 5
@@ -166,30 +224,26 @@ def _stucking_links(
 
     Args:
         `df` (`pd.DataFrame`): DataFrame containing vehicle trajectory data with columns
-                        `vehicle_id`, `link`, and `t`.
+                        `vehicle_id`, `link`, and `t` (and `hour`, for several hours).
         `n` (`int`, optional): Number of consecutive positions to check for immobility. Default to 5.
 
     Returns:
         `pd.DataFrame`: DataFrame with links statistics including stuck vehicle counts and percentages.
-                    Columns include 'link', 'stuck_count', 'total_count', and 'stuck_percentage'.
-    """
-    df['duration_on_link'] = -df.groupby('vehicle_id')['t'].diff(-1)
-    df['is_stuck'] = (df['duration_on_link'] > 60 * n)
-    stuck_counts = (
-        df
-        [df['is_stuck']]
-        ['link']
-        .value_counts()
-        .reset_index(name='stuck_count')
-    )
-    
-    total_counts = df.groupby('link').size().reset_index(name='total_count')
-    
-    link_stats = pd.merge(stuck_counts, total_counts, on='link', how='right')
+                    Columns include 'link', 'stuck_count', 'total_count', and 'stuck_percentage'
+                    (and 'hour', for several hours).
+    """
+    keys = _vehicle_keys(df)
+    link_keys = keys[:-1] + ['link']
+    is_stuck = _time_to_next_record(df, keys) > 60 * n
+
+    total_counts = df.groupby(link_keys).size()
+    stuck_counts = df[is_stuck].groupby(link_keys).size().reindex(total_counts.index)
+
+    link_stats = pd.DataFrame({'stuck_count': stuck_counts, 'total_count': total_counts}).reset_index()
     link_stats['stuck_count'] = link_stats['stuck_count'].fillna(0)
     link_stats['stuck_percentage'] = (link_stats['stuck_count'] / link_stats['total_count']) * 100
     
-    link_stats = link_stats[link_stats['link'].apply(uxsimulator.analysis.utils.is_valid_string)]
+    link_stats = link_stats[uxsimulator.analysis.utils.is_valid_string_series(link_stats['link'])]
     return link_stats
 
 
@@ -217,3 +271,84 @@ def identify_hourly_stucking_links(
     vehicles = uxsimulator.analysis.utils.read_output(namefile=f"{namefile_vehicles}_{name_iter}.csv",
                                  datapath=datapath, dtype={0: str}).rename(columns={'name':'vehicle_id'})
     return _stucking_links(vehicles, n_stuck)
+
+
+def _read_vehicles(
+    list_hours: list,
+    seed: int = 0,
+    namefile_vehicles: str = "UXsim_vehicles/AreaVerde_vehicles_ALL_v7",
+    datapath: str = "data/results"
+) -> pd.DataFrame:
+    """
+    Reads the vehicle outputs of several hours of a seed in a single DataFrame, with the `hour` of each record.
+    """
+    vehicles = []
+    for hour in list_hours:
+        name_iter = f"from_{hour}_to_{hour+1}_seed_{seed}"
+        vehicles.append(
+            uxsimulator.analysis.utils.read_output(namefile=f"{namefile_vehicles}_{name_iter}.csv",
+                                                   datapath=datapath, dtype={0: str})
+            .rename(columns={'name': 'vehicle_id'})
+            .assign(hour=hour)
+        )
+    return pd.concat(vehicles, ignore_index=True)
+
+
+def identify_vehicles(
+    type_veh: str,
+    list_hours: list = [i for i in range(24)],
+    seed: int = 0,
+    namefile_vehicles: str = "UXsim_vehicles/AreaVerde_vehicles_ALL_v7",
+    datapath: str = "data/results",
+    n_stuck: int|None = 5
+) -> pd.DataFrame:
+    """
+    As `identify_hourly_vehicles`, for all the given hours of a seed in a single call.
+
+    Args:
+        `type_veh` (`str`): Type of vehicles to identify - "stuck", "full_stuck" or "completed".
+        `list_hours` (`list`, optional): Hours to process. Defaults to all the 24 hours.
+        `seed` (`int`, optional): Simulation randomization seed. Defaults to 0.
+        `namefile_vehicles` (`str`, optional): Base filename for vehicle data. Defaults to "UXsim_vehicles/AreaVerde_vehicles_ALL_v7".
+        `datapath` (`str`, optional): Path to the simulation output data files. Defaults to "data/results".
+        `n_stuck` (`int`, optional): Number of minutes to consider for detecting stuck vehicles. Defaults to 5.
+
+    Returns:
+        `pd.DataFrame`: The identified vehicles, with columns `hour` and `vehicle_id`.
+    """
+    vehicles = _read_vehicles(list_hours=list_hours, seed=seed, namefile_vehicles=namefile_vehicles, datapath=datapath)
+
+    if type_veh == "stuck":
+        ids = _are_stuck_vehicles(vehicles, n_stuck)
+    elif type_veh == "full_stuck":
+        ids = _have_been_stuck_vehicles(vehicles, n_stuck)
+    elif type_veh == "completed":
+        ids = list(vehicles.loc[vehicles['link'] == 'trip_end', ['hour', 'vehicle_id']].itertuples(index=False, name=None))
+    else:
+        ids = []
+    return pd.DataFrame(ids, columns=['hour', 'vehicle_id'])
+
+
+def identify_stucking_links(
+    list_hours: list = [i for i in range(24)],
+    seed: int = 0,
+    namefile_vehicles: str = "UXsim_vehicles/AreaVerde_vehicles_ALL_v7",
+    datapath: str = "data/results",
+    n_stuck: int = 5,
+) -> pd.DataFrame:
+    """
+    As `identify_hourly_stucking_links`, for all the given hours of a seed in a single call.
+
+    Args:
+        `list_hours` (`list`, optional): Hours to process. Defaults to all the 24 hours.
+        `seed` (`int`, optional): Simulation randomization seed. Defaults to 0.
+        `namefile_vehicles` (`str`, optional): Base filename for vehicle data. Defaults to "UXsim_vehicles/AreaVerde_vehicles_ALL_v7".
+        `datapath` (`str`, optional): Path to the simulation output data files. Defaults to "data/results".
+        `n_stuck` (`int`, optional): Number of minutes to consider for detecting stuck vehicles. Defaults to 5.
+
+    Returns:
+        `pd.DataFrame`: Link statistics per hour, with columns `hour`, `link`, `stuck_count`, `total_count` and
+                        `stuck_percentage`.
+    """
+    vehicles = _read_vehicles(list_hours=list_hours, seed=seed, namefile_vehicles=namefile_vehicles, datapath=datapath)
+    return _stucking_links(vehicles, n_stuck)
@@ -1,6 +1,56 @@
 import pandas as pd
 import uxsimulator.analysis.utils
+import uxsimulator.analysis.seed_stats
 import numpy as np
+import os
+import tempfile
+
+
+def link_table_from_slots(
+    slots: pd.DataFrame,
+    t_start: float|None = None,
+    t_end: float|None = None
+) -> pd.DataFrame:
+    """
+    Aggregates the time-sliced link table produced by `uxsimulator.observers.LinkAggregator` over a time
+    window, returning it in the same schema of `W.analyzer.link_to_pandas()`.
+
+    Args:
+        slots (pd.DataFrame): Time-sliced link table, one row per link and slot.
+        t_start (float, optional): Start of the window in seconds. Defaults to the beginning of the simulation.
+        t_end (float, optional): End of the window in seconds. Defaults to the end of the simulation.
+
+    Returns:
+        pd.DataFrame: Link table with columns `link`, `start_node`, `end_node`, `traffic_volume`, `vehicles_remain`,
+                      `free_travel_time`, `average_travel_time`, `stddiv_travel_time`, `delay_ratio` and `length`.
+    """
+    t_start = slots['t_start'].min() if t_start is None else t_start
+    t_end = slots['t_end'].max() if t_end is None else t_end
+    keys = ['link', 'start_node', 'end_node', 'free_travel_time', 'length']
+
+    # Vehicles remaining on the link at the end of the window, from all the slots before its end
+    remain = (
+        slots[slots['t_end'] <= t_end]
+        .assign(vehicles_remain=lambda x: x['inflow'] - x['outflow'])
+        .groupby('link', sort=False)['vehicles_remain'].sum()
+    )
+    links = (
+        slots[(slots['t_start'] >= t_start) & (slots['t_end'] <= t_end)]
+        .groupby(keys, sort=False)[['outflow', 'tt_count', 'tt_sum', 'tt_sumsq']].sum()
+        .reset_index()
+        .rename(columns={'outflow': 'traffic_volume'})
+    )
+    links['vehicles_remain'] = links['link'].map(remain).fillna(0)
+
+    has_tt = links['tt_count'] > 0
+    count = links['tt_count'].where(has_tt, 1)
+    average = links['tt_sum'] / count
+    links['average_travel_time'] = average.where(has_tt, -1)
+    links['stddiv_travel_time'] = np.sqrt((links['tt_sumsq'] / count - average**2).clip(lower=0)).where(has_tt, -1)
+    links['delay_ratio'] = links['average_travel_time'] / links['free_travel_time']
+
+    return links[['link', 'start_node', 'end_node', 'traffic_volume', 'vehicles_remain', 'free_travel_time', 
+                  'average_travel_time', 'stddiv_travel_time', 'delay_ratio', 'length']]
 
 
 def _calculate_hourly_traffic(
@@ -9,6 +59,7 @@ def _calculate_hourly_traffic(
     datapath: str,
     namefile_nodes: str,
     namefile_traffic: str,
+    from_slots: bool|None = None
 ) -> pd.DataFrame:
     """
     Creates a DataFrame containing traffic information for a specific hour, including 
@@ -17,21 +68,136 @@ def _calculate_hourly_traffic(
     Args:
         hour (int): The hour for which the link traffic data is generated.
         datapath (str, optional): Path to the simulation output data files. Defaults to "data/results".
+        from_slots (bool, optional): Whether the link traffic was saved as a time-sliced table by the 
+                                     `LinkAggregator` during the simulation, in `{namefile_traffic}_slots_*.parquet`.
+                                     Defaults to None (whether the time-sliced table exists).
 
     Returns:
         pd.DataFrame: A DataFrame with traffic information, including link-specific traffic 
                       data and corresponding geographical coordinates.
     """
     name_iter = f"from_{hour}_to_{hour+1}_seed_{seed}"
-    traffic = uxsimulator.analysis.utils.read_output(namefile=f"{namefile_traffic}_{name_iter}.csv", datapath=datapath)
-    nodes = uxsimulator.analysis.utils.read_output(namefile=f"{namefile_nodes}.csv", datapath=datapath, namecols=['node_id', 'x', 'y', 'AV_position'])
+    namefile_slots = f"{datapath}/{namefile_traffic}_slots_{name_iter}.parquet"
+    if from_slots is None:
+        from_slots = os.path.exists(namefile_slots)
+    if from_slots:
+        traffic = link_table_from_slots(pd.read_parquet(namefile_slots))
+    else:
+        traffic = uxsimulator.analysis.utils.read_output(namefile=f"{namefile_traffic}_{name_iter}.csv", datapath=datapath)
+    network = uxsimulator.analysis.utils.network_index(datapath, namefile_nodes=namefile_nodes)
     
+    # The slot table has the node names of the World (str), the CSV file the node ids as read
+    node_dtype = network['nodes']['node_id'].dtype
+    for col in ('start_node', 'end_node'):
+        if traffic[col].dtype != node_dtype:
+            traffic[col] = traffic[col].astype(node_dtype)
     traffic[traffic['average_travel_time'] < 0] = None
-    return (
-        traffic
-        .merge(nodes.rename(columns={'node_id': 'start_node', 'x': 'x_origin', 'y': 'y_origin'}), on='start_node')
-        .merge(nodes.rename(columns={'node_id': 'end_node', 'x': 'x_dest', 'y': 'y_dest'}), on='end_node')
-    )
+
+    # Coordinates and AV position of the start and end nodes, by position in the network index (links whose
+    # nodes are unknown are dropped, as by an inner merge)
+    start = uxsimulator.analysis.utils.lookup_codes(network['node_index'], traffic['start_node'])
+    end = uxsimulator.analysis.utils.lookup_codes(network['node_index'], traffic['end_node'])
+    known = (start >= 0) & (end >= 0)
+    if len(traffic) and not known.any():
+        raise ValueError(f"None of the links of {namefile_traffic}_{name_iter} has its nodes in {namefile_nodes}")
+    traffic = traffic[known].reset_index(drop=True)
+    start, end = start[known], end[known]
+    for col, values in (('x_origin', network['node_x'][start]), ('y_origin', network['node_y'][start]),
+                        ('AV_position_x', network['node_av'][start]), ('x_dest', network['node_x'][end]),
+                        ('y_dest', network['node_y'][end]), ('AV_position_y', network['node_av'][end])):
+        traffic[col] = values
+    return traffic
+
+
+_LINK_HOUR_COLUMNS = ['link','start_node', 'end_node','length', 'x_origin', 'y_origin', 'AV_position_x', 'x_dest', 'y_dest',
+       'AV_position_y', 'hour']
+
+
+def _average_traffic_seeds(
+    traffic: pd.DataFrame
+) -> pd.DataFrame:
+    """
+    Averages the link traffic across the seeds, for each link and hour (the standard deviation of the travel
+    time is averaged as a variance).
+    """
+    traffic['var_travel_time'] = traffic['stddiv_travel_time']**2
+    traffic = traffic.groupby(_LINK_HOUR_COLUMNS).mean(numeric_only=True).reset_index()
+    traffic['stddiv_travel_time'] = np.sqrt(traffic['var_travel_time'])
+    traffic.drop(columns=['var_travel_time'], inplace=True)
+    return traffic
+
+
+def _traffic_from_statistics(
+    stats: pd.DataFrame
+) -> pd.DataFrame:
+    """
+    Returns the link traffic averaged across the seeds from its summary statistics, as `_average_traffic_seeds`.
+    """
+    traffic = uxsimulator.analysis.seed_stats.finalize(stats, keys=_LINK_HOUR_COLUMNS)
+    traffic = traffic[_LINK_HOUR_COLUMNS + [col for col in traffic.columns if col.endswith('_mean')]]
+    traffic.columns = _LINK_HOUR_COLUMNS + [col[:-len('_mean')] for col in traffic.columns[len(_LINK_HOUR_COLUMNS):]]
+    traffic['stddiv_travel_time'] = np.sqrt(traffic['var_travel_time'])
+    return traffic.drop(columns=['var_travel_time'])
+
+
+def add_seed_to_traffic_statistics(
+    seed: int,
+    namefile_nodes: str,
+    namefile_traffic: str,
+    namefile_stats: str,
+    list_hours: list = [i for i in range(24)],
+    datapath: str = "data/results",
+    from_slots: bool|None = None
+) -> pd.DataFrame:
+    """
+    Adds the link traffic of a new seed to the summary statistics (count, mean and M2 per link and hour, see
+    `seed_stats`) saved in `{datapath}/{namefile_stats}.parquet`, without reading the previous seeds, and returns
+    the link traffic averaged across all the seeds added so far - as `calculate_traffic` with several seeds.
+    A seed already added is skipped.
+
+    Args:
+        seed (int): The new seed.
+        namefile_nodes (str): Base filename for node data.
+        namefile_traffic (str): Base filename for link traffic data.
+        namefile_stats (str): Base filename of the summary statistics.
+        list_hours (list, optional): Hours to process. Defaults to all the 24 hours.
+        datapath (str, optional): Path to the simulation output data files. Defaults to "data/results".
+        from_slots (bool, optional): Whether the link traffic was saved by the `LinkAggregator`. Defaults to None
+            (detected from the saved files).
+
+    Returns:
+        pd.DataFrame: The link traffic averaged across the seeds.
+    """
+    stats, seeds = uxsimulator.analysis.seed_stats.load_statistics(f"{datapath}/{namefile_stats}")
+    if seed not in seeds:
+        traffic = []
+        for h in list_hours:
+            tmp_traffic = _calculate_hourly_traffic(hour=h, seed=seed, datapath=datapath, namefile_nodes=namefile_nodes,
+                                                    namefile_traffic=namefile_traffic, from_slots=from_slots)
+            tmp_traffic['hour'] = h
+            tmp_traffic['seed'] = seed
+            traffic.append(tmp_traffic)
+        traffic = pd.concat(traffic)
+        traffic['var_travel_time'] = traffic['stddiv_travel_time']**2
+        stats = uxsimulator.analysis.seed_stats.add_seed(traffic, seed=seed, keys=_LINK_HOUR_COLUMNS,
+                                                         namefile=f"{datapath}/{namefile_stats}")
+    return _traffic_from_statistics(stats)
+
+
+def _hourly_traffic_task(
+    hour: int,
+    seed: int,
+    path: str,
+    **kwargs
+) -> str:
+    """
+    Computes the link traffic of an (hour, seed) pair and saves it as a partition of the dataset at `path`.
+    Run by the processes of `calculate_traffic`.
+    """
+    traffic = _calculate_hourly_traffic(hour=hour, seed=seed, **kwargs)
+    traffic['hour'] = hour
+    traffic['seed'] = seed
+    return uxsimulator.analysis.utils.save_partition(traffic, path=path, hour=hour, seed=seed)
 
 
 def calculate_traffic(
@@ -39,19 +205,52 @@ def calculate_traffic(
     namefile_traffic: str,
     list_hours: list = [i for i in range(24)],
     list_seeds: list = [0],
-    datapath: str = "data/results"
+    datapath: str = "data/results",
+    from_slots: bool|None = None,
+    n_jobs: int = 1
 ) -> pd.DataFrame:
+    """
+    Creates the link traffic table of all the hours, averaged across the seeds.
+
+    With `n_jobs` other than 1, the (hour, seed) pairs are processed in parallel: each process saves its table
+    as a Parquet partition in a temporary directory, and the partitions are reduced one hour at a time.
+
+    Args:
+        namefile_nodes (str): Base filename for node data.
+        namefile_traffic (str): Base filename for link traffic data.
+        list_hours (list, optional): Hours to process. Defaults to all the 24 hours.
+        list_seeds (list, optional): Seeds to process. Defaults to [0].
+        datapath (str, optional): Path to the simulation output data files. Defaults to "data/results".
+        from_slots (bool, optional): Whether the link traffic was saved by the `LinkAggregator`. Defaults to None
+            (detected from the saved files).
+        n_jobs (int, optional): Number of processes, -1 to use all the cores. Defaults to 1.
+
+    Returns:
+        pd.DataFrame: The link traffic, with the hour (and, with a single seed, the seed) of each row.
+    """
+    kwargs = dict(datapath=datapath, namefile_traffic=namefile_traffic, namefile_nodes=namefile_nodes, from_slots=from_slots)
+    if n_jobs != 1:
+        with tempfile.TemporaryDirectory(dir=datapath) as tmpdir:
+            uxsimulator.analysis.utils.map_hours_seeds(
+                _hourly_traffic_task, tasks=[(h, s) for h in list_hours for s in list_seeds], n_jobs=n_jobs,
+                path=tmpdir, **kwargs
+            )
+            traffic = []
+            for h in list_hours:
+                tmp_traffic = pd.concat([pd.read_parquet(uxsimulator.analysis.utils.partition_path(tmpdir, hour=h, seed=s))
+                                         for s in list_seeds])
+                traffic.append(_average_traffic_seeds(tmp_traffic) if len(list_seeds) > 1 else tmp_traffic)
+        traffic = pd.concat(traffic)
+        if len(list_seeds) > 1:
+            traffic = traffic.sort_values(by=_LINK_HOUR_COLUMNS).reset_index(drop=True)
+        return traffic
+
     for h in list_hours:
         for s in list_seeds:
-            tmp_traffic = _calculate_hourly_traffic(hour=h, seed=s, datapath=datapath, namefile_traffic=namefile_traffic, namefile_nodes=namefile_nodes)
+            tmp_traffic = _calculate_hourly_traffic(hour=h, seed=s, **kwargs)
             tmp_traffic['hour'] = h
             tmp_traffic['seed'] = s
             traffic = tmp_traffic if ((h==list_hours[0])&(s==list_seeds[0])) else pd.concat([traffic, tmp_traffic])
-    cols = ['link','start_node', 'end_node','length', 'x_origin', 'y_origin', 'AV_position_x', 'x_dest', 'y_dest',
-       'AV_position_y', 'hour']
     if len(list_seeds) > 1:
-        traffic['var_travel_time'] = traffic['stddiv_travel_time']**2
-        traffic = traffic.groupby(cols).mean(numeric_only=True).reset_index()
-        traffic['stddiv_travel_time'] = np.sqrt(traffic['var_travel_time'])
-        traffic.drop(columns=['var_travel_time'], inplace=True)
+        traffic = _average_traffic_seeds(traffic)
     return traffic
@@ -0,0 +1,478 @@
+import os.path
+
+import pandas as pd
+import polars as pl
+
+import uxsimulator.dataset
+import uxsimulator.analysis.zone_metrics
+import uxsimulator.analysis.edge_metrics
+
+
+VALID_LINK_PATTERN = r'^[0-9_]+$'
+
+
+def _output_file(
+    datapath: str,
+    namefile: str,
+    hour: int,
+    seed: int
+) -> str:
+    """
+    Path of the output of an (hour, seed) pair: the Parquet file written by the simulation if it exists,
+    the CSV file otherwise.
+    """
+    namefile = f"{datapath}/{namefile}_from_{hour}_to_{hour+1}_seed_{seed}"
+    return f"{namefile}.parquet" if os.path.exists(f"{namefile}.parquet") else f"{namefile}.csv"
+
+
+def _scan_output(
+    namefile: str,
+    schema_overrides: dict|None = None
+) -> pl.LazyFrame:
+    if namefile.endswith(".parquet"):
+        return pl.scan_parquet(namefile)
+    return pl.scan_csv(namefile, schema_overrides=schema_overrides)
+
+
+def scan_vehicles(
+    datapath: str,
+    namefile_vehicles: str,
+    list_hours: list = [i for i in range(24)],
+    list_seeds: list = [0],
+    drop_last_record: bool = False,
+    dataset: str|None = None,
+    run: str|None = None
+) -> pl.LazyFrame:
+    """
+    Lazily scans the vehicle outputs of the given hours and seeds, without loading them. Only the files of the
+    given hours and seeds are scanned, and the columns and rows not needed by a query are not read.
+    With a dataset, the "vehicles" partitions of the run are pruned through its catalog.
+
+    Args:
+        `datapath` (`str`): The base path to the simulation output files.
+        `namefile_vehicles` (`str`): Base filename for vehicle trajectory data.
+        `list_hours` (`list`, optional): Hours to scan. Defaults to all the 24 hours.
+        `list_seeds` (`list`, optional): Seeds to scan. Defaults to [0].
+        `drop_last_record` (`bool`, optional): Whether to drop the last record of each file, as done by
+            `zone_metrics`. Defaults to False.
+        `dataset` (`str`, optional): Root of the partitioned dataset to scan instead of the flat output files.
+            Defaults to None.
+        `run` (`str`, optional): Run of the dataset.
+
+    Returns:
+        `pl.LazyFrame`: The vehicle records, with columns `vehicle_id`, `hour`, `seed` and `row` (position of the
+            record in its file) added to the ones of the output.
+    """
+    if dataset is not None:
+        catalog = uxsimulator.dataset.read_catalog(dataset, table="vehicles", run=run, list_seeds=list_seeds, list_hours=list_hours)
+        partitions = {(entry.hour, entry.seed): entry for entry in catalog.itertuples()}
+
+    frames = []
+    for seed in list_seeds:
+        for hour in list_hours:
+            if dataset is not None:
+                if (hour, seed) not in partitions:
+                    raise FileNotFoundError(f"Missing vehicles partition of run {run}, seed {seed}, hour {hour} in {dataset}")
+                frame = pl.scan_parquet(partitions[hour, seed].path)
+            else:
+                namefile = _output_file(datapath, namefile_vehicles, hour=hour, seed=seed)
+                frame = _scan_output(namefile, schema_overrides={'name': pl.String, 'orig': pl.String, 'link': pl.String})
+            frame = frame.with_row_index('row')
+            if drop_last_record:
+                # Within the query plan, so that the file is not read to count its rows
+                frame = frame.filter(pl.col('row') < pl.len() - 1)
+            frames.append(
+                frame
+                .rename({'name': 'vehicle_id'})
+                .with_columns(pl.col('vehicle_id').cast(pl.String), pl.col('orig').cast(pl.String),
+                              hour=pl.lit(hour, dtype=pl.Int64), seed=pl.lit(seed, dtype=pl.Int64))
+            )
+    return pl.concat(frames, how='diagonal_relaxed')
+
+
+def scan_links(
+    datapath: str,
+    namefile_edges: str
+) -> pl.LazyFrame:
+    """Lazily scans the links of the road network (no header), with `link_id` and `id_zone` columns."""
+    return pl.scan_csv(f"{datapath}/{namefile_edges}.csv", has_header=False,
+                       new_columns=['link_id', 'u','v', 'length', 'maxspeed', 'lanes', 'id_zone'],
+                       schema_overrides={'link_id': pl.String})
+
+
+def scan_nodes(
+    datapath: str,
+    namefile_nodes: str
+) -> pl.LazyFrame:
+    """Lazily scans the nodes of the road network (no header), with `node_id` and `AV_position` columns."""
+    return pl.scan_csv(f"{datapath}/{namefile_nodes}.csv", has_header=False,
+                       new_columns=['node_id', 'x', 'y', 'AV_position'])
+
+
+def _zone_vehicles(
+    datapath: str,
+    namefile_edges: str,
+    namefile_vehicles: str,
+    namefile_nodes: str|None,
+    list_hours: list,
+    list_seeds: list,
+    dataset: str|None = None,
+    run: str|None = None
+) -> pl.LazyFrame:
+    """
+    Query of the vehicle records on valid links, with the zone of the link (`id_zone_link`) and, if the nodes
+    are given, the AV position of the origin - as `zone_metrics._load_hourly_vehicles`.
+    """
+    vehicles = (
+        scan_vehicles(datapath, namefile_vehicles, list_hours=list_hours, list_seeds=list_seeds, drop_last_record=True,
+                      dataset=dataset, run=run)
+        .filter(pl.col('link').str.contains(VALID_LINK_PATTERN))
+        .join(scan_links(datapath, namefile_edges).select('link_id', pl.col('id_zone').alias('id_zone_link')),
+              left_on='link', right_on='link_id', how='left')
+    )
+    if namefile_nodes is not None:
+        vehicles = vehicles.join(scan_nodes(datapath, namefile_nodes).select(pl.col('node_id').cast(pl.String), 'AV_position'),
+                                 left_on='orig', right_on='node_id', how='left')
+    return vehicles
+
+
+def _inflow_query(
+    vehicles: pl.LazyFrame
+) -> pl.LazyFrame:
+    """
+    Query of the long-format inflows and outflows per hour, seed, zone and AV position, as
+    `zone_metrics._inflow_table` (before the pivot).
+    """
+    keys = ['seed', 'hour', 'vehicle_id']
+    same_vehicle = pl.all_horizontal([pl.col(key) == pl.col(key).shift(1) for key in keys]).fill_null(False)
+    is_first = ~same_vehicle
+    is_last = ~same_vehicle.shift(-1).fill_null(False)
+    return (
+        vehicles
+        .sort(keys + ['t', 'row'])
+        # Keep only the rows where the vehicle changes zone
+        .filter(is_first | (pl.col('id_zone_link') != pl.col('id_zone_link').shift(1)).fill_null(True))
+        .with_columns(is_first=is_first, is_last=is_last)
+        .filter(~(pl.col('is_first') & pl.col('is_last')))
+        # The origin and the platoon size are written in every record of a vehicle, so the values of each
+        # row are the ones of the first row
+        .group_by(['seed', 'hour', pl.col('id_zone_link').alias('id_zone'), 'AV_position'])
+        .agg(
+            inflow=pl.when(pl.col('is_first')).then(0).otherwise(pl.col('dn')).sum(),
+            outflow=pl.when(pl.col('is_last')).then(0).otherwise(pl.col('dn')).sum()
+        )
+    )
+
+
+def _starting_query(
+    vehicles: pl.LazyFrame
+) -> pl.LazyFrame:
+    """Query of the trips starting per hour, seed and zone, as `zone_metrics._starting_table`."""
+    return (
+        vehicles
+        .group_by(['seed', 'hour', 'vehicle_id'])
+        .agg(pl.col('id_zone_link').sort_by('row').first().alias('id_zone'))
+        .drop_nulls('id_zone')
+        .group_by(['seed', 'hour', 'id_zone'])
+        .agg(starting_from_zone=pl.col('vehicle_id').n_unique().cast(pl.Int64))
+    )
+
+
+def _traffic_query(
+    vehicles: pl.LazyFrame
+) -> pl.LazyFrame:
+    """Query of the traffic per hour, seed and zone, as `zone_metrics._traffic_table`."""
+    return (
+        vehicles
+        .drop_nulls('id_zone_link')
+        .group_by(['seed', 'hour', pl.col('id_zone_link').alias('id_zone')])
+        .agg(traffic_in_zone=pl.col('vehicle_id').n_unique().cast(pl.Int64))
+    )
+
+
+_ZONE_QUERIES = {"IO": _inflow_query, "S": _starting_query, "T": _traffic_query}
+
+
+def compute_full_tables(
+    datapath: str,
+    namefile_edges: str,
+    namefile_vehicles: str|None = None,
+    namefile_nodes: str|None = None,
+    namefile_save: dict|None = None,
+    table_types: list[str] = ["IO", "S", "T"],
+    list_hours: list = [i for i in range(24)],
+    list_seeds: list = [0],
+    list_zones: list|None = None,
+    streaming: bool = True,
+    dataset: str|None = None,
+    run: str|None = None
+) -> dict:
+    """
+    Polars version of `zone_metrics.compute_full_tables`: the tables are computed by lazy queries over the
+    vehicle outputs, executed with the streaming engine where possible, so that the outputs are never fully
+    loaded in memory. The returned tables have the same schema of the pandas version.
+
+    Args:
+        `datapath` (`str`): Base path to the simulation output files.
+        `namefile_edges` (`str`): Base filename for edge/link data.
+        `namefile_vehicles` (`str`, optional): Base filename for vehicle trajectory data. Not used with a dataset.
+        `namefile_nodes` (`str`, optional): Base filename for node data. Required by "IO".
+        `namefile_save` (`dict`, optional): Base filename to save each full table to, by table type.
+        `table_types` (`list[str]`): Analysis types to perform - "S", "IO" and/or "T".
+        `list_hours` (`list`): Hours to analyze (default: all the 24 hours).
+        `list_seeds` (`list`): Random seeds/simulation runs to process (default: [0]).
+        `list_zones` (`list`, optional): Zones to analyze (default: all the zones).
+        `streaming` (`bool`): Whether to execute the queries with the streaming engine (default: True).
+        `dataset` (`str`, optional): Root of the partitioned dataset whose "vehicles" partitions of the run are
+            scanned (pruned through its catalog, see `scan_vehicles`), instead of the flat output files.
+        `run` (`str`, optional): Run of the dataset.
+
+    Returns:
+        `dict`: The complete analysis tables with averaged results across all seeds, by table type.
+    """
+    for table_type in table_types:
+        if table_type not in _ZONE_QUERIES:
+            raise ValueError(f"Unknown table type {table_type}, expected one of {list(_ZONE_QUERIES)}")
+    if "IO" in table_types and namefile_nodes is None:
+        raise ValueError("namefile_nodes is required by the IO table")
+    namefile_save = namefile_save if namefile_save is not None else {}
+
+    vehicles = _zone_vehicles(datapath=datapath, namefile_edges=namefile_edges, namefile_vehicles=namefile_vehicles,
+                              namefile_nodes=namefile_nodes if "IO" in table_types else None,
+                              list_hours=list_hours, list_seeds=list_seeds, dataset=dataset, run=run)
+    queries = [_ZONE_QUERIES[table_type](vehicles) for table_type in table_types]
+    if list_zones is not None:
+        # Filtered on the results, and pushed down by Polars only where this does not change the counts
+        queries = [query.filter(pl.col('id_zone').is_in(list_zones)) for query in queries]
+    # Executed together, so that the scans shared by the queries are run once
+    results = pl.collect_all(queries, streaming=streaming)
+
+    full_tables = {}
+    for table_type, result in zip(table_types, results):
+        result = result.to_pandas()
+
+        # Split per hour and seed, to give the hourly tables the same schema as the pandas version
+        hourly_tables = []
+        for seed in list_seeds:
+            for hour in list_hours:
+                df_hourly = result[(result['seed'] == seed) & (result['hour'] == hour)].drop(columns=['seed', 'hour'])
+                if table_type == "IO":
+                    df_hourly = uxsimulator.analysis.zone_metrics._transform_inflow_to_dataframe(df_hourly)
+                else:
+                    df_hourly = df_hourly.sort_values(by='id_zone').reset_index(drop=True)
+                hourly_tables.append(uxsimulator.analysis.zone_metrics._label_hourly_table(df_hourly, hour=hour, seed=seed))
+        full_tables[table_type] = uxsimulator.analysis.zone_metrics._full_table(hourly_tables, average=len(list_seeds) > 1)
+
+        if namefile_save.get(table_type) is not None:
+            full_tables[table_type].to_parquet(f"{datapath}/{namefile_save[table_type]}.parquet", index=False)
+    return full_tables
+
+
+def calculate_traffic(
+    namefile_nodes: str,
+    namefile_traffic: str,
+    list_hours: list = [i for i in range(24)],
+    list_seeds: list = [0],
+    datapath: str = "data/results",
+    streaming: bool = True
+) -> pd.DataFrame:
+    """
+    Polars version of `edge_metrics.calculate_traffic` (for link tables saved by `link_to_pandas`), with the
+    same schema.
+
+    Args:
+        `namefile_nodes` (`str`): Base filename for node data.
+        `namefile_traffic` (`str`): Base filename for link traffic data.
+        `list_hours` (`list`, optional): Hours to process. Defaults to all the 24 hours.
+        `list_seeds` (`list`, optional): Seeds to process. Defaults to [0].
+        `datapath` (`str`, optional): Path to the simulation output data files. Defaults to "data/results".
+        `streaming` (`bool`, optional): Whether to execute the query with the streaming engine. Defaults to True.
+
+    Returns:
+        `pd.DataFrame`: The link traffic, with the hour (and, with a single seed, the seed) of each row.
+    """
+    nodes = scan_nodes(datapath, namefile_nodes)
+    node_dtype = nodes.collect_schema()['node_id']
+    frames = []
+    for hour in list_hours:
+        for seed in list_seeds:
+            frames.append(
+                _scan_output(_output_file(datapath, namefile_traffic, hour=hour, seed=seed), schema_overrides={'link': pl.String})
+                .with_row_index('row')
+                .with_columns(pl.col('start_node').cast(node_dtype), pl.col('end_node').cast(node_dtype),
+                              hour=pl.lit(hour, dtype=pl.Int64), seed=pl.lit(seed, dtype=pl.Int64))
+            )
+    traffic = pl.concat(frames, how='diagonal_relaxed')
+    schema = traffic.collect_schema()
+    columns = [col for col in schema.names() if col not in ('row', 'hour', 'seed')]
+
+    # Links without travel time are discarded; the pandas version sets them to missing first, which turns
+    # the integer columns to float
+    is_missing = (pl.col('average_travel_time') < 0).fill_null(False)
+    if traffic.select(is_missing.any()).collect().item():
+        traffic = traffic.with_columns([pl.col(col).cast(pl.Float64) for col in columns if schema[col].is_integer()])
+        nodes = nodes.with_columns(pl.col('node_id').cast(traffic.collect_schema()['start_node']))
+    traffic = (
+        traffic
+        .filter(~is_missing)
+        .join(nodes.rename({'node_id': 'start_node', 'x': 'x_origin', 'y': 'y_origin', 'AV_position': 'AV_position_x'}),
+              on='start_node', how='inner')
+        .join(nodes.rename({'node_id': 'end_node', 'x': 'x_dest', 'y': 'y_dest', 'AV_position': 'AV_position_y'}),
+              on='end_node', how='inner')
+        .sort(['hour', 'seed', 'row'])
+        .select(columns + ['x_origin', 'y_origin', 'AV_position_x', 'x_dest', 'y_dest', 'AV_position_y', 'hour', 'seed'])
+    )
+
+    if len(list_seeds) > 1:
+        keys = uxsimulator.analysis.edge_metrics._LINK_HOUR_COLUMNS
+        numeric = [col for col, dtype in traffic.collect_schema().items() if col not in keys and dtype.is_numeric()]
+        traffic = (
+            traffic
+            .drop_nulls(keys)
+            .with_columns(var_travel_time=pl.col('stddiv_travel_time')**2)
+            .group_by(keys)
+            .agg([pl.col(col).mean() for col in numeric + ['var_travel_time']])
+            .with_columns(stddiv_travel_time=pl.col('var_travel_time').sqrt())
+            .drop('var_travel_time')
+            .sort(keys)
+        )
+        return traffic.collect(streaming=streaming).to_pandas()
+
+    # Same index as the concatenation of the hourly tables
+    traffic = traffic.collect(streaming=streaming).to_pandas()
+    traffic.index = traffic.groupby(['hour', 'seed']).cumcount().to_numpy()
+    return traffic
+
+
+def _congestion_vehicles(
+    datapath: str,
+    namefile_vehicles: str,
+    list_hours: list,
+    list_seeds: list
+) -> pl.LazyFrame:
+    return scan_vehicles(datapath, namefile_vehicles, list_hours=list_hours, list_seeds=list_seeds).select(
+        'seed', 'hour', 'vehicle_id', 'row', 't', 'link')
+
+
+def _with_time_to_next_record(
+    vehicles: pl.LazyFrame,
+    keys: list
+) -> pl.LazyFrame:
+    """
+    Adds the time between each record of a vehicle and its next one in the output (`duration_on_link`,
+    null for the last record).
+    """
+    same_vehicle = pl.all_horizontal([pl.col(key) == pl.col(key).shift(-1) for key in keys]).fill_null(False)
+    return (
+        vehicles
+        .sort(keys + ['row'])
+        .with_columns(duration_on_link=pl.when(same_vehicle).then(pl.col('t').shift(-1) - pl.col('t')))
+    )
+
+
+def count_vehicles(
+    type_veh: str,
+    list_hours: list = [i for i in range(24)],
+    list_seeds: list = [0],
+    namefile_vehicles: str = "UXsim_vehicles/AreaVerde_vehicles_ALL_v7",
+    datapath: str = "data/results",
+    n_stuck: int|None = 5,
+    streaming: bool = True
+) -> pd.DataFrame:
+    """
+    Polars version of `congestion_metrics.count_vehicles`, with the same schema.
+
+    Args:
+        `type_veh` (`str`): Type of vehicles to count - "stuck", "full_stuck" or "completed".
+        `list_hours` (`list`, optional): Hours to process. Defaults to all the 24 hours.
+        `list_seeds` (`list`, optional): Seeds to process. Defaults to [0].
+        `namefile_vehicles` (`str`, optional): Base filename for vehicle data. Defaults to "UXsim_vehicles/AreaVerde_vehicles_ALL_v7".
+        `datapath` (`str`, optional): Path to the simulation output data files. Defaults to "data/results".
+        `n_stuck` (`int`, optional): Number of minutes to consider for detecting stuck vehicles. Defaults to 5.
+        `streaming` (`bool`, optional): Whether to execute the query with the streaming engine. Defaults to True.
+
+    Returns:
+        `pd.DataFrame`: The counts, with columns `seed`, `hour` and `count`.
+    """
+    keys = ['seed', 'hour', 'vehicle_id']
+    vehicles = _congestion_vehicles(datapath, namefile_vehicles, list_hours=list_hours, list_seeds=list_seeds)
+    if type_veh == "stuck":
+        selected = (
+            vehicles
+            .sort(keys + ['t', 'row'])
+            .group_by(keys)
+            .agg(
+                completed=(pl.col('link') == 'trip_end').any(),
+                last_link=pl.col('link').last(),
+                t_last=pl.col('t').last(),
+                t_previous=pl.col('t').shift(1).last(),
+                records=pl.len()
+            )
+            .filter(~pl.col('completed'))
+            .filter(
+                pl.col('last_link').is_in(["waiting_at_origin_node", "trip_aborted"])
+                | (pl.col('records') == 1)
+                | (pl.col('t_last') - pl.col('t_previous') > n_stuck * 60)
+            )
+        )
+    elif type_veh == "full_stuck":
+        selected = (
+            _with_time_to_next_record(vehicles, keys)
+            .filter(pl.col('duration_on_link') > 60 * n_stuck)
+            .select(keys)
+            .unique()
+        )
+    elif type_veh == "completed":
+        selected = vehicles.filter(pl.col('link') == 'trip_end')
+    else:
+        selected = vehicles.filter(pl.lit(False))
+    counts = selected.group_by(['seed', 'hour']).agg(count=pl.len().cast(pl.Int64)).collect(streaming=streaming).to_pandas()
+
+    tasks = pd.DataFrame({'seed': [seed for seed in list_seeds for _ in list_hours],
+                          'hour': [hour for _ in list_seeds for hour in list_hours]})
+    counts = tasks.merge(counts, on=['seed', 'hour'], how='left')
+    counts['count'] = counts['count'].fillna(0).astype(int)
+    return counts
+
+
+def identify_stucking_links(
+    list_hours: list = [i for i in range(24)],
+    seed: int = 0,
+    namefile_vehicles: str = "UXsim_vehicles/AreaVerde_vehicles_ALL_v7",
+    datapath: str = "data/results",
+    n_stuck: int = 5,
+    streaming: bool = True
+) -> pd.DataFrame:
+    """
+    Polars version of `congestion_metrics.identify_stucking_links`, with the same schema.
+
+    Args:
+        `list_hours` (`list`, optional): Hours to process. Defaults to all the 24 hours.
+        `seed` (`int`, optional): Simulation randomization seed. Defaults to 0.
+        `namefile_vehicles` (`str`, optional): Base filename for vehicle data. Defaults to "UXsim_vehicles/AreaVerde_vehicles_ALL_v7".
+        `datapath` (`str`, optional): Path to the simulation output data files. Defaults to "data/results".
+        `n_stuck` (`int`, optional): Number of minutes to consider for detecting stuck vehicles. Defaults to 5.
+        `streaming` (`bool`, optional): Whether to execute the query with the streaming engine. Defaults to True.
+
+    Returns:
+        `pd.DataFrame`: Link statistics per hour, with columns `hour`, `link`, `stuck_count`, `total_count` and
+                        `stuck_percentage`.
+    """
+    keys = ['seed', 'hour', 'vehicle_id']
+    link_stats = (
+        _with_time_to_next_record(
+            _congestion_vehicles(datapath, namefile_vehicles, list_hours=list_hours, list_seeds=[seed]), keys
+        )
+        .group_by(['hour', 'link'])
+        .agg(stuck_count=(pl.col('duration_on_link') > 60 * n_stuck).sum().cast(pl.Int64), total_count=pl.len().cast(pl.Int64))
+        .sort(['hour', 'link'])
+        .collect(streaming=streaming)
+        .to_pandas()
+    )
+    # Links without stuck vehicles have a missing count in the pandas version, hence the float counts
+    if (link_stats['stuck_count'] == 0).any():
+        link_stats['stuck_count'] = link_stats['stuck_count'].astype(float)
+    link_stats['stuck_percentage'] = (link_stats['stuck_count'] / link_stats['total_count']) * 100
+    
+    link_stats = link_stats[link_stats['link'].str.contains(VALID_LINK_PATTERN)]
+    return link_stats
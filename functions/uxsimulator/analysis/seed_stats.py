@@ -0,0 +1,228 @@
+import json
+import os.path
+
+import numpy as np
+import pandas as pd
+
+
+def summarize(
+    df: pd.DataFrame,
+    keys: list,
+    columns: list|None = None
+) -> pd.DataFrame:
+    """
+    Computes the mergeable summary statistics (count, mean and M2, the sum of the squared deviations from the
+    mean) of the given columns for each group of keys. Missing values are not counted.
+
+    Args:
+        df (pd.DataFrame): The results of one or more seeds.
+        keys (list): Columns identifying a group (e.g. ['id_zone', 'hour']).
+        columns (list, optional): Columns to summarize. Defaults to all the numeric columns that are not keys.
+
+    Returns:
+        pd.DataFrame: One row per group, with the keys and the columns {col}_count, {col}_mean and {col}_m2.
+    """
+    if columns is None:
+        columns = [col for col in df.select_dtypes(include='number').columns if col not in keys]
+    grouped = df.groupby(keys)[columns]
+    count = grouped.count()
+    mean = grouped.mean()
+    m2 = grouped.var(ddof=0) * count
+    stats = pd.concat({'count': count, 'mean': mean, 'm2': m2}, axis=1)
+    return _flatten(stats, columns).reset_index()
+
+
+def _flatten(
+    stats: pd.DataFrame,
+    columns: list
+) -> pd.DataFrame:
+    """
+    Turns the (statistic, column) columns of the statistics into {col}_{statistic}, grouped by column.
+    """
+    return pd.DataFrame({f"{col}_{stat}": stats[stat, col] for col in columns for stat in ('count', 'mean', 'm2')},
+                        index=stats.index)
+
+
+def _columns(
+    stats: pd.DataFrame,
+    keys: list
+) -> list:
+    """
+    Returns the summarized columns of the statistics, in order.
+    """
+    return [col[:-len('_count')] for col in stats.columns if col not in keys and col.endswith('_count')]
+
+
+def merge(
+    stats_a: pd.DataFrame,
+    stats_b: pd.DataFrame,
+    keys: list
+) -> pd.DataFrame:
+    """
+    Merges the summary statistics of two disjoint sets of results (e.g. the seeds so far and a new seed) with the
+    parallel update of Chan et al.: n = n_a + n_b, mean = mean_a + delta * n_b / n and
+    M2 = M2_a + M2_b + delta^2 * n_a * n_b / n, where delta = mean_b - mean_a.
+    Groups or columns missing in one of them are taken from the other.
+
+    Args:
+        stats_a (pd.DataFrame): Summary statistics, as returned by summarize.
+        stats_b (pd.DataFrame): Summary statistics, as returned by summarize.
+        keys (list): Columns identifying a group.
+
+    Returns:
+        pd.DataFrame: The summary statistics of the union of the results.
+    """
+    columns = _columns(stats_a, keys) + [col for col in _columns(stats_b, keys) if col not in _columns(stats_a, keys)]
+    a = stats_a.set_index(keys)
+    b = stats_b.set_index(keys)
+    index = a.index.union(b.index, sort=False)
+    a = a.reindex(index)
+    b = b.reindex(index)
+
+    merged = {}
+    for col in columns:
+        n_a = a.get(f"{col}_count", pd.Series(0, index=index)).fillna(0)
+        n_b = b.get(f"{col}_count", pd.Series(0, index=index)).fillna(0)
+        mean_a = a.get(f"{col}_mean", pd.Series(np.nan, index=index))
+        mean_b = b.get(f"{col}_mean", pd.Series(np.nan, index=index))
+        m2_a = a.get(f"{col}_m2", pd.Series(np.nan, index=index))
+        m2_b = b.get(f"{col}_m2", pd.Series(np.nan, index=index))
+
+        n = n_a + n_b
+        delta = mean_b - mean_a
+        mean = (mean_a + delta * n_b / n).where(n_a > 0, mean_b).where(n_b > 0, mean_a)
+        m2 = (m2_a + m2_b + delta**2 * n_a * n_b / n).where(n_a > 0, m2_b).where(n_b > 0, m2_a)
+        merged[f"{col}_count"] = n.astype(int)
+        merged[f"{col}_mean"] = mean
+        merged[f"{col}_m2"] = m2
+    return pd.DataFrame(merged, index=index).sort_index().reset_index()
+
+
+def finalize(
+    stats: pd.DataFrame,
+    keys: list,
+    ddof: int = 1
+) -> pd.DataFrame:
+    """
+    Computes the means and standard deviations from the summary statistics, in the format of
+    zone_metrics._average_seed_results: the keys, then {col}_mean and {col}_std for each column.
+
+    Args:
+        stats (pd.DataFrame): Summary statistics, as returned by summarize or merge.
+        keys (list): Columns identifying a group.
+        ddof (int, optional): Delta degrees of freedom of the standard deviation. Defaults to 1.
+
+    Returns:
+        pd.DataFrame: The means and standard deviations, one row per group (NaN standard deviation with less
+                      than ddof + 1 values, as pandas).
+    """
+    result = stats[keys].copy()
+    for col in _columns(stats, keys):
+        count = stats[f"{col}_count"]
+        result[f"{col}_mean"] = stats[f"{col}_mean"]
+        result[f"{col}_std"] = np.sqrt((stats[f"{col}_m2"] / (count - ddof)).where(count > ddof))
+    return result
+
+
+def convergence(
+    stats: pd.DataFrame,
+    keys: list,
+    z: float = 1.96
+) -> pd.DataFrame:
+    """
+    Computes, for each group and column, the half-width of the confidence interval of the mean across the
+    seeds (z * std / sqrt(n)) relative to the absolute value of the mean.
+
+    Args:
+        stats (pd.DataFrame): Summary statistics, as returned by summarize or merge.
+        keys (list): Columns identifying a group.
+        z (float, optional): Quantile of the normal distribution of the interval. Defaults to 1.96 (95%).
+
+    Returns:
+        pd.DataFrame: The keys and one column per summarized column (NaN with less than two values, or a null mean).
+    """
+    result = stats[keys].copy()
+    for col in _columns(stats, keys):
+        count = stats[f"{col}_count"]
+        std = np.sqrt((stats[f"{col}_m2"] / (count - 1)).where(count > 1))
+        mean = stats[f"{col}_mean"].abs()
+        result[col] = (z * std / np.sqrt(count) / mean.where(mean > 0))
+    return result
+
+
+def is_converged(
+    stats: pd.DataFrame,
+    keys: list,
+    rel_tol: float = 0.05,
+    z: float = 1.96,
+    min_count: int = 2
+) -> bool:
+    """
+    Whether the seed averages have converged: every group with at least min_count values has a relative
+    confidence half-width (see convergence) within rel_tol in all the columns.
+    """
+    relative = convergence(stats, keys=keys, z=z)
+    for col in _columns(stats, keys):
+        enough = stats[f"{col}_count"] >= min_count
+        if not enough.any() or (relative.loc[enough, col].fillna(0) > rel_tol).any():
+            return False
+    return True
+
+
+def load_statistics(
+    namefile: str
+) -> tuple[pd.DataFrame|None, list]:
+    """
+    Loads the summary statistics saved by save_statistics, and the seeds they were computed from.
+
+    Returns:
+        tuple[pd.DataFrame|None, list]: The statistics (None if not yet saved) and the seeds.
+    """
+    if not os.path.exists(f"{namefile}.parquet"):
+        return None, []
+    with open(f"{namefile}.json") as f:
+        seeds = json.load(f)["seeds"]
+    return pd.read_parquet(f"{namefile}.parquet"), seeds
+
+
+def save_statistics(
+    stats: pd.DataFrame,
+    seeds: list,
+    namefile: str
+):
+    """
+    Saves the summary statistics in {namefile}.parquet, and the seeds they were computed from in {namefile}.json.
+    """
+    stats.to_parquet(f"{namefile}.parquet", index=False)
+    with open(f"{namefile}.json", "w") as f:
+        json.dump({"seeds": seeds}, f)
+
+
+def add_seed(
+    df: pd.DataFrame,
+    seed: int,
+    keys: list,
+    namefile: str,
+    columns: list|None = None
+) -> pd.DataFrame:
+    """
+    Updates the summary statistics saved in namefile with the results of a new seed, in O(groups) and
+    without reading the results of the previous seeds. A seed already added is skipped.
+
+    Args:
+        df (pd.DataFrame): The results of the seed.
+        seed (int): The seed.
+        keys (list): Columns identifying a group.
+        namefile (str): Base filename of the statistics (without extension).
+        columns (list, optional): Columns to summarize. Defaults to all the numeric columns that are not keys.
+
+    Returns:
+        pd.DataFrame: The updated summary statistics.
+    """
+    stats, seeds = load_statistics(namefile)
+    if seed in seeds:
+        return stats
+    stats_seed = summarize(df, keys=keys, columns=columns)
+    stats = stats_seed if stats is None else merge(stats, stats_seed, keys=keys)
+    save_statistics(stats, seeds + [seed], namefile)
+    return stats
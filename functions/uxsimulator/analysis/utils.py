@@ -1,5 +1,9 @@
 import pandas as pd
+import numpy as np
 import re
+import os
+import functools
+from concurrent.futures import ProcessPoolExecutor
 
 
 def read_output(
@@ -14,6 +18,130 @@ def read_output(
     return df
 
 
+@functools.lru_cache(maxsize=4)
+def _read_network_index(
+    datapath: str,
+    namefile_edges: str|None,
+    namefile_nodes: str|None,
+    mtimes: tuple
+) -> dict:
+    index = {'links': None, 'nodes': None}
+    if namefile_edges is not None:
+        links = read_output(namefile=f"{namefile_edges}.csv", datapath=datapath, namecols=['link_id', 'u','v', 'length', 'maxspeed', 'lanes', 'id_zone'])
+        index.update(links=links, link_index=pd.Index(links['link_id']), link_zone=links['id_zone'].to_numpy())
+    if namefile_nodes is not None:
+        nodes = read_output(namefile=f"{namefile_nodes}.csv", datapath=datapath, namecols=['node_id', 'x', 'y', 'AV_position'])
+        index.update(nodes=nodes, node_index=pd.Index(nodes['node_id']), node_x=nodes['x'].to_numpy(),
+                     node_y=nodes['y'].to_numpy(), node_av=nodes['AV_position'].to_numpy())
+    return index
+
+
+def network_index(
+    datapath: str,
+    namefile_edges: str|None = None,
+    namefile_nodes: str|None = None
+) -> dict:
+    """
+    Returns the index of the road network, read once per process and shared by all the hours and seeds (until
+    the files change): the `links` and `nodes` tables (`None` if not given), the `link_index` and `node_index`
+    (position of each link/node id) and the arrays of the link attributes (`link_zone`) and of the node
+    attributes (`node_x`, `node_y`, `node_av`), by position. The tables and arrays are shared: do not modify them.
+
+    Args:
+        `datapath` (`str`): The base path to the simulation output files.
+        `namefile_edges` (`str`, optional): Base filename for edge/link data.
+        `namefile_nodes` (`str`, optional): Base filename for node data.
+
+    Returns:
+        `dict`: The index of the network.
+    """
+    mtimes = tuple(os.path.getmtime(f"{datapath}/{namefile}.csv") for namefile in (namefile_edges, namefile_nodes) if namefile is not None)
+    return _read_network_index(datapath, namefile_edges, namefile_nodes, mtimes=mtimes)
+
+
+def lookup_codes(
+    index: pd.Index,
+    keys: pd.Series
+) -> np.ndarray:
+    """
+    Positions of `keys` in `index` (`-1` for the keys not in it), looking up each distinct key once.
+    """
+    codes, uniques = pd.factorize(keys)
+    return np.append(index.get_indexer(uniques), -1)[codes]
+
+
+def take(
+    values: np.ndarray,
+    codes: np.ndarray
+) -> np.ndarray:
+    """
+    `values[codes]`, with missing values where `codes` is `-1` - as a left merge.
+    """
+    if (codes >= 0).all():
+        return values[codes]
+    return np.append(values, np.nan)[codes]
+
+
 def is_valid_string(s: str) -> bool:
     pattern = r'^[0-9_]+$'
-    return bool(re.match(pattern, s))
\ No newline at end of file
+    return bool(re.match(pattern, s))
+
+
+def is_valid_string_series(s: pd.Series) -> pd.Series:
+    """`is_valid_string` over a Series of strings, evaluated once per distinct value."""
+    codes, uniques = pd.factorize(s)
+    valid = np.array([is_valid_string(u) for u in uniques] + [False], dtype=bool)
+    return pd.Series(valid[codes], index=s.index)
+
+
+
+def map_hours_seeds(
+    func,
+    tasks: list[tuple[int, int]],
+    n_jobs: int = 1,
+    **kwargs
+) -> list:
+    """
+    Calls `func(hour=hour, seed=seed, **kwargs)` for each (hour, seed) pair in `tasks`. The pairs are
+    independent, so with `n_jobs` other than 1 they are processed in a pool of processes; `func` and
+    `kwargs` must then be picklable (e.g. `func` defined at module level).
+
+    Args:
+        `func` (`callable`): Function processing a single (hour, seed) pair.
+        `tasks` (`list[tuple[int, int]]`): The (hour, seed) pairs.
+        `n_jobs` (`int`, optional): Number of processes; `-1` (or `None`) uses all the cores. Defaults to 1.
+        `**kwargs`: Further keyword arguments of `func`.
+
+    Returns:
+        `list`: The results of `func`, in the order of `tasks`.
+    """
+    func = functools.partial(func, **kwargs)
+    if n_jobs is None or n_jobs < 0:
+        n_jobs = os.cpu_count()
+    if n_jobs == 1 or len(tasks) <= 1:
+        return [func(hour=hour, seed=seed) for hour, seed in tasks]
+    with ProcessPoolExecutor(max_workers=min(n_jobs, len(tasks))) as executor:
+        futures = [executor.submit(func, hour=hour, seed=seed) for hour, seed in tasks]
+        return [future.result() for future in futures]
+
+
+def partition_path(
+    path: str,
+    hour: int,
+    seed: int
+) -> str:
+    """Path of the Parquet partition of an (hour, seed) pair in the dataset at `path`."""
+    return f"{path}/hour={hour}/seed={seed}.parquet"
+
+
+def save_partition(
+    df: pd.DataFrame,
+    path: str,
+    hour: int,
+    seed: int
+) -> str:
+    """Saves the table of an (hour, seed) pair as a Parquet partition of the dataset at `path`, returning its path."""
+    namefile = partition_path(path, hour=hour, seed=seed)
+    os.makedirs(os.path.dirname(namefile), exist_ok=True)
+    df.to_parquet(namefile)
+    return namefile
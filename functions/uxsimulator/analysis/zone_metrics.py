@@ -1,62 +1,72 @@
 import pandas as pd
-from collections import defaultdict
+import numpy as np
 import os.path
+import tempfile
 
 import uxsimulator.analysis.utils
+import uxsimulator.analysis.seed_stats
+import uxsimulator.dataset
 from io_utils import vprint
 
 
 def _calculate_zone_inflow(
     vehicles: pd.DataFrame
-) -> dict:
+) -> pd.DataFrame:
     """
     Calculates passenger inflows and outflows for each zone by AV position.
     Processes vehicle trajectories to determine how many passengers enter and exit
-    each zone, grouped by the AV position (origin of the vehicle).
+    each zone, grouped by the AV position (origin of the vehicle): each row of a vehicle
+    but the first is an inflow in its zone, each row but the last is an outflow.
 
     Args:
         vehicles (pd.DataFrame): DataFrame containing vehicle trajectory data with
                                 columns for vehicle_id, AV_position, dn (passengers),
-                                and id_zone_link.
+                                and id_zone_link, sorted by vehicle_id (and time).
                                 
     Returns:
-        dict: Nested dictionary with structure {zone: {av_position: {'inflow': n, 'outflow': m}}}
+        pd.DataFrame: Long-format DataFrame with columns id_zone, AV_position, inflow, outflow.
     """
-    # Initialize dictionary variable
-    zone_group_counts = defaultdict(lambda: defaultdict(lambda: {'inflow': 0, 'outflow': 0}))
+    vehicle_id = vehicles['vehicle_id'].to_numpy()
+    n = len(vehicle_id)
+    is_first = np.ones(n, dtype=bool)
+    is_first[1:] = vehicle_id[1:] != vehicle_id[:-1]
+    is_last = np.ones(n, dtype=bool)
+    is_last[:-1] = is_first[1:]
 
-    # Fill dictionary with counts
-    for _, vehicle_df in vehicles.groupby('vehicle_id'):
-        orig, pax = vehicle_df[['AV_position', 'dn']].iloc[0]
-        for i, zone in enumerate(vehicle_df['id_zone_link']):
-            if i != 0:
-                zone_group_counts[zone][orig]['inflow'] += pax
-            if i != vehicle_df.shape[0] - 1:
-                zone_group_counts[zone][orig]['outflow'] += pax
+    # Origin and passengers of each vehicle, taken from its first row
+    first_rows = np.flatnonzero(is_first)
+    sizes = np.diff(np.append(first_rows, n))
+    orig = np.repeat(vehicles['AV_position'].to_numpy()[first_rows], sizes)
+    pax = np.repeat(vehicles['dn'].to_numpy()[first_rows], sizes)
 
-    return zone_group_counts
+    counts = pd.DataFrame({
+        'id_zone': vehicles['id_zone_link'].to_numpy(),
+        'AV_position': orig,
+        'inflow': np.where(is_first, 0, pax),
+        'outflow': np.where(is_last, 0, pax),
+    })
+    return (
+        counts[~(is_first & is_last)]
+        .groupby(['id_zone', 'AV_position'], sort=False, dropna=False)[['inflow', 'outflow']]
+        .sum()
+        .reset_index()
+    )
 
 
-def _transform_inflow_dict_to_dataframe(
-    res_dict: dict
+def _transform_inflow_to_dataframe(
+    res_df: pd.DataFrame
 ) -> pd.DataFrame:
     """
-    Transforms the nested dictionary of zone flows into a wide-format DataFrame.
-    Converts the nested dictionary structure from _compute_zone_passenger_flows into
-    a pivot table with zones as rows and columns for inflow/outflow by AV position.
+    Transforms the long-format zone flows into a wide-format DataFrame.
+    Converts the output of _calculate_zone_inflow into a pivot table with
+    zones as rows and columns for inflow/outflow by AV position.
 
     Args:
-        res_dict (dict): Nested dictionary with structure {zone: {av_position: {'inflow': n, 'outflow': m}}}
+        res_df (pd.DataFrame): Long-format DataFrame with columns id_zone, AV_position, inflow, outflow.
         
     Returns:
         pd.DataFrame: Wide-format DataFrame with zone flows pivoted by AV position.
     """
-    res_df = pd.DataFrame([
-        {'id_zone': zone, 'AV_position': av, 'inflow': counts['inflow'], 'outflow': counts['outflow']}
-        for zone, av_pos in res_dict.items()
-        for av, counts in av_pos.items()
-    ])
-    
     res_df = res_df.pivot(index='id_zone', columns='AV_position', values=['inflow', 'outflow'])
 
     res_df.columns = [f"{col[0]}_from_{col[1]}" for col in res_df.columns]
@@ -88,6 +98,235 @@ def _average_seed_results(
     )
 
 
+def add_seed_to_statistics(
+    seed: int,
+    datapath: str,
+    namefile_edges: str,
+    namefile_stats: dict,
+    namefile_vehicles: str|None = None,
+    namefile_nodes: str|None = None,
+    namefile_save: dict|None = None,
+    list_hours: list = [i for i in range(24)],
+    dataset: str|None = None,
+    run: str|None = None,
+    rel_tol: float = 0.05,
+    verbose: bool = False
+) -> dict:
+    """
+    Adds the hourly tables of a new seed to the summary statistics (count, mean and M2 per zone and hour, see
+    seed_stats) saved in {datapath}/{namefile_stats[table_type]}.parquet, without reading the tables of the
+    previous seeds, and returns the tables averaged across all the seeds added so far - as _average_seed_results
+    on the full tables. A seed already added is skipped.
+
+    Args:
+        seed (int): The new seed.
+        datapath (str): Base path to the simulation output files.
+        namefile_edges (str): Base filename for edge/link data.
+        namefile_stats (dict): Base filename of the summary statistics, by table type
+                        (e.g. {"IO": "AreaVerde_IO_v14_stats"}).
+        namefile_vehicles (str, optional): Base filename for vehicle trajectory data. Required without a dataset.
+        namefile_nodes (str, optional): Base filename for node data. Required by "IO".
+        namefile_save (dict, optional): Base filename of the hourly tables, by table type, as in compute_full_tables.
+        list_hours (list): Hours to analyze (default: all the 24 hours).
+        dataset (str, optional): Root of the partitioned dataset with the simulation output.
+        run (str, optional): Run of the dataset to analyze.
+        rel_tol (float): Relative half-width of the 95% confidence interval of the means within which the seed
+                        averages are reported as converged (default: 0.05).
+        verbose (bool): Whether to print the progress and the convergence of the seed averages.
+
+    Returns:
+        dict: The tables averaged across the seeds, by table type.
+    """
+    keys = ['id_zone', 'hour']
+    table_types = list(namefile_stats)
+    stats = {}
+    missing = []
+    for table_type in table_types:
+        stats[table_type], seeds = uxsimulator.analysis.seed_stats.load_statistics(f"{datapath}/{namefile_stats[table_type]}")
+        if seed not in seeds:
+            missing.append(table_type)
+
+    if missing:
+        network = _read_network(datapath=datapath, namefile_edges=namefile_edges,
+                                namefile_nodes=namefile_nodes if "IO" in missing else None)
+        hourly_tables = {table_type: [] for table_type in missing}
+        for hour in list_hours:
+            if dataset is not None:
+                tables = _load_or_compute_partitioned_tables(missing, hour=hour, seed=seed, dataset=dataset, run=run,
+                                                             datapath=datapath, network=network, namefile_edges=namefile_edges,
+                                                             namefile_nodes=namefile_nodes, verbose=verbose)
+            else:
+                tables = _load_or_compute_hourly_tables(missing, hour=hour, seed=seed, datapath=datapath, network=network,
+                                                        namefile_vehicles=namefile_vehicles, namefile_save=namefile_save or {}, verbose=verbose)
+            for table_type, df_hourly in tables.items():
+                hourly_tables[table_type].append(_label_hourly_table(df_hourly, hour=hour, seed=seed))
+
+        for table_type in missing:
+            df = pd.concat(hourly_tables[table_type]).drop(columns=['seed'])
+            stats[table_type] = uxsimulator.analysis.seed_stats.add_seed(df, seed=seed, keys=keys,
+                                                                         namefile=f"{datapath}/{namefile_stats[table_type]}")
+
+    for table_type in table_types:
+        converged = uxsimulator.analysis.seed_stats.is_converged(stats[table_type], keys=keys, rel_tol=rel_tol)
+        vprint(text=f"...{table_type}: seed averages {'converged' if converged else 'not yet converged'}...", verbose=verbose)
+    return {table_type: uxsimulator.analysis.seed_stats.finalize(stats[table_type], keys=keys) for table_type in table_types}
+
+
+def _read_network(
+    datapath: str,
+    namefile_edges: str,
+    namefile_nodes: str|None = None
+) -> dict:
+    """
+    Returns the index of the links (and, if given, the nodes) of the road network, read once per process.
+
+    Args:
+        datapath (str): The base path to the simulation output files.
+        namefile_edges (str): Base filename for edge/link data.
+        namefile_nodes (str, optional): Base filename for node data.
+
+    Returns:
+        dict: The index of the network, see uxsimulator.analysis.utils.network_index.
+    """
+    return uxsimulator.analysis.utils.network_index(datapath, namefile_edges=namefile_edges, namefile_nodes=namefile_nodes)
+
+
+def _load_hourly_vehicles(
+    hour: int,
+    datapath: str,
+    network: dict,
+    namefile_vehicles: str,
+    av_position: bool = False,
+    seed: int = 0,
+    dataset: str|None = None,
+    run: str|None = None
+) -> pd.DataFrame:
+    """
+    Loads the hourly vehicle output and keeps the rows on valid links, annotated with the zone of the link
+    (id_zone_link) and, if required, with the AV position of the origin (AV_position).
+
+    Args:
+        hour (int): The hour of the vehicle output.
+        datapath (str): The base path to the simulation output files.
+        network (dict): The index of the network, as returned by _read_network.
+        namefile_vehicles (str): Base filename for vehicle trajectory data.
+        av_position (bool): Whether to add the AV position of the origin (the network must have the nodes).
+        seed (int): Simulation seed number.
+        dataset (str, optional): Root of the partitioned dataset to read the "vehicles" partition of the run
+                        from, instead of the flat output file.
+        run (str, optional): Run of the dataset.
+
+    Returns:
+        pd.DataFrame: The vehicle rows, in the order of the output file.
+    """
+    if dataset is not None:
+        vehicles = uxsimulator.dataset.read_partition(dataset, "vehicles", run=run, seed=seed, hour=hour).rename(columns={'name':'vehicle_id'})
+        vehicles['vehicle_id'] = vehicles['vehicle_id'].astype(str)
+        if av_position and vehicles['orig'].dtype != network['nodes']['node_id'].dtype:
+            vehicles['orig'] = vehicles['orig'].astype(network['nodes']['node_id'].dtype)
+    else:
+        name_iter = f"from_{hour}_to_{hour+1}_seed_{seed}"
+        vehicles = uxsimulator.analysis.utils.read_output(namefile=f"{namefile_vehicles}_{name_iter}.csv", datapath=datapath, dtype={0: str}).rename(columns={'name':'vehicle_id'})
+    vehicles = vehicles.iloc[:-1]
+    vehicles = vehicles[uxsimulator.analysis.utils.is_valid_string_series(vehicles['link'])].reset_index(drop=True)
+
+    # Annotation by position in the network index
+    link_codes = uxsimulator.analysis.utils.lookup_codes(network['link_index'], vehicles['link'])
+    vehicles['id_zone_link'] = uxsimulator.analysis.utils.take(network['link_zone'], link_codes)
+    if av_position:
+        node_codes = uxsimulator.analysis.utils.lookup_codes(network['node_index'], vehicles['orig'])
+        vehicles['AV_position'] = uxsimulator.analysis.utils.take(network['node_av'], node_codes)
+    return vehicles
+
+
+def _inflow_table(
+    vehicles: pd.DataFrame
+) -> pd.DataFrame:
+    """
+    Creates the inflow-outflow (IO) table from the vehicle rows returned by _load_hourly_vehicles (with nodes).
+    """
+    vehicles = vehicles.sort_values(['vehicle_id', 't'], kind='stable').reset_index(drop=True)
+    # Keep only the rows where the vehicle changes zone
+    zone = vehicles['id_zone_link']
+    vehicles = vehicles[(zone != zone.shift(1)) | (vehicles['vehicle_id'] != vehicles['vehicle_id'].shift(1))]
+
+    # From vehicles to count dataframe
+    zone_group_counts = _calculate_zone_inflow(vehicles)
+    return _transform_inflow_to_dataframe(zone_group_counts)
+
+
+def _starting_table(
+    vehicles: pd.DataFrame
+) -> pd.DataFrame:
+    """
+    Creates the table of trip starting per zone (S) from the vehicle rows returned by _load_hourly_vehicles.
+    """
+    return (
+        vehicles
+        .groupby(['vehicle_id']).head(1)
+        .rename(columns={'id_zone_link': 'id_zone'})
+        .groupby('id_zone')
+        .agg(starting_from_zone=('vehicle_id', 'nunique'))
+        .reset_index()
+    )
+
+
+def _traffic_table(
+    vehicles: pd.DataFrame
+) -> pd.DataFrame:
+    """
+    Creates the table of traffic per zone (T) from the vehicle rows returned by _load_hourly_vehicles.
+    """
+    return (
+        vehicles
+        .rename(columns={'id_zone_link': 'id_zone'})
+        .groupby('id_zone')
+        .agg(traffic_in_zone=('vehicle_id', 'nunique'))
+        .reset_index()
+    )
+
+
+_HOURLY_TABLES = {"IO": _inflow_table, "S": _starting_table, "T": _traffic_table}
+
+
+def _compute_hourly_tables(
+    table_types: list[str],
+    hour: int,
+    datapath: str,
+    network: dict,
+    namefile_vehicles: str,
+    namefile_save: dict|None = None,
+    seed: int = 0,
+    dataset: str|None = None,
+    run: str|None = None
+) -> dict:
+    """
+    Creates the hourly tables of the given types, loading and merging the vehicle output only once.
+
+    Args:
+        table_types (list[str]): Types of the tables - "IO", "S" and/or "T".
+        hour (int): The hour for which the tables are created.
+        datapath (str): The base path to the simulation output files.
+        network (dict): The index of the network, as returned by _read_network (with the nodes for "IO").
+        namefile_vehicles (str): Base filename for vehicle trajectory data.
+        namefile_save (dict, optional): Base filename to save each table to, by table type.
+        seed (int): Simulation seed number.
+        dataset (str, optional): Root of the partitioned dataset to read the vehicles from.
+        run (str, optional): Run of the dataset.
+
+    Returns:
+        dict: The hourly tables, by table type.
+    """
+    vehicles = _load_hourly_vehicles(hour=hour, datapath=datapath, network=network, namefile_vehicles=namefile_vehicles,
+                                     av_position="IO" in table_types, seed=seed, dataset=dataset, run=run)
+    tables = {}
+    for table_type in table_types:
+        tables[table_type] = _HOURLY_TABLES[table_type](vehicles)
+        if namefile_save is not None and namefile_save.get(table_type) is not None:
+            tables[table_type].to_parquet(f"{datapath}/{namefile_save[table_type]}_from_{hour}_to_{hour+1}_seed_{seed}.parquet", index=False)
+    return tables
+
+
 def _compute_hourly_inflow(
     hour: int,
     datapath: str,
@@ -108,33 +347,9 @@ def _compute_hourly_inflow(
     Returns:
         pd.DataFrame: The resulting IO table DataFrame for the specified hour.
     """
-    # Load initial dataframes
-    name_iter = f"from_{hour}_to_{hour+1}_seed_{seed}"
-    nodes = uxsimulator.analysis.utils.read_output(namefile=f"{namefile_nodes}.csv", datapath=datapath,  namecols=['node_id', 'x', 'y', 'AV_position'])
-    links = uxsimulator.analysis.utils.read_output(namefile=f"{namefile_edges}.csv", datapath=datapath, namecols=['link_id', 'u','v', 'length', 'maxspeed', 'lanes', 'id_zone'])
-    vehicles = uxsimulator.analysis.utils.read_output(namefile=f"{namefile_vehicles}_{name_iter}.csv", datapath=datapath, dtype={0: str}).rename(columns={'name':'vehicle_id'})
-    # Elaborate datasets
-    vehicles = vehicles.iloc[:-1]
-    vehicles = (
-        vehicles[vehicles['link'].apply(uxsimulator.analysis.utils.is_valid_string)]
-        .merge(links[['link_id', 'id_zone']], left_on='link', right_on='link_id', how='left')
-        .drop(columns=['link_id'])
-        .rename(columns={'id_zone':'id_zone_link'})
-        .merge(nodes[['node_id', 'AV_position']], left_on='orig', right_on='node_id', how='left')
-        .drop(columns=['node_id'])
-        .groupby(['vehicle_id'])
-        .apply(lambda group: group[(group['id_zone_link'] != group['id_zone_link'].shift(1)) | (group.index == group.index[0])])
-        .reset_index(drop=True)
-    )
-
-    # From vehicles to count dictionary to count dataframe
-    zone_group_counts = _calculate_zone_inflow(vehicles)
-    df_pivot = _transform_inflow_dict_to_dataframe(zone_group_counts)
-    
-    # Save and return
-    if namefile_save is not None:
-        df_pivot.to_parquet(f"{datapath}/{namefile_save}_{name_iter}.parquet", index=False)
-    return df_pivot
+    network = _read_network(datapath=datapath, namefile_edges=namefile_edges, namefile_nodes=namefile_nodes)
+    return _compute_hourly_tables(["IO"], hour=hour, datapath=datapath, network=network, namefile_vehicles=namefile_vehicles,
+                                  namefile_save={"IO": namefile_save}, seed=seed)["IO"]
 
 
 def _compute_hourly_starting(
@@ -162,27 +377,9 @@ def _compute_hourly_starting(
     Returns:
         pd.DataFrame: DataFrame with zones and their respective trip origin counts.
     """
-    # Load initial dataframes
-    name_iter = f"from_{hour}_to_{hour+1}_seed_{seed}"
-    links = uxsimulator.analysis.utils.read_output(namefile=f"{namefile_edges}.csv", datapath=datapath, namecols=['link_id', 'u','v', 'length', 'maxspeed', 'lanes', 'id_zone'])
-    vehicles = uxsimulator.analysis.utils.read_output(namefile=f"{namefile_vehicles}_{name_iter}.csv", datapath=datapath, dtype={0: str}).rename(columns={'name':'vehicle_id'})
-
-    # Elaborate datasets
-    vehicles = vehicles.iloc[:-1]
-    df_pivot = (
-        vehicles[vehicles['link'].apply(uxsimulator.analysis.utils.is_valid_string)]
-        .groupby(['vehicle_id']).head(1).reset_index()
-        .merge(links[['link_id', 'id_zone']], left_on='link', right_on='link_id', how='left')
-        .drop(columns=['link_id'])
-        .rename({'id_zone_link': 'id_zone'}, axis=1)
-        .groupby('id_zone')
-        .agg(starting_from_zone=('vehicle_id', 'nunique'))
-        .reset_index()
-    )
-    
-    if namefile_save is not None:
-        df_pivot.to_parquet(f"{datapath}/{namefile_save}_{name_iter}.parquet", index=False)
-    return df_pivot
+    network = _read_network(datapath=datapath, namefile_edges=namefile_edges)
+    return _compute_hourly_tables(["S"], hour=hour, datapath=datapath, network=network, namefile_vehicles=namefile_vehicles,
+                                  namefile_save={"S": namefile_save}, seed=seed)["S"]
 
 
 def _compute_hourly_traffic(
@@ -211,99 +408,563 @@ def _compute_hourly_traffic(
     Returns:
         pd.DataFrame: DataFrame with zones and their respective traffic density values.
     """
-    # Load initial dataframes
-    name_iter = f"from_{hour}_to_{hour+1}_seed_{seed}"
-    links = uxsimulator.analysis.utils.read_output(namefile=f"{namefile_edges}.csv", datapath=datapath, namecols=['link_id', 'u','v', 'length', 'maxspeed', 'lanes', 'id_zone'])
-    vehicles = uxsimulator.analysis.utils.read_output(namefile=f"{namefile_vehicles}_{name_iter}.csv", datapath=datapath, dtype={0: str}).rename(columns={'name':'vehicle_id'})
+    network = _read_network(datapath=datapath, namefile_edges=namefile_edges)
+    return _compute_hourly_tables(["T"], hour=hour, datapath=datapath, network=network, namefile_vehicles=namefile_vehicles,
+                                  namefile_save={"T": namefile_save}, seed=seed)["T"]
 
-    # Elaborate datasets
-    vehicles = vehicles.iloc[:-1]
-    df_pivot = (
-        vehicles[vehicles['link'].apply(uxsimulator.analysis.utils.is_valid_string)].reset_index(drop=True)
-        .merge(links[['link_id', 'id_zone']], left_on='link', right_on='link_id', how='left').reset_index(drop=True)
-        .drop(columns=['link_id'])
-        .rename({'id_zone_link': 'id_zone'}, axis=1)
-        .groupby('id_zone')
-        .agg(traffic_in_zone=('vehicle_id', 'nunique'))
-        .reset_index()
-    )
+
+def _load_or_compute_hourly_tables(
+    table_types: list[str],
+    hour: int,
+    seed: int,
+    datapath: str,
+    network: dict,
+    namefile_vehicles: str,
+    namefile_save: dict = {},
+    verbose: bool = False
+) -> dict:
+    """
+    Returns the hourly tables of the given types: those already saved (with the names in namefile_save) are
+    loaded, the missing ones are computed at once (and saved).
+    """
+    tables = {}
+
+    # If the files already exist, load them
+    for table_type in table_types:
+        namefile_hourly = f"{datapath}/{namefile_save.get(table_type)}_from_{hour}_to_{hour+1}_seed_{seed}.parquet"
+        if namefile_save.get(table_type) is not None and os.path.exists(namefile_hourly):
+            tables[table_type] = pd.read_parquet(namefile_hourly)
     
-    # Save and return
-    if namefile_save is not None:
-        df_pivot.to_parquet(f"{datapath}/{namefile_save}_{name_iter}.parquet", index=False)
-    return df_pivot
+    # Compute the missing ones at once
+    missing = [table_type for table_type in table_types if table_type not in tables]
+    if missing:
+        vprint(text=f"...Computing hour {hour}, seed {seed} ({', '.join(missing)})...", verbose=verbose)
+        tables.update(_compute_hourly_tables(missing, hour=hour, datapath=datapath, network=network,
+                                             namefile_vehicles=namefile_vehicles, namefile_save=namefile_save, seed=seed))
+    else:
+        vprint(text=f"...Loading hour {hour}, seed {seed}...", verbose=verbose)
+    return tables
 
 
-def compute_full_table(
+def _network_signature(
+    datapath: str,
+    namefile_edges: str,
+    namefile_nodes: str|None = None
+) -> dict:
+    """
+    Identifies the network files (and their last modification), for the configuration of the tables computed on them.
+    """
+    return {namefile: os.path.getmtime(f"{datapath}/{namefile}.csv")
+            for namefile in (namefile_edges, namefile_nodes) if namefile is not None}
+
+
+def _hourly_table_config(
     table_type: str,
+    source: dict,
+    network: dict
+) -> dict:
+    """
+    Configuration of an hourly table of the dataset: the table is still valid as long as the vehicles partition
+    it was computed from (source, its catalog entry) and the network files are unchanged.
+    """
+    return {"table_type": table_type, "source": [source["config_hash"], source["rows"], source["written_at"]],
+            "network": network}
+
+
+def _vehicles_catalog(
+    dataset: str,
+    run: str,
+    list_hours: list,
+    list_seeds: list
+) -> dict:
+    """
+    Returns the catalog entries of the vehicles partitions of a run, by (hour, seed). Raises FileNotFoundError
+    if some of them are missing.
+    """
+    catalog = uxsimulator.dataset.read_catalog(dataset, table="vehicles", run=run, list_seeds=list_seeds, list_hours=list_hours)
+    sources = {(entry['hour'], entry['seed']): entry for entry in catalog.to_dict('records')}
+    missing = [(hour, seed) for seed in list_seeds for hour in list_hours if (hour, seed) not in sources]
+    if missing:
+        raise FileNotFoundError(f"Missing vehicles partitions of run {run} in {dataset} (hour, seed): {missing}")
+    return sources
+
+
+def _load_or_compute_partitioned_tables(
+    table_types: list[str],
+    hour: int,
+    seed: int,
+    dataset: str,
+    run: str,
+    datapath: str,
+    network: dict,
+    namefile_edges: str,
+    namefile_nodes: str|None = None,
+    verbose: bool = False
+) -> dict:
+    """
+    Returns the hourly tables of the given types from the "zone_{table_type}" partitions of the dataset: the
+    partitions computed from the current vehicles partition and network are loaded, the missing or stale ones
+    are computed at once (and written, with their configuration in the catalog).
+    """
+    source = uxsimulator.dataset.get_partition(dataset, "vehicles", run=run, seed=seed, hour=hour)
+    if source is None:
+        raise FileNotFoundError(f"Missing vehicles partition of run {run}, seed {seed}, hour {hour} in {dataset}")
+
+    tables = {}
+    configs = {}
+    for table_type in table_types:
+        signature = _network_signature(datapath, namefile_edges, namefile_nodes if table_type == "IO" else None)
+        configs[table_type] = _hourly_table_config(table_type, source, signature)
+        entry = uxsimulator.dataset.get_partition(dataset, f"zone_{table_type}", run=run, seed=seed, hour=hour)
+        if entry is not None and entry["config_hash"] == uxsimulator.dataset.config_hash(configs[table_type]):
+            tables[table_type] = uxsimulator.dataset.read_partition(dataset, f"zone_{table_type}", run=run, seed=seed, hour=hour)
+
+    missing = [table_type for table_type in table_types if table_type not in tables]
+    if missing:
+        vprint(text=f"...Computing hour {hour}, seed {seed} ({', '.join(missing)})...", verbose=verbose)
+        computed = _compute_hourly_tables(missing, hour=hour, datapath=datapath, network=network, namefile_vehicles=None,
+                                          seed=seed, dataset=dataset, run=run)
+        for table_type, df_hourly in computed.items():
+            uxsimulator.dataset.write_partition(df_hourly, dataset, f"zone_{table_type}", run=run, seed=seed, hour=hour,
+                                                config=configs[table_type])
+        tables.update(computed)
+    else:
+        vprint(text=f"...Loading hour {hour}, seed {seed}...", verbose=verbose)
+    return tables
+
+
+def _hourly_tables_task(
+    hour: int,
+    seed: int,
+    table_types: list[str],
     datapath: str,
     namefile_edges: str,
     namefile_vehicles: str,
+    namefile_nodes: str|None,
+    namefile_save: dict,
+    dataset: str|None = None,
+    run: str|None = None,
+    verbose: bool = False
+):
+    """
+    Makes sure that the hourly tables of an (hour, seed) pair are saved with the names in namefile_save
+    (or, with a dataset, as its partitions). Run by the processes of compute_full_tables.
+    """
+    network = _read_network(datapath=datapath, namefile_edges=namefile_edges,
+                            namefile_nodes=namefile_nodes if "IO" in table_types else None)
+    if dataset is not None:
+        _load_or_compute_partitioned_tables(table_types, hour=hour, seed=seed, dataset=dataset, run=run, datapath=datapath,
+                                            network=network, namefile_edges=namefile_edges,
+                                            namefile_nodes=namefile_nodes, verbose=verbose)
+    else:
+        _load_or_compute_hourly_tables(table_types, hour=hour, seed=seed, datapath=datapath, network=network,
+                                       namefile_vehicles=namefile_vehicles, namefile_save=namefile_save, verbose=verbose)
+
+
+def _label_hourly_table(
+    df_hourly: pd.DataFrame,
+    hour: int,
+    seed: int
+) -> pd.DataFrame:
+    """
+    Fills the missing counts of an hourly table with zeros and adds its seed and hour.
+    """
+    if df_hourly.isna().sum().sum() > 0:
+        df_hourly.fillna(0, inplace=True)
+    df_hourly['seed'] = seed
+    df_hourly['hour'] = hour
+    return df_hourly
+
+
+def _full_table(
+    hourly_tables: list[pd.DataFrame],
+    average: bool
+) -> pd.DataFrame:
+    """
+    Concatenates the labelled hourly tables and, if required, averages them across the seeds.
+    """
+    df_all = pd.concat(hourly_tables).sort_values(by=['id_zone', 'hour', 'seed']).reset_index(drop=True)
+    if average:
+        df_all = _average_seed_results(df_all)
+    return df_all
+
+
+def _reduce_saved_hourly_tables(
+    read_hourly,
+    list_hours: list,
+    list_seeds: list
+) -> pd.DataFrame:
+    """
+    Builds the full table from the saved hourly tables, read by read_hourly(hour, seed), one hour at a time:
+    only the tables of the seeds of an hour are in memory at once. Equal to _full_table on all the hourly tables.
+    """
+    columns = {}
+    reduced = []
+    for hour in list_hours:
+        hourly_tables = []
+        for seed in list_seeds:
+            df_hourly = read_hourly(hour, seed)
+            hourly_tables.append(_label_hourly_table(df_hourly, hour=hour, seed=seed))
+            columns[seed, hour] = df_hourly.columns
+        reduced.append(_full_table(hourly_tables, average=len(list_seeds) > 1))
+
+    # Same columns, in the same order, as the concatenation of all the hourly tables
+    columns = pd.concat([pd.DataFrame(columns=columns[seed, hour]) for seed in list_seeds for hour in list_hours]).columns
+    if len(list_seeds) > 1:
+        columns = ['id_zone', 'hour'] + [f"{col}_{stat}" for col in columns if col not in ('id_zone', 'hour', 'seed')
+                                         for stat in ('mean', 'std')]
+    sort_by = ['id_zone', 'hour'] if len(list_seeds) > 1 else ['id_zone', 'hour', 'seed']
+    return pd.concat(reduced).reindex(columns=columns).sort_values(by=sort_by).reset_index(drop=True)
+
+
+def compute_full_tables(
+    datapath: str,
+    namefile_edges: str,
+    namefile_vehicles: str|None = None,
+    namefile_nodes: str|None = None,
+    namefile_save: dict|None = None,
+    table_types: list[str] = ["IO", "S", "T"],
+    list_hours: list = [i for i in range(24)],
+    list_seeds: list = [0],
+    n_jobs: int = 1,
+    dataset: str|None = None,
+    run: str|None = None,
+    verbose: bool = False
+) -> dict:
+    """
+    Creates the traffic analysis tables of several types in a single pass over the simulation output:
+    each hourly vehicle file is loaded and merged with the network once for all the table types.
+    Hourly tables already saved (with the names in namefile_save) are loaded instead of computed.
+
+    With a dataset (see uxsimulator.dataset), the vehicles are read from the "vehicles" partitions of the run,
+    and the hourly and full tables are written as its "zone_{table_type}" and "zone_{table_type}_full"
+    partitions. Their catalog entries record what they were computed from: partitions computed from the
+    current vehicles partitions and network are loaded instead of computed, and the full tables of a run that
+    is already aggregated are loaded without touching the hourly ones.
+
+    With n_jobs other than 1, the (hour, seed) pairs are processed in parallel: each process saves its
+    hourly tables as Parquet files (in a temporary directory for the table types not in namefile_save, or as
+    partitions of the dataset), which are then reduced one hour at a time.
+
+    Args:
+        datapath (str): Base path to the simulation output files.
+        namefile_edges (str): Base filename for edge/link data.
+        namefile_vehicles (str, optional): Base filename for vehicle trajectory data. Required without a dataset.
+        namefile_nodes (str, optional): Base filename for node data. Required by "IO".
+        namefile_save (dict, optional): Base filename to save each table to, by table type
+                        (e.g. {"IO": "AreaVerde_IO_v14", "S": "AreaVerde_S_v14", "T": "AreaVerde_T_v14"}).
+                        With a dataset, only the full tables are saved there.
+        table_types (list[str]): Analysis types to perform - "S" (starting points per area),
+                        "IO" (inflow-outflow between zones) and/or "T" (traffic density per zone).
+        list_hours (list): Hours to analyze (default: all the 24 hours).
+        list_seeds (list): Random seeds/simulation runs to process (default: [0]).
+        n_jobs (int): Number of processes, -1 to use all the cores (default: 1).
+        dataset (str, optional): Root of the partitioned dataset with the simulation output.
+        run (str, optional): Run of the dataset to analyze. Required with a dataset.
+        verbose (bool): Whether to print the progress.
+
+    Returns:
+        dict: The complete analysis tables with averaged results across all seeds, by table type.
+    """
+    for table_type in table_types:
+        if table_type not in _HOURLY_TABLES:
+            raise ValueError(f"Unknown table type {table_type}, expected one of {list(_HOURLY_TABLES)}")
+    if "IO" in table_types and namefile_nodes is None:
+        raise ValueError("namefile_nodes is required by the IO table")
+    if dataset is not None and run is None:
+        raise ValueError("run is required with a dataset")
+    if dataset is None and namefile_vehicles is None:
+        raise ValueError("namefile_vehicles is required without a dataset")
+    namefile_save = namefile_save if namefile_save is not None else {}
+    tasks = [(hour, seed) for seed in list_seeds for hour in list_hours]
+
+    full_tables = {}
+    if dataset is not None:
+        # Full tables of the run already aggregated from the same hourly tables
+        sources = _vehicles_catalog(dataset, run=run, list_hours=list_hours, list_seeds=list_seeds)
+        full_configs = {}
+        for table_type in table_types:
+            signature = _network_signature(datapath, namefile_edges, namefile_nodes if table_type == "IO" else None)
+            hourly = [uxsimulator.dataset.config_hash(_hourly_table_config(table_type, sources[hour, seed], signature))
+                      for hour, seed in tasks]
+            full_configs[table_type] = {"table_type": table_type, "hours": list_hours, "seeds": list_seeds, "hourly": hourly}
+            entry = uxsimulator.dataset.get_partition(dataset, f"zone_{table_type}_full", run=run)
+            if entry is not None and entry["config_hash"] == uxsimulator.dataset.config_hash(full_configs[table_type]):
+                vprint(text=f"...Run {run} already aggregated ({table_type})...", verbose=verbose)
+                full_tables[table_type] = uxsimulator.dataset.read_partition(dataset, f"zone_{table_type}_full", run=run)
+    missing = [table_type for table_type in table_types if table_type not in full_tables]
+
+    if missing and dataset is not None and n_jobs != 1:
+        uxsimulator.analysis.utils.map_hours_seeds(
+            _hourly_tables_task, tasks=tasks, n_jobs=n_jobs, table_types=missing, datapath=datapath,
+            namefile_edges=namefile_edges, namefile_vehicles=namefile_vehicles, namefile_nodes=namefile_nodes,
+            namefile_save={}, dataset=dataset, run=run, verbose=verbose
+        )
+        for table_type in missing:
+            read_hourly = lambda hour, seed: uxsimulator.dataset.read_partition(dataset, f"zone_{table_type}", run=run, seed=seed, hour=hour)
+            full_tables[table_type] = _reduce_saved_hourly_tables(read_hourly, list_hours=list_hours, list_seeds=list_seeds)
+
+    elif missing and n_jobs != 1:
+        with tempfile.TemporaryDirectory(dir=datapath) as tmpdir:
+            namefile_hourly = {table_type: namefile_save.get(table_type) or f"{os.path.basename(tmpdir)}/{table_type}"
+                               for table_type in missing}
+            uxsimulator.analysis.utils.map_hours_seeds(
+                _hourly_tables_task, tasks=tasks, n_jobs=n_jobs, table_types=missing, datapath=datapath,
+                namefile_edges=namefile_edges, namefile_vehicles=namefile_vehicles, namefile_nodes=namefile_nodes,
+                namefile_save=namefile_hourly, verbose=verbose
+            )
+            for table_type in missing:
+                read_hourly = lambda hour, seed: pd.read_parquet(f"{datapath}/{namefile_hourly[table_type]}_from_{hour}_to_{hour+1}_seed_{seed}.parquet")
+                full_tables[table_type] = _reduce_saved_hourly_tables(read_hourly, list_hours=list_hours, list_seeds=list_seeds)
+
+    elif missing:
+        network = _read_network(datapath=datapath, namefile_edges=namefile_edges,
+                                namefile_nodes=namefile_nodes if "IO" in missing else None)
+
+        # Iterate over the seeds and hours
+        hourly_tables = {table_type: [] for table_type in missing}
+        for hour, seed in tasks:
+            if dataset is not None:
+                tables = _load_or_compute_partitioned_tables(missing, hour=hour, seed=seed, dataset=dataset, run=run,
+                                                             datapath=datapath, network=network, namefile_edges=namefile_edges,
+                                                             namefile_nodes=namefile_nodes, verbose=verbose)
+            else:
+                tables = _load_or_compute_hourly_tables(missing, hour=hour, seed=seed, datapath=datapath, network=network,
+                                                        namefile_vehicles=namefile_vehicles, namefile_save=namefile_save, verbose=verbose)
+            for table_type, df_hourly in tables.items():
+                hourly_tables[table_type].append(_label_hourly_table(df_hourly, hour=hour, seed=seed))
+
+        # Evaluate results of different simulations (seeds)
+        for table_type in missing:
+            full_tables[table_type] = _full_table(hourly_tables[table_type], average=len(list_seeds) > 1)
+
+    # Save
+    if dataset is not None:
+        for table_type in missing:
+            uxsimulator.dataset.write_partition(full_tables[table_type], dataset, f"zone_{table_type}_full", run=run,
+                                                config=full_configs[table_type])
+    for table_type in table_types:
+        if namefile_save.get(table_type) is not None:
+            full_tables[table_type].to_parquet(f"{datapath}/{namefile_save[table_type]}.parquet", index=False)
+
+    vprint(text=f"Done!", verbose=verbose)
+    return full_tables
+
+
+def compute_full_table(
+    table_type: str,
+    datapath: str,
+    namefile_edges: str,
+    namefile_vehicles: str|None = None,
     namefile_nodes: str|None = None,
     namefile_save: str|None = None,
     list_hours: list = [i for i in range(24)],
     list_seeds: list = [0],
+    n_jobs: int = 1,
+    dataset: str|None = None,
+    run: str|None = None,
     verbose: bool = False
 ) -> pd.DataFrame:
     """
     Creates a comprehensive traffic analysis table for all hours and seeds by computing either 
     starting points (S), inflow-outflow (IO), or traffic density (T) metrics.
+    Use compute_full_tables to compute several table types in a single pass.
 
     Args:
         table_type (str): Analysis type to perform - "S" (starting points per area), 
                         "IO" (inflow-outflow between zones), or "T" (traffic density per zone).
         datapath (str): Base path to the simulation output files.
-        version_save (str): Version identifier for saved output files.
-        total_hours (int): Number of hours to analyze (default: 24).
-        total_seed (int): Number of random seeds/simulation runs to process (default: 1).
-        full_save (bool): Whether to save the aggregated table of all hours and seeds.
-        local_save (bool): Whether to save individual hourly tables per seed.
-        namefile_nodes (str): Base filename for node data.
         namefile_edges (str): Base filename for edge/link data.
-        namefile_vehicles (str): Base filename for vehicle trajectory data.
+        namefile_vehicles (str, optional): Base filename for vehicle trajectory data. Required without a dataset.
+        namefile_nodes (str): Base filename for node data.
+        namefile_save (str): Base filename to save the hourly and the full tables to.
+        list_hours (list): Hours to analyze (default: all the 24 hours).
+        list_seeds (list): Random seeds/simulation runs to process (default: [0]).
+        n_jobs (int): Number of processes, -1 to use all the cores (default: 1).
+        dataset (str, optional): Root of the partitioned dataset with the simulation output, which also caches
+                        the hourly and full tables (instead of the files saved with namefile_save).
+        run (str, optional): Run of the dataset to analyze. Required with a dataset.
+        verbose (bool): Whether to print the progress.
         
     Returns:
         pd.DataFrame: The complete analysis table with averaged results across all seeds.
     """
-    # Iterate over the seeds and hours
+    return compute_full_tables(
+        datapath=datapath, namefile_edges=namefile_edges, namefile_vehicles=namefile_vehicles,
+        namefile_nodes=namefile_nodes, namefile_save={table_type: namefile_save},
+        table_types=[table_type], list_hours=list_hours, list_seeds=list_seeds, n_jobs=n_jobs,
+        dataset=dataset, run=run, verbose=verbose
+    )[table_type]
+
+
+def _slot_flows(
+    vehicles: pd.DataFrame,
+    slots: np.ndarray
+) -> pd.DataFrame:
+    """
+    Calculates the passenger inflows and outflows of each zone by AV position and time slot, as
+    _calculate_zone_inflow: the inflow of a row is counted in its slot, the outflow in the slot of the next row
+    of the vehicle (when it enters the next zone).
+
+    Args:
+        vehicles (pd.DataFrame): The rows where the vehicles change zone, sorted by vehicle_id (and time).
+        slots (np.ndarray): The time slot of each row.
+
+    Returns:
+        pd.DataFrame: Long-format DataFrame with columns slot, id_zone, AV_position, inflow, outflow.
+    """
+    vehicle_id = vehicles['vehicle_id'].to_numpy()
+    n = len(vehicle_id)
+    is_first = np.ones(n, dtype=bool)
+    is_first[1:] = vehicle_id[1:] != vehicle_id[:-1]
+    is_last = np.ones(n, dtype=bool)
+    is_last[:-1] = is_first[1:]
+
+    first_rows = np.flatnonzero(is_first)
+    sizes = np.diff(np.append(first_rows, n))
+    orig = np.repeat(vehicles['AV_position'].to_numpy()[first_rows], sizes)
+    pax = np.repeat(vehicles['dn'].to_numpy()[first_rows], sizes)
+    zone = vehicles['id_zone_link'].to_numpy()
+
+    inflow = pd.DataFrame({'slot': slots[~is_first], 'id_zone': zone[~is_first], 'AV_position': orig[~is_first],
+                           'inflow': pax[~is_first], 'outflow': 0})
+    outflow = pd.DataFrame({'slot': np.append(slots[1:], -1)[~is_last], 'id_zone': zone[~is_last],
+                            'AV_position': orig[~is_last], 'inflow': 0, 'outflow': pax[~is_last]})
+    return (
+        pd.concat([inflow, outflow])
+        .groupby(['slot', 'id_zone', 'AV_position'], sort=False, dropna=False)[['inflow', 'outflow']]
+        .sum()
+        .reset_index()
+    )
+
+
+def _hourly_slot_series(
+    vehicles: pd.DataFrame,
+    hour: int,
+    slot_duration: int
+) -> dict:
+    """
+    Creates the long-format per-slot tables of an hour from the vehicle rows returned by _load_hourly_vehicles
+    (with the AV position). Each vehicle counted in a zone by the hourly tables is counted once, in a slot: the
+    slot where it enters the zone (IO), starts its trip (S) or first appears in the zone (T), so that the slots
+    of an hour add up to its hourly table.
+    """
+    slots_per_day = 24*60*60 // slot_duration
+    vehicles = vehicles.assign(slot=((hour*60*60 + vehicles['t']) // slot_duration).astype(int) % slots_per_day)
+
+    # Inflow and outflow, from the rows where the vehicles change zone
+    changes = vehicles.sort_values(['vehicle_id', 't'], kind='stable').reset_index(drop=True)
+    zone = changes['id_zone_link']
+    changes = changes[(zone != zone.shift(1)) | (changes['vehicle_id'] != changes['vehicle_id'].shift(1))]
+    flows = _slot_flows(changes, slots=changes['slot'].to_numpy())
+
+    starting = (
+        vehicles
+        .groupby(['vehicle_id']).head(1)
+        .groupby(['slot', 'id_zone_link']).size()
+        .rename_axis(['slot', 'id_zone']).rename('starting_from_zone').reset_index()
+    )
+    traffic = (
+        vehicles
+        .drop_duplicates(['vehicle_id', 'id_zone_link'])
+        .groupby(['slot', 'id_zone_link']).size()
+        .rename_axis(['slot', 'id_zone']).rename('traffic_in_zone').reset_index()
+    )
+    return {"IO": flows, "S": starting, "T": traffic}
+
+
+def _slot_series_table(
+    table_type: str,
+    series: list[pd.DataFrame],
+    zones: np.ndarray,
+    slots_per_day: int,
+    n_seeds: int
+) -> pd.DataFrame:
+    """
+    Sums the long-format per-slot tables of all the hours and seeds and averages them across the seeds, on the
+    full grid of zones and slots (a zone without vehicles in a slot counts 0).
+    """
+    grid = pd.MultiIndex.from_product([zones, range(slots_per_day)], names=['id_zone', 'slot'])
+    df = pd.concat(series)
+    if table_type == "IO":
+        df = df.pivot_table(index=['id_zone', 'slot'], columns='AV_position', values=['inflow', 'outflow'],
+                            aggfunc='sum', fill_value=0)
+        df.columns = [f"{col[0]}_from_{col[1]}" for col in df.columns]
+    else:
+        df = df.groupby(['id_zone', 'slot']).sum()
+    df = df.reindex(grid, fill_value=0) / n_seeds
+    df.columns = [f"{col}_mean" for col in df.columns]
+    return df.reset_index()
+
+
+def compute_slot_series(
+    datapath: str,
+    namefile_edges: str,
+    namefile_nodes: str,
+    namefile_vehicles: str|None = None,
+    namefile_save: dict|None = None,
+    table_types: list[str] = ["IO", "S", "T"],
+    list_hours: list = [i for i in range(24)],
+    list_seeds: list = [0],
+    slot_duration: int = 5*60,
+    dataset: str|None = None,
+    run: str|None = None,
+    verbose: bool = False
+) -> dict:
+    """
+    Creates the per-zone time series of inflow-outflow (IO), trips starting (S) and traffic (T) at the resolution
+    of the slots (5 minutes by default), binning the timestamps of the vehicle trajectories: the counts of the
+    slots of an hour add up to the hourly tables of compute_full_tables, but their distribution within the hour
+    comes from the simulation instead of an interpolation. The hours and seeds are processed one at a time and
+    only their per-slot counts are kept.
+
+    The tables are in the shape consumed by the Area Verde model (Simulation/areaverde_simulation.py): one row
+    per zone and slot of the day, in order, with the columns {col}_mean averaged across the seeds (e.g.
+    inflow_from_INSIDE_mean, traffic_in_zone_mean), already per slot.
+
+    Args:
+        datapath (str): Base path to the simulation output files.
+        namefile_edges (str): Base filename for edge/link data.
+        namefile_nodes (str): Base filename for node data.
+        namefile_vehicles (str, optional): Base filename for vehicle trajectory data. Required without a dataset.
+        namefile_save (dict, optional): Base filename to save each table to, by table type
+                        (e.g. {"IO": "AreaVerde_IO_5min_v14", "T": "AreaVerde_T_5min_v14"}).
+        table_types (list[str]): Types of the tables - "IO", "S" and/or "T".
+        list_hours (list): Hours to analyze (default: all the 24 hours).
+        list_seeds (list): Random seeds/simulation runs to process (default: [0]).
+        slot_duration (int): Duration of the slots, in seconds (default: 300).
+        dataset (str, optional): Root of the partitioned dataset with the simulation output.
+        run (str, optional): Run of the dataset to analyze. Required with a dataset.
+        verbose (bool): Whether to print the progress.
+
+    Returns:
+        dict: The time series tables, by table type.
+    """
+    for table_type in table_types:
+        if table_type not in _HOURLY_TABLES:
+            raise ValueError(f"Unknown table type {table_type}, expected one of {list(_HOURLY_TABLES)}")
+    if (24*60*60) % slot_duration != 0:
+        raise ValueError("slot_duration must divide the day")
+    namefile_save = namefile_save if namefile_save is not None else {}
+    network = _read_network(datapath=datapath, namefile_edges=namefile_edges, namefile_nodes=namefile_nodes)
+
+    series = {table_type: [] for table_type in table_types}
     for seed in list_seeds:
         for hour in list_hours:
+            vprint(text=f"...Binning hour {hour}, seed {seed}...", verbose=verbose)
+            vehicles = _load_hourly_vehicles(hour=hour, datapath=datapath, network=network, namefile_vehicles=namefile_vehicles,
+                                             av_position=True, seed=seed, dataset=dataset, run=run)
+            hourly = _hourly_slot_series(vehicles, hour=hour, slot_duration=slot_duration)
+            for table_type in table_types:
+                series[table_type].append(hourly[table_type])
 
-            # If the file already exists, load it
-            if os.path.exists(f"{datapath}/{namefile_save}_from_{hour}_to_{hour+1}_seed_{seed}.parquet"):
-                vprint(text=f"...Loading hour {hour}, seed {seed}...", verbose=verbose)
-                df_hourly = pd.read_parquet(f"{datapath}/{namefile_save}_from_{hour}_to_{hour+1}_seed_{seed}.parquet")
-            
-            # If the file does not exist, create it
-            else:
-                vprint(text=f"...Computing hour {hour}, seed {seed}...", verbose=verbose)
-                if table_type == "IO":
-                    df_hourly = _compute_hourly_inflow(hour=hour, datapath=datapath, 
-                                                    namefile_nodes=namefile_nodes, namefile_edges=namefile_edges, namefile_vehicles=namefile_vehicles,
-                                                    namefile_save=namefile_save, seed=seed)
-                elif table_type == "S":
-                    df_hourly = _compute_hourly_starting(hour=hour, datapath=datapath,
-                                                    namefile_edges=namefile_edges, namefile_vehicles=namefile_vehicles,
-                                                    namefile_save=namefile_save, seed=seed)
-                elif table_type == "T":
-                    df_hourly = _compute_hourly_traffic(hour=hour, datapath=datapath,
-                                                    namefile_edges=namefile_edges, namefile_vehicles=namefile_vehicles,
-                                                    namefile_save=namefile_save, seed=seed)
-            
-            # Elaborate output dataset
-            if df_hourly.isna().sum().sum() > 0:
-                df_hourly.fillna(0, inplace=True)
-            df_hourly['seed'] = seed
-            df_hourly['hour'] = hour
-            df_all = df_hourly if ((seed == list_seeds[0])&(hour==list_hours[0])) else pd.concat([df_all, df_hourly])
-
-    # Evaluate results of different simulations (seeds)
-    df_all = df_all.sort_values(by=['id_zone', 'hour', 'seed']).reset_index(drop=True)
-    if len(list_seeds) > 1:
-        df_all = _average_seed_results(df_all)
+    zones = np.sort(pd.unique(network['link_zone'][pd.notna(network['link_zone'])]))
+    tables = {table_type: _slot_series_table(table_type, series[table_type], zones=zones,
+                                             slots_per_day=24*60*60 // slot_duration, n_seeds=len(list_seeds))
+              for table_type in table_types}
+    for table_type in table_types:
+        if namefile_save.get(table_type) is not None:
+            tables[table_type].to_parquet(f"{datapath}/{namefile_save[table_type]}.parquet", index=False)
 
-    # Save and return
-    if namefile_save is not None:
-        df_all.to_parquet(f"{datapath}/{namefile_save}.parquet", index=False)
     vprint(text=f"Done!", verbose=verbose)
-    return df_all
\ No newline at end of file
+    return tables
@@ -0,0 +1,204 @@
+import glob
+import hashlib
+import json
+import os
+import time
+
+import pandas as pd
+
+
+# Version of the layout of the partitions and of their metadata
+SCHEMA_VERSION = 1
+
+CATALOG_COLUMNS = ["table", "run", "seed", "hour", "path", "schema_version", "rows", "t_min", "t_max",
+                   "config_hash", "written_at"]
+
+
+def config_hash(
+    config
+) -> str:
+    """
+    Returns a stable hash of a JSON-serializable configuration (e.g. the parameters of a simulation, or the
+    inputs an aggregated table was computed from).
+    """
+    return hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def partition_dir(
+    root: str,
+    table: str,
+    run: str,
+    seed: int|None = None,
+    hour: int|None = None
+) -> str:
+    """
+    Returns the directory of a partition of the dataset at `root`, in the Hive layout
+    `{root}/{table}/run={run}/seed={seed}/hour={hour}` (`seed` and `hour` are omitted for the tables aggregated
+    over them).
+    """
+    path = f"{root}/{table}/run={run}"
+    if seed is not None:
+        path += f"/seed={seed}"
+    if hour is not None:
+        path += f"/hour={hour}"
+    return path
+
+
+def write_partition(
+    df: pd.DataFrame,
+    root: str,
+    table: str,
+    run: str,
+    seed: int|None = None,
+    hour: int|None = None,
+    config = None
+) -> dict:
+    """
+    Writes a table as a partition of the dataset at `root`, replacing the previous content of the partition,
+    together with its catalog entry (`_meta.json`): schema version, number of rows, min/max time (if the table
+    has a `t` column) and hash of the configuration.
+    Partitions are independent files, so they can be written by concurrent processes.
+
+    Args:
+        `df` (`pd.DataFrame`): The table.
+        `root` (`str`): Root directory of the dataset.
+        `table` (`str`): Name of the table (e.g. `vehicles`, `links`).
+        `run` (`str`): Name of the run (e.g. the version of the simulation campaign).
+        `seed` (`int`, optional): Seed of the partition.
+        `hour` (`int`, optional): Hour of the partition.
+        `config` (optional): JSON-serializable configuration the table was produced with. Defaults to `None`.
+
+    Returns:
+        `dict`: The catalog entry of the partition.
+    """
+    path = partition_dir(root, table=table, run=run, seed=seed, hour=hour)
+    os.makedirs(path, exist_ok=True)
+    df.to_parquet(f"{path}/data.parquet", index=False)
+
+    has_time = 't' in df.columns and len(df) > 0
+    entry = {
+        "table": table, "run": str(run), "seed": seed, "hour": hour, "path": f"{path}/data.parquet",
+        "schema_version": SCHEMA_VERSION, "rows": len(df),
+        "t_min": float(df['t'].min()) if has_time else None, "t_max": float(df['t'].max()) if has_time else None,
+        "config_hash": config_hash(config), "written_at": time.time(),
+    }
+    # Written last, and atomically: a partition without metadata is not in the catalog
+    with open(f"{path}/_meta.json.tmp", "w") as f:
+        json.dump(entry, f)
+    os.replace(f"{path}/_meta.json.tmp", f"{path}/_meta.json")
+    return entry
+
+
+def get_partition(
+    root: str,
+    table: str,
+    run: str,
+    seed: int|None = None,
+    hour: int|None = None
+) -> dict|None:
+    """
+    Returns the catalog entry of a partition, `None` if the partition does not exist (or has a different
+    schema version).
+    """
+    namefile = f"{partition_dir(root, table=table, run=run, seed=seed, hour=hour)}/_meta.json"
+    if not os.path.exists(namefile):
+        return None
+    with open(namefile) as f:
+        entry = json.load(f)
+    return entry if entry.get("schema_version") == SCHEMA_VERSION else None
+
+
+def read_catalog(
+    root: str,
+    table: str|None = None,
+    run: str|None = None,
+    list_seeds: list|None = None,
+    list_hours: list|None = None
+) -> pd.DataFrame:
+    """
+    Returns the catalog of the dataset at `root`, one row per partition, optionally pruned by table, run,
+    seeds and hours. Only the directories of the selected tables and runs are listed.
+
+    Returns:
+        `pd.DataFrame`: The catalog, with columns `CATALOG_COLUMNS`, sorted by table, run, seed and hour.
+    """
+    pattern = f"{root}/{table if table is not None else '*'}/run={run if run is not None else '*'}/**/_meta.json"
+    entries = []
+    for namefile in glob.glob(pattern, recursive=True):
+        with open(namefile) as f:
+            entry = json.load(f)
+        if entry.get("schema_version") != SCHEMA_VERSION:
+            continue
+        if list_seeds is not None and entry["seed"] not in list_seeds:
+            continue
+        if list_hours is not None and entry["hour"] not in list_hours:
+            continue
+        entries.append(entry)
+    catalog = pd.DataFrame(entries, columns=CATALOG_COLUMNS).astype({"seed": "Int64", "hour": "Int64", "rows": "int64"})
+    return catalog.sort_values(by=["table", "run", "seed", "hour"]).reset_index(drop=True)
+
+
+def read_partition(
+    root: str,
+    table: str,
+    run: str,
+    seed: int|None = None,
+    hour: int|None = None,
+    columns: list|None = None
+) -> pd.DataFrame:
+    """
+    Reads a partition of the dataset at `root`.
+    """
+    return pd.read_parquet(f"{partition_dir(root, table=table, run=run, seed=seed, hour=hour)}/data.parquet", columns=columns)
+
+
+def read_partitions(
+    root: str,
+    table: str,
+    run: str|None = None,
+    list_seeds: list|None = None,
+    list_hours: list|None = None,
+    columns: list|None = None
+) -> pd.DataFrame:
+    """
+    Reads the partitions of a table selected through the catalog (the others are not opened), with the `run`,
+    `seed` and `hour` of each row.
+    """
+    catalog = read_catalog(root, table=table, run=run, list_seeds=list_seeds, list_hours=list_hours)
+    frames = [
+        pd.read_parquet(entry.path, columns=columns).assign(run=entry.run, seed=entry.seed, hour=entry.hour)
+        for entry in catalog.itertuples()
+    ]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=(columns or []) + ["run", "seed", "hour"])
+
+
+def import_flat_outputs(
+    datapath: str,
+    namefile: str,
+    root: str,
+    table: str,
+    run: str,
+    list_hours: list = [i for i in range(24)],
+    list_seeds: list = [0],
+    config = None,
+    dtype = None
+) -> pd.DataFrame:
+    """
+    Imports the flat outputs `{datapath}/{namefile}_from_{hour}_to_{hour+1}_seed_{seed}.(parquet|csv)` in the
+    dataset at `root`. Missing files are skipped.
+
+    Returns:
+        `pd.DataFrame`: The catalog entries of the imported partitions.
+    """
+    entries = []
+    for seed in list_seeds:
+        for hour in list_hours:
+            namefile_flat = f"{datapath}/{namefile}_from_{hour}_to_{hour+1}_seed_{seed}"
+            if os.path.exists(f"{namefile_flat}.parquet"):
+                df = pd.read_parquet(f"{namefile_flat}.parquet")
+            elif os.path.exists(f"{namefile_flat}.csv"):
+                df = pd.read_csv(f"{namefile_flat}.csv", dtype=dtype)
+            else:
+                continue
+            entries.append(write_partition(df, root=root, table=table, run=run, seed=seed, hour=hour, config=config))
+    return pd.DataFrame(entries, columns=CATALOG_COLUMNS).astype({"seed": "Int64", "hour": "Int64", "rows": "int64"})
@@ -0,0 +1,318 @@
+import math
+
+import numpy as np
+import pandas as pd
+import uxsim
+
+
+def attach(
+    W: uxsim.World,
+    *observers
+) -> uxsim.World:
+    """
+    Hooks one or more observers into the simulation loop of the World. Observers are callables taking
+    the World as the only argument, and they are chained after the `user_function` already set (if any),
+    e.g. `online_save_end_vehicles`.
+
+    Args:
+        `W` (`uxsim.World`): The World to be observed.
+        `*observers`: Callables invoked at the end of each simulation timestep.
+
+    Returns:
+        `uxsim.World`: The same World, with the chained `user_function`.
+    """
+    callbacks = [W.user_function] if W.user_function is not None else []
+    callbacks += list(observers)
+
+    def user_function(W):
+        for callback in callbacks:
+            callback(W)
+
+    W.user_function = user_function
+    return W
+
+
+class LinkAggregator:
+    """
+    Streaming link-level aggregator. At each timestep it accumulates, for each link and each time slot
+    (5 minutes by default), the number of vehicles entering and leaving the link, the vehicle-seconds spent
+    on the link and the travel times of the vehicles that left it. All counters are preallocated NumPy arrays
+    of shape `(links, slots)`, so that the memory does not depend on the number of vehicles or on the length
+    of their trajectories.
+
+    The counters are mergeable (sums, sums of squares), hence any coarser table (e.g. the hourly one in the
+    `link_to_pandas` schema, see `edge_metrics.link_table_from_slots`) can be derived exactly from the slots.
+    """
+
+    def __init__(
+        self,
+        W: uxsim.World,
+        slot_duration: int = 60*5
+    ):
+        """
+        Args:
+            `W` (`uxsim.World`): The World, with its network already created and `tmax` set.
+            `slot_duration` (`int`, optional): Duration of the time slots, in seconds. Defaults to `300`.
+        """
+        self.links = list(W.LINKS)
+        self.slot_duration = slot_duration
+        self.n_slots = math.ceil(W.TMAX / slot_duration)
+
+        shape = (len(self.links), self.n_slots)
+        self.inflow = np.zeros(shape)
+        self.outflow = np.zeros(shape)
+        self.vehicle_seconds = np.zeros(shape)
+        self.tt_count = np.zeros(shape)
+        self.tt_sum = np.zeros(shape)
+        self.tt_sumsq = np.zeros(shape)
+
+        self._cum_arrival_old = np.zeros(len(self.links))
+        self._cum_departure_old = np.zeros(len(self.links))
+        self._on_link = {}
+
+    def __call__(
+        self,
+        W: uxsim.World
+    ):
+        slot = min(int(W.TIME // self.slot_duration), self.n_slots - 1)
+
+        # Link-level counters from the cumulative curves
+        n_links = len(self.links)
+        cum_arrival = np.fromiter((l.cum_arrival[-1] for l in self.links), dtype=float, count=n_links)
+        cum_departure = np.fromiter((l.cum_departure[-1] for l in self.links), dtype=float, count=n_links)
+        n_vehicles = np.fromiter((len(l.vehicles) for l in self.links), dtype=float, count=n_links)
+        self.inflow[:, slot] += cum_arrival - self._cum_arrival_old
+        self.outflow[:, slot] += cum_departure - self._cum_departure_old
+        self.vehicle_seconds[:, slot] += n_vehicles * W.DELTAN * W.DELTAT
+        self._cum_arrival_old = cum_arrival
+        self._cum_departure_old = cum_departure
+
+        # Travel times of the vehicles that left a link (either to a new link or ending the trip); as in uxsim,
+        # the trip ends at the end of the timestep
+        running = W.VEHICLES_RUNNING
+        for name in self._on_link.keys() - running.keys():
+            link_id, arrival_time = self._on_link.pop(name)
+            self._record_travel_time(link_id, W.TIME + W.DELTAT - arrival_time, slot, W.DELTAN)
+        for name, veh in running.items():
+            record = self._on_link.get(name)
+            if record is None or record[0] != veh.link.id:
+                if record is not None:
+                    self._record_travel_time(record[0], W.TIME - record[1], slot, W.DELTAN)
+                self._on_link[name] = (veh.link.id, veh.link_arrival_time)
+
+    def _record_travel_time(
+        self,
+        link_id: int,
+        travel_time: float,
+        slot: int,
+        dn: int
+    ):
+        self.tt_count[link_id, slot] += dn
+        self.tt_sum[link_id, slot] += dn * travel_time
+        self.tt_sumsq[link_id, slot] += dn * travel_time**2
+
+    def to_pandas(self) -> pd.DataFrame:
+        """
+        Emits the time-sliced table, one row per link and slot.
+
+        Returns:
+            `pd.DataFrame`: Table with columns `link`, `start_node`, `end_node`, `length`, `free_travel_time`,
+                `slot`, `t_start`, `t_end`, the raw counters (`inflow`, `outflow`, `vehicle_seconds`, `tt_count`,
+                `tt_sum`, `tt_sumsq`) and the derived `density` (veh/m) and `average_travel_time` (s, -1 if no
+                vehicle left the link in the slot).
+        """
+        n_links = len(self.links)
+        slots = np.tile(np.arange(self.n_slots), n_links)
+        df = pd.DataFrame({
+            'link': np.repeat([l.name for l in self.links], self.n_slots),
+            'start_node': np.repeat([l.start_node.name for l in self.links], self.n_slots),
+            'end_node': np.repeat([l.end_node.name for l in self.links], self.n_slots),
+            'length': np.repeat([l.length for l in self.links], self.n_slots),
+            'free_travel_time': np.repeat([l.length / l.u for l in self.links], self.n_slots),
+            'slot': slots,
+            't_start': slots * self.slot_duration,
+            't_end': (slots + 1) * self.slot_duration,
+            'inflow': self.inflow.ravel(),
+            'outflow': self.outflow.ravel(),
+            'vehicle_seconds': self.vehicle_seconds.ravel(),
+            'tt_count': self.tt_count.ravel(),
+            'tt_sum': self.tt_sum.ravel(),
+            'tt_sumsq': self.tt_sumsq.ravel(),
+        })
+        df['density'] = df['vehicle_seconds'] / (self.slot_duration * df['length'])
+        df['average_travel_time'] = np.where(df['tt_count'] > 0, df['tt_sum'] / df['tt_count'].where(df['tt_count'] > 0, 1), -1)
+        return df
+
+    def save(
+        self,
+        namefile: str
+    ):
+        """
+        Saves the time-sliced table in `{namefile}.parquet`.
+
+        Args:
+            `namefile` (`str`): Output filename, without extension.
+        """
+        self.to_pandas().to_parquet(f"{namefile}.parquet", index=False)
+
+
+class ZoneAggregator:
+    """
+    In-simulation observer of the zone metrics. Each link is mapped once to its `id_zone`, and each origin node
+    to its `AV_position`; then, as vehicles change links, it increments for each hourly slot:
+        - the inflow and outflow of the zones, by `AV_position` of the vehicle origin (table "IO"),
+        - the number of vehicles starting the trip in the zone (table "S"),
+        - the number of vehicles travelling in the zone (table "T").
+
+    The tables have the same schema of the hourly tables of `zone_metrics.compute_full_table`, and they can be
+    saved with the same filenames, so that `compute_full_table` just loads them instead of postprocessing the
+    vehicle trajectories.
+    """
+
+    def __init__(
+        self,
+        W: uxsim.World,
+        namefile_nodes: str,
+        namefile_edges: str,
+        slot_duration: int = 60*60,
+        first_hour: int = 0
+    ):
+        """
+        Args:
+            `W` (`uxsim.World`): The World, with its network already created and `tmax` set.
+            `namefile_nodes` (`str`): Filename of the nodes CSV, with columns `node_id`, `x`, `y`, `AV_position`.
+            `namefile_edges` (`str`): Filename of the edges CSV, with columns `link_id`, `u`, `v`, `length`, 
+                `maxspeed`, `lanes`, `id_zone`.
+            `slot_duration` (`int`, optional): Duration of the time slots, in seconds. Defaults to `3600`.
+            `first_hour` (`int`, optional): Hour of the day corresponding to the start of the simulation. Defaults to `0`.
+        """
+        nodes = pd.read_csv(namefile_nodes, header=None, names=['node_id', 'x', 'y', 'AV_position'], dtype={0: str})
+        links = pd.read_csv(namefile_edges, header=None, names=['link_id', 'u', 'v', 'length', 'maxspeed', 'lanes', 'id_zone'], dtype={0: str})
+
+        self.zones = np.sort(links['id_zone'].dropna().unique())
+        self.av_positions = np.sort(nodes['AV_position'].dropna().unique())
+        self.slot_duration = slot_duration
+        self.first_hour = first_hour
+        self.n_slots = math.ceil(W.TMAX / slot_duration)
+
+        # Link -> zone index and node -> AV position index (-1 if unknown)
+        zone_index = pd.Series(np.arange(len(self.zones)), index=self.zones)
+        av_index = pd.Series(np.arange(len(self.av_positions)), index=self.av_positions)
+        zone_of_link = links.set_index('link_id')['id_zone'].map(zone_index)
+        av_of_node = nodes.set_index('node_id')['AV_position'].map(av_index)
+        self._zone_of_link = np.array([zone_of_link.get(l.name, np.nan) for l in W.LINKS], dtype=float)
+        self._zone_of_link = np.nan_to_num(self._zone_of_link, nan=-1).astype(int)
+        self._av_of_node = {n.name: int(av_of_node.get(n.name)) if pd.notna(av_of_node.get(n.name)) else -1 for n in W.NODES}
+
+        # Integer counters, as the columns of the hourly tables of `zone_metrics`
+        self.inflow = np.zeros((self.n_slots, len(self.zones), len(self.av_positions)), dtype=np.int64)
+        self.outflow = np.zeros((self.n_slots, len(self.zones), len(self.av_positions)), dtype=np.int64)
+        self.starting = np.zeros((self.n_slots, len(self.zones)), dtype=np.int64)
+        self.traffic = np.zeros((self.n_slots, len(self.zones)), dtype=np.int64)
+
+        self._on_zone = {}
+
+    def __call__(
+        self,
+        W: uxsim.World
+    ):
+        slot = min(int(W.TIME // self.slot_duration), self.n_slots - 1)
+
+        running = W.VEHICLES_RUNNING
+        for name in self._on_zone.keys() - running.keys():
+            del self._on_zone[name]
+
+        for name, veh in running.items():
+            zone = self._zone_of_link[veh.link.id]
+            record = self._on_zone.get(name)
+            if record is None:
+                # First link of the trip
+                if zone >= 0:
+                    self.starting[slot, zone] += 1
+                    self.traffic[slot, zone] += 1
+                self._on_zone[name] = [veh.link.id, zone, slot, {zone}]
+                continue
+
+            if record[2] != slot:
+                # New slot, the vehicle is counted again in its current zone
+                record[2] = slot
+                record[3] = {record[1]}
+                if record[1] >= 0:
+                    self.traffic[slot, record[1]] += 1
+
+            if record[0] == veh.link.id:
+                continue
+            record[0] = veh.link.id
+            if zone < 0 or zone == record[1]:
+                continue
+
+            av = self._av_of_node.get(veh.orig.name, -1)
+            if record[1] >= 0 and av >= 0:
+                self.outflow[slot, record[1], av] += W.DELTAN
+                self.inflow[slot, zone, av] += W.DELTAN
+            record[1] = zone
+            if zone not in record[3]:
+                record[3].add(zone)
+                self.traffic[slot, zone] += 1
+
+    def hour(
+        self,
+        slot: int
+    ) -> int:
+        """
+        Returns the hour of the day corresponding to a slot (for hourly slots).
+        """
+        return (self.first_hour + slot) % 24
+
+    def to_pandas(
+        self,
+        table_type: str,
+        slot: int
+    ) -> pd.DataFrame:
+        """
+        Emits the table of a slot, in the same schema of the hourly tables of `zone_metrics`.
+
+        Args:
+            `table_type` (`str`): "IO" (inflow-outflow), "S" (starting) or "T" (traffic).
+            `slot` (`int`): Index of the slot.
+
+        Returns:
+            `pd.DataFrame`: The table of the slot, one row per zone.
+        """
+        if table_type == "IO":
+            touched = (self.inflow[slot] + self.outflow[slot]).sum(axis=0) > 0
+            av_positions = self.av_positions[touched]
+            df = pd.DataFrame({'id_zone': self.zones})
+            for col, values in (('inflow', self.inflow[slot]), ('outflow', self.outflow[slot])):
+                for i, av in enumerate(self.av_positions):
+                    if av in av_positions:
+                        df[f"{col}_from_{av}"] = values[:, i]
+            return df[(self.inflow[slot] + self.outflow[slot]).sum(axis=1) > 0].reset_index(drop=True)
+        elif table_type == "S":
+            df = pd.DataFrame({'id_zone': self.zones, 'starting_from_zone': self.starting[slot]})
+            return df[df['starting_from_zone'] > 0].reset_index(drop=True)
+        elif table_type == "T":
+            df = pd.DataFrame({'id_zone': self.zones, 'traffic_in_zone': self.traffic[slot]})
+            return df[df['traffic_in_zone'] > 0].reset_index(drop=True)
+        raise ValueError(f"Unknown table type {table_type}")
+
+    def save(
+        self,
+        table_type: str,
+        datapath: str,
+        namefile_save: str,
+        seed: int = 0
+    ):
+        """
+        Saves the table of each slot in `{datapath}/{namefile_save}_from_{hour}_to_{hour+1}_seed_{seed}.parquet`,
+        which is the per-hour file loaded by `zone_metrics.compute_full_table`.
+
+        Args:
+            `table_type` (`str`): "IO" (inflow-outflow), "S" (starting) or "T" (traffic).
+            `datapath` (`str`): Output directory.
+            `namefile_save` (`str`): Base filename of the tables, e.g. `AreaVerde_IO`.
+            `seed` (`int`, optional): Simulation seed. Defaults to `0`.
+        """
+        for slot in range(self.n_slots):
+            hour = self.hour(slot)
+            self.to_pandas(table_type, slot).to_parquet(f"{datapath}/{namefile_save}_from_{hour}_to_{hour+1}_seed_{seed}.parquet", index=False)
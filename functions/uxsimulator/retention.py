@@ -0,0 +1,313 @@
+import gc
+import os
+import resource
+import sys
+
+import pandas as pd
+import uxsim
+
+from io_utils import vprint
+
+
+VEHICLE_COLUMNS = ["name", "dn", "orig", "dest", "t", "link", "x", "s", "v", "attribute"]
+
+
+def vehicle_rows(
+    veh: uxsim.Vehicle,
+    dn: int
+) -> list:
+    """
+    Converts the log of a vehicle into the rows of the vehicle output table: one row each time the vehicle
+    changes link (or state) and one row for the last record.
+
+    Args:
+        `veh` (`uxsim.Vehicle`): The vehicle.
+        `dn` (`int`): Platoon size of the simulation.
+
+    Returns:
+        `list`: Rows with the columns in `VEHICLE_COLUMNS`.
+    """
+    rows = []
+    linkname_old = "ImpossibleName"
+    veh_dest_name = veh.dest.name if veh.dest is not None else None
+    for i in range(len(veh.log_t)):
+        if veh.log_state[i] in ("wait", "run", "end", "abort"):
+            if veh.log_link[i] != -1:
+                linkname = veh.log_link[i].name
+            else:
+                if veh.log_state[i] == "wait":
+                    linkname = "waiting_at_origin_node"
+                elif veh.log_state[i] == "abort":
+                    linkname = "trip_aborted"
+                else:
+                    linkname = "trip_end"
+            if linkname != linkname_old or i == len(veh.log_t)-1:
+                rows.append([str(veh.name), dn, veh.orig.name, veh_dest_name,
+                             veh.log_t[i], linkname, veh.log_x[i], veh.log_s[i],
+                             veh.log_v[i], veh.attribute])
+            linkname_old = linkname
+    return rows
+
+
+def save_vehicles(
+    vehicles: list,
+    dn: int,
+    namefile_output: str
+):
+    """
+    Appends the output rows of a batch of vehicles to `{namefile_output}.csv`, creating it if not yet existing.
+
+    Args:
+        `vehicles` (`list`): The vehicles to be saved.
+        `dn` (`int`): Platoon size of the simulation.
+        `namefile_output` (`str`): Output filename, without extension.
+    """
+    rows = [row for veh in vehicles for row in vehicle_rows(veh, dn)]
+    if not rows:
+        return
+    df = pd.DataFrame(rows, columns=VEHICLE_COLUMNS)
+    if not os.path.exists(f"{namefile_output}.csv"):
+        df.to_csv(f"{namefile_output}.csv", index=False)
+    else:
+        df.to_csv(f"{namefile_output}.csv", mode='a', header=False, index=False)
+
+
+def read_vehicles(
+    namefile_output: str
+) -> pd.DataFrame:
+    """
+    Reads the rows of the vehicles saved by `save_vehicles` in `{namefile_output}.csv` (an empty table if no
+    vehicle was saved), with the same columns and types as the vehicle output table.
+
+    Args:
+        `namefile_output` (`str`): Output filename, without extension.
+
+    Returns:
+        `pd.DataFrame`: Rows with the columns in `VEHICLE_COLUMNS`.
+    """
+    if not os.path.exists(f"{namefile_output}.csv"):
+        return pd.DataFrame(columns=VEHICLE_COLUMNS)
+    return pd.read_csv(f"{namefile_output}.csv", dtype={"name": str, "orig": str, "dest": str, "link": str,
+                                                        "attribute": str})
+
+
+def accumulate_trip_stats(
+    vehicles,
+    dn: int,
+    trip_stats: dict
+):
+    """
+    Accumulates the trips of a batch of vehicles in `trip_stats`, by (origin, destination) node names, as
+    `[total_trips, completed_trips, total_travel_time, total_distance_traveled]` (the quantities summed by
+    `uxsim.Analyzer.basic_analysis`, which only sees the vehicles still in the World).
+
+    Args:
+        `vehicles`: The vehicles.
+        `dn` (`int`): Platoon size of the simulation.
+        `trip_stats` (`dict`): The accumulated trips, updated in place.
+    """
+    for veh in vehicles:
+        if veh.dest is None:
+            continue
+        stats = trip_stats.setdefault((veh.orig.name, veh.dest.name), [0, 0, 0.0, 0.0])
+        stats[0] += dn
+        stats[3] += dn*veh.distance_traveled
+        if veh.travel_time != -1:
+            stats[1] += dn
+            stats[2] += dn*veh.travel_time
+
+
+def release_vehicle(
+    W: uxsim.World,
+    veh: uxsim.Vehicle
+):
+    """
+    Removes a vehicle that ended its trip from the World, and drops all the references it holds or that
+    other objects hold to it, so that the vehicle and its logs can be freed.
+
+    Args:
+        `W` (`uxsim.World`): The World.
+        `veh` (`uxsim.Vehicle`): The ended (or aborted) vehicle.
+    """
+    if veh.leader is not None and veh.leader.follower is veh:
+        veh.leader.follower = None
+    if veh.follower is not None and veh.follower.leader is veh:
+        veh.follower.leader = None
+    veh.leader = None
+    veh.follower = None
+
+    for log in (veh.log_t, veh.log_state, veh.log_link, veh.log_x, veh.log_s, veh.log_v, veh.log_lane, veh.log_t_link):
+        log.clear()
+    veh.route_pref = None
+    veh.links_prefer = []
+    veh.links_avoid = []
+    veh.specified_route = None
+    veh.route_next_link = None
+    veh.link_old = None
+    veh.node_event = {}
+
+    W.VEHICLES.pop(veh.name, None)
+
+
+def release_ended_vehicles(
+    W: uxsim.World,
+    namefile_output: str,
+    trip_stats: dict|None = None
+) -> int:
+    """
+    Persists the vehicles that ended (or aborted) their trip in `{namefile_output}.csv` and releases them.
+
+    Args:
+        `W` (`uxsim.World`): The World.
+        `namefile_output` (`str`): Output filename, without extension.
+        `trip_stats` (`dict`, optional): Trips of the released vehicles, accumulated in place before the release
+            (see `accumulate_trip_stats`). Defaults to `None`.
+
+    Returns:
+        `int`: Number of released vehicles.
+    """
+    ended = [veh for name, veh in W.VEHICLES.items() if name not in W.VEHICLES_LIVING]
+    if not ended:
+        return 0
+    save_vehicles(ended, dn=W.DELTAN, namefile_output=namefile_output)
+    if trip_stats is not None:
+        accumulate_trip_stats(ended, dn=W.DELTAN, trip_stats=trip_stats)
+    for veh in ended:
+        release_vehicle(W, veh)
+    return len(ended)
+
+
+def downsample_logs(
+    W: uxsim.World
+):
+    """
+    Downsamples the logs of the living vehicles, keeping only the records used by the vehicle output table
+    (the first record on each link, and the last record). The output of `vehicle_rows` is unchanged, but the
+    logs are truncated in place: the trajectory-based functions of uxsim (e.g. `Vehicle.get_xy_coords`, the
+    time-space diagrams and `Analyzer.vehicles_to_pandas`) are wrong afterwards. Only use it when the vehicle
+    output table is the only result needed from the vehicle logs.
+
+    Args:
+        `W` (`uxsim.World`): The World.
+    """
+    for veh in W.VEHICLES_LIVING.values():
+        n = len(veh.log_t)
+        if n < 2:
+            continue
+        keep = []
+        linkname_old = "ImpossibleName"
+        for i in range(n):
+            if veh.log_state[i] not in ("wait", "run", "end", "abort"):
+                continue
+            linkname = veh.log_link[i] if veh.log_link[i] != -1 else veh.log_state[i]
+            if linkname != linkname_old or i == n-1:
+                keep.append(i)
+            linkname_old = linkname
+        if len(keep) == n:
+            continue
+        for log in (veh.log_t, veh.log_state, veh.log_link, veh.log_x, veh.log_s, veh.log_v, veh.log_lane):
+            log[:] = [log[i] for i in keep]
+
+
+def resident_memory_mb() -> float:
+    """
+    Returns the resident memory of the process in MB (the peak resident memory if the current one is not available).
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024**2
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024**2 if sys.platform == "darwin" else peak / 1024
+
+
+class RetentionPolicy:
+    """
+    Retention policy of the vehicle logs, to be hooked into the simulation loop (as `user_function` of the World,
+    or through `uxsimulator.observers.attach`). Periodically, it:
+        - persists and fully releases the vehicles that ended their trip (as `online_save_end_vehicles`),
+          accumulating their trips for `uxsimulator.sim.print_analytics`,
+        - optionally downsamples the logs of the living vehicles to the records used in the output
+          (see `downsample_logs`, off by default since it breaks the trajectory functions of uxsim),
+        - reports the resident memory at each simulated hour.
+    The memory budget is not enforced: when it is exceeded, a garbage collection is forced after the release,
+    and nothing else is done.
+    The released vehicles are merged back into the vehicle output table by `uxsimulator.sim.save` and
+    `uxsimulator.sim.save_to_dataset` when the policy is passed to them.
+    """
+
+    def __init__(
+        self,
+        namefile_output: str|None = None,
+        release_every: int = 60*5,
+        downsample_living: bool = False,
+        max_memory_mb: float|None = None,
+        report_every: int = 60*60,
+        verbose: bool = False
+    ):
+        """
+        Args:
+            `namefile_output` (`str`, optional): Output filename of the released vehicles, without extension,
+                overwritten at the first release. Defaults to `W.meta_data["namefile_output2"]`.
+            `release_every` (`int`, optional): Simulated seconds between two releases. Defaults to `300`.
+            `downsample_living` (`bool`, optional): Whether to downsample the logs of the living vehicles at each
+                release. Defaults to `False`.
+            `max_memory_mb` (`float`, optional): Resident memory, in MB, above which a garbage collection is forced
+                after each release. It is not a limit. Defaults to `None`.
+            `report_every` (`int`, optional): Simulated seconds between two memory reports. Defaults to `3600`.
+            `verbose` (`bool`, optional): Whether to print the memory reports. Defaults to `False`.
+        """
+        self.namefile_output = namefile_output
+        self.release_every = release_every
+        self.downsample_living = downsample_living
+        self.max_memory_mb = max_memory_mb
+        self.report_every = report_every
+        self.verbose = verbose
+        self.released = 0
+        self.trip_stats = {}
+        self.memory_report = []
+        self._last_release = -1
+        self._last_report = -1
+
+    def __call__(
+        self,
+        W: uxsim.World
+    ):
+        release_slot = int(W.TIME // self.release_every)
+        if release_slot != self._last_release:
+            if self.namefile_output is None:
+                self.namefile_output = W.meta_data["namefile_output2"]
+            if self._last_release == -1 and os.path.exists(f"{self.namefile_output}.csv"):
+                # Released vehicles of a previous run
+                os.remove(f"{self.namefile_output}.csv")
+            self._last_release = release_slot
+            self.released += release_ended_vehicles(W, namefile_output=self.namefile_output, trip_stats=self.trip_stats)
+            if self.downsample_living:
+                downsample_logs(W)
+
+            if self.max_memory_mb is not None and resident_memory_mb() > self.max_memory_mb:
+                gc.collect()
+
+        report_slot = int(W.TIME // self.report_every)
+        if report_slot != self._last_report:
+            self._last_report = report_slot
+            memory = resident_memory_mb()
+            self.memory_report.append({'t': W.TIME, 'resident_memory_mb': memory,
+                                       'vehicles': len(W.VEHICLES), 'living_vehicles': len(W.VEHICLES_LIVING),
+                                       'released_vehicles': self.released})
+            vprint(text=f"t = {W.TIME} s -- resident memory {memory:.0f} MB, {len(W.VEHICLES_LIVING)} living vehicles, "
+                   f"{self.released} released vehicles", verbose=self.verbose)
+
+    def released_vehicles(self) -> pd.DataFrame:
+        """
+        Returns the rows of the released vehicles, as in the vehicle output table.
+        """
+        if self.namefile_output is None:
+            return pd.DataFrame(columns=VEHICLE_COLUMNS)
+        return read_vehicles(self.namefile_output)
+
+    def report(self) -> pd.DataFrame:
+        """
+        Returns the memory report, one row per simulated hour.
+        """
+        return pd.DataFrame(self.memory_report, columns=['t', 'resident_memory_mb', 'vehicles', 'living_vehicles', 'released_vehicles'])
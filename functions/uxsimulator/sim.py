@@ -1,13 +1,21 @@
 import uxsim
 import pandas as pd
 import numpy as np
-import os
-import gc
-import objgraph
+import json
 import inspect
+import os
+import functools
+import collections
+import time
+import warnings
+from scipy import sparse
+from scipy.sparse import csgraph
 
 from uxsim.ResultGUIViewer import ResultGUIViewer
 import uxsimulator.analysis.utils
+import uxsimulator.dataset
+import uxsimulator.retention
+from uxsimulator.observers import LinkAggregator
 from io_utils import vprint
 
 
@@ -35,19 +43,124 @@ def create_static_scenario(
             meta_data={"namefile_output1": namefile_output_edges, "namefile_output2": namefile_output_zones},
     )
 
+    network = load_network_template(namefile_nodes=namefile_nodes, namefile_edges=namefile_edges)
+
     vprint(text="Generating nodes", verbose=verbose)
-    with open(namefile_nodes) as f:
-        for r in uxsim.csv.reader(f):
-            W.addNode(name=r[0], x=float(r[1]), y=float(r[2]))
+    for name, x, y in network["nodes"]:
+        W.addNode(name=name, x=x, y=y)
 
     vprint(text='Generating links', verbose=verbose)
-    with open(namefile_edges) as f:
-        for r in uxsim.csv.reader(f):
-            W.addLink(r[0], r[1], r[2], length=float(r[3]), free_flow_speed=float(r[4]), number_of_lanes=int(float(r[5])))
+    for name, start_node, end_node, length, free_flow_speed, number_of_lanes in network["links"]:
+        W.addLink(name, start_node, end_node, length=length, free_flow_speed=free_flow_speed, number_of_lanes=number_of_lanes)
 
     return W
 
 
+def load_network_template(
+    namefile_nodes: str,
+    namefile_edges: str
+) -> dict:
+    """
+    Returns the road network template used by `create_static_scenario`. The node and edge files are parsed only
+    once per process (and again only if they are modified), so that building the World of each seed and hour
+    does not read and convert the files anymore.
+
+    Args:
+        `namefile_nodes` (`str`): Path of the nodes file (columns: node_id, x, y, AV_position; no header).
+        `namefile_edges` (`str`): Path of the edges file (columns: link_id, u, v, length, maxspeed, lanes, ...; no header).
+
+    Returns:
+        `dict`: The template, with keys
+            - `nodes`: list of `(name, x, y)` tuples,
+            - `links`: list of `(name, start_node, end_node, length, free_flow_speed, number_of_lanes)` tuples.
+    """
+    return _read_network_template(namefile_nodes, namefile_edges,
+                                  os.path.getmtime(namefile_nodes), os.path.getmtime(namefile_edges))
+
+
+@functools.lru_cache(maxsize=4)
+def _read_network_template(
+    namefile_nodes: str,
+    namefile_edges: str,
+    mtime_nodes: float,
+    mtime_edges: float
+) -> dict:
+    nodes = pd.read_csv(namefile_nodes, header=None, usecols=[0, 1, 2], dtype={0: str, 1: float, 2: float},
+                        keep_default_na=False, float_precision="round_trip")
+    edges = pd.read_csv(namefile_edges, header=None, usecols=[0, 1, 2, 3, 4, 5],
+                        dtype={0: str, 1: str, 2: str, 3: float, 4: float, 5: float},
+                        keep_default_na=False, float_precision="round_trip")
+
+    return {
+        "nodes": list(zip(nodes[0], nodes[1].tolist(), nodes[2].tolist())),
+        "links": list(zip(edges[0], edges[1], edges[2], edges[3].tolist(), edges[4].tolist(),
+                          edges[5].astype(int).tolist())),
+    }
+
+
+# The scenario functions use the development version of uxsim (`requirements.txt`), whose
+# `adddemand_area2area2` accepts `auto_rename_vehicles`: `finalize_scenario` reproduces its `World.finalize_scenario`
+UXSIM_DEVELOPMENT = "auto_rename_vehicles" in inspect.signature(uxsim.World.adddemand_area2area2).parameters
+
+
+def finalize_scenario(
+    W: uxsim.World
+):
+    """
+    Finalizes the scenario as `W.finalize_scenario()`, but builds the adjacency matrices of the network with an
+    index of the nodes instead of scanning all the nodes for each link, which dominates the setup time on large
+    networks. Called by `execute` before the simulation starts.
+
+    The steps of `World.finalize_scenario` of the uxsim version pinned in `requirements.txt` are run directly:
+    with another version of uxsim (`UXSIM_DEVELOPMENT` false), `W.finalize_scenario()` is called instead.
+
+    Args:
+        `W` (`uxsim.World`): The World, with nodes, links and demand already added.
+    """
+    if not UXSIM_DEVELOPMENT:
+        warnings.warn(f"uxsim {uxsim.__version__} is not the version in requirements.txt: using the original World.finalize_scenario")
+        W.finalize_scenario()
+        return
+
+    if W.TMAX is None:
+        tmax = max([veh.departure_time*W.DELTAT for veh in W.VEHICLES.values()], default=0)
+        W.TMAX = (tmax//1800+2)*1800
+    W.T = 0
+    W.TIME = 0
+    W.TSIZE = int(W.TMAX/W.DELTAT)
+    W.Q_AREA = collections.defaultdict(lambda: np.zeros(int(W.TMAX/W.EULAR_DT)))
+    W.K_AREA = collections.defaultdict(lambda: np.zeros(int(W.TMAX/W.EULAR_DT)))
+    for link in W.LINKS:
+        link.init_after_tmax_fix()
+
+    W.ROUTECHOICE = uxsim.RouteChoice(W)
+    W.ADJ_MAT = np.zeros([len(W.NODES), len(W.NODES)])
+    W.ADJ_MAT_LINKS = dict()
+    W.NODE_PAIR_LINKS = dict()
+    node_index = {id(node): i for i, node in enumerate(W.NODES)}
+    for link in W.LINKS:
+        i, j = node_index[id(link.start_node)], node_index[id(link.end_node)]
+        W.ADJ_MAT[i, j] = 1
+        W.ADJ_MAT_LINKS[i, j] = link
+        W.NODE_PAIR_LINKS[link.start_node.name, link.end_node.name] = link
+
+    if W.adjust_node_capacity:
+        for node in W.NODES:
+            node.adjust_node_capacity()
+
+    demand_actual = len(W.VEHICLES)*W.DELTAN
+    if demand_actual < W.demand_total_given*0.8:
+        warnings.warn(f"The actual demand generated for the simulation is {demand_actual:.0f} veh, although the "
+                      f"intended demand is {W.demand_total_given:.0f} veh (demand smaller than `deltan` is ignored)")
+
+    W.analyzer = uxsim.Analyzer(W)
+    W.finalized = 1
+    if W.print_mode:
+        W.print_scenario_stats()
+    W.sim_start_time = time.time()
+    W.print("simulating...")
+
+
 def add_hourly_demand_to_scenario(
     W: uxsim.World,
     namefile_demand_list: list[str],
@@ -198,12 +311,138 @@ def add_hourly_remaining_demand_to_scenario(
     return W
 
 
+def save_snapshot(
+    W: uxsim.World,
+    name_iter: str,
+    namefile_snapshot: str,
+    verbose: bool = False
+):
+    """
+    Saves a binary snapshot of the vehicles still living in the World (not yet departed, waiting at
+    the origin node or running on a link), so that the next hour can be warm-started from it.
+
+    Vehicles are stored already in re-insertion order: running vehicles first, sorted by their position
+    on the link (the furthest first), then the vehicles waiting at the origin node in their queue order,
+    and finally the vehicles not yet departed, sorted by departure time.
+
+    Args:
+        `W` (`uxsim.World`): The simulated World.
+        `name_iter` (`str`): Identifier of the iteration, e.g. `from_8_to_9_seed_0`.
+        `namefile_snapshot` (`str`): Base filename of the snapshot (`.npz`) file.
+        `verbose` (`bool`, optional): Whether to print progress messages. Defaults to `False`.
+    """
+    vprint(text=f"Saving snapshot of living vehicles in {namefile_snapshot}_{name_iter}.npz", verbose=verbose)
+
+    queue_position = {}
+    for node in W.NODES:
+        for i, veh in enumerate(node.generation_queue):
+            queue_position[veh.name] = i
+
+    rows = []
+    for veh in W.VEHICLES_LIVING.values():
+        if veh.state == "run":
+            sort_key = (0, -veh.x)
+            link_name = veh.link.name
+            orig_name = veh.link.start_node.name
+        elif veh.state == "wait":
+            sort_key = (1, queue_position.get(veh.name, 0))
+            link_name = ""
+            orig_name = veh.orig.name
+        else:
+            sort_key = (2, veh.departure_time)
+            link_name = ""
+            orig_name = veh.orig.name
+        departure_delay = max(0., veh.departure_time*W.DELTAT - W.TIME) if veh.state == "home" else 0.
+        rows.append((sort_key, str(veh.name), orig_name, veh.dest.name if veh.dest is not None else "", 
+                     veh.state, link_name, departure_delay, json.dumps(veh.attribute, default=str)))
+    rows.sort(key=lambda row: row[0])
+
+    columns = list(zip(*[row[1:] for row in rows])) if rows else [[]] * 7
+    np.savez(
+        f"{namefile_snapshot}_{name_iter}.npz",
+        name=np.array(columns[0], dtype=str),
+        orig=np.array(columns[1], dtype=str),
+        dest=np.array(columns[2], dtype=str),
+        state=np.array(columns[3], dtype=str),
+        link=np.array(columns[4], dtype=str),
+        departure_delay=np.array(columns[5], dtype=float),
+        attribute=np.array(columns[6], dtype=str),
+    )
+
+
+def add_snapshot_demand_to_scenario(
+    W: uxsim.World,
+    name_iter: str,
+    namefile_snapshot: str,
+    verbose: bool = False
+):
+    """
+    Warm-starts the World with the vehicles stored by `save_snapshot` at the end of the previous hour.
+
+    Vehicles that were running re-enter from the start node of the link they were travelling on (from the
+    start of the link, their position on it is not kept), and they are forced to take that same link first,
+    then choose their route freely; vehicles waiting at the origin node are re-queued there; not
+    yet departed vehicles keep their residual departure time. The original attributes are kept and the
+    `added_prev_hour`/`prev_name` attributes are updated as in `add_hourly_remaining_demand_to_scenario`.
+
+    Args:
+        `W` (`uxsim.World`): The World to be warm-started.
+        `name_iter` (`str`): Identifier of the previous iteration, e.g. `from_7_to_8_seed_0`.
+        `namefile_snapshot` (`str`): Base filename of the snapshot (`.npz`) file.
+        `verbose` (`bool`, optional): Whether to print progress messages. Defaults to `False`.
+
+    Returns:
+        `uxsim.World`: The World with the additional vehicles.
+    """
+    vprint(text='Add previous remaining demand from snapshot', verbose=verbose)
+
+    with np.load(f"{namefile_snapshot}_{name_iter}.npz", allow_pickle=False) as snapshot:
+        snapshot = {key: snapshot[key] for key in snapshot.files}
+
+    # In case all trips were completed, return the scenario
+    if snapshot['name'].shape[0] == 0:
+        return W
+
+    vprint(text=f"There are {snapshot['name'].shape[0]} not-completed trips added", verbose=verbose)
+
+    for name, orig, dest, state, link, departure_delay, attribute in zip(
+        snapshot['name'], snapshot['orig'], snapshot['dest'], snapshot['state'], 
+        snapshot['link'], snapshot['departure_delay'], snapshot['attribute']
+    ):
+        attribute = json.loads(attribute)
+        attribute = {**attribute, "added_prev_hour": True, "prev_name": str(name)} if isinstance(attribute, dict) \
+            else {"added_prev_hour": True, "prev_name": str(name)}
+        if state == "run":
+            # At the origin node, the preferred links restrict the choice of the first link
+            W.addVehicle(orig=str(orig), dest=str(dest), departure_time=float(departure_delay),
+                        name=str(name), attribute=attribute, links_prefer=[str(link)],
+                        user_function=_release_first_link, direct_call=False, auto_rename=True)
+        else:
+            W.addVehicle(orig=str(orig), dest=str(dest), departure_time=float(departure_delay),
+                        name=str(name), attribute=attribute, direct_call=False, auto_rename=True)
+    return W
+
+
+def _release_first_link(
+    veh: uxsim.Vehicle
+):
+    """
+    Vehicle `user_function` of the vehicles warm-started on a link: once they entered the link, the link is no
+    longer preferred for the rest of the trip.
+    """
+    if veh.state != "home" and veh.state != "wait":
+        veh.links_prefer = []
+        veh.user_function = None
+
+
 def execute(
     W: uxsim.World,
     duration: int|None = None,
     verbose: bool = False
 ):
     vprint(text="------------------------ Simulation ------------------------", verbose=verbose)
+    if not W.finalized:
+        finalize_scenario(W)
     W.exec_simulation(duration_t2=duration)
 
     return W
@@ -215,154 +454,171 @@ def save(
     namefile_edges: str|None = None,
     namefile_zones: str|None = None,
     save_completed: bool = False,
+    link_aggregator: LinkAggregator|None = None,
+    retention_policy: uxsimulator.retention.RetentionPolicy|None = None,
     verbose: bool = False
 
 ):
     vprint(text='------------------------- Saving -------------------------', verbose=verbose)
     if namefile_edges is not None:
-        vprint(text=f"Saving relevant results -- traffic in {namefile_edges}_{name_iter}.parquet", verbose=verbose)
-        df = W.analyzer.link_to_pandas()
-        df.to_parquet(f"{namefile_edges}_{name_iter}.parquet", index=False)
-        del df
+        if link_aggregator is not None:
+            # Time-sliced link table accumulated during the simulation, with its own schema (see
+            # `edge_metrics.link_table_from_slots`)
+            vprint(text=f"Saving relevant results -- traffic in {namefile_edges}_slots_{name_iter}.parquet", verbose=verbose)
+            link_aggregator.save(f"{namefile_edges}_slots_{name_iter}")
+        else:
+            vprint(text=f"Saving relevant results -- traffic in {namefile_edges}_{name_iter}.parquet", verbose=verbose)
+            df = W.analyzer.link_to_pandas()
+            df.to_parquet(f"{namefile_edges}_{name_iter}.parquet", index=False)
+            del df
 
     if namefile_zones is not None:
         vprint(text=f"Saving relevant results -- vehicles in {namefile_zones}_{name_iter}.parquet", verbose=verbose)
 
-        out = [["name", "dn", "orig", "dest", "t", "link", "x", "s", "v", "attribute"]]
-        for veh in W.VEHICLES.values():
-            if save_completed and veh in W.VEHICLES_LIVING.values():
-                next
-            linkname_old = "ImpossibleName"
-            for i in range(len(veh.log_t)):
-                if veh.log_state[i] in ("wait", "run", "end", "abort"):
-                    if veh.log_link[i] != -1:
-                        linkname = veh.log_link[i].name
-                    else:
-                        if veh.log_state[i] == "wait":
-                            linkname = "waiting_at_origin_node"
-                        elif veh.log_state[i] == "abort":
-                            linkname = "trip_aborted"
-                        else:
-                            linkname = "trip_end"
-                    veh_dest_name = None
-                    if veh.dest != None:
-                        veh_dest_name = veh.dest.name
-                    if linkname != linkname_old or i == len(veh.log_t)-1:
-                        out.append([str(veh.name), W.DELTAN, veh.orig.name, veh_dest_name, 
-                                    veh.log_t[i], linkname, veh.log_x[i], veh.log_s[i], 
-                                    veh.log_v[i], veh.attribute])
-                    linkname_old = linkname
-        df = pd.DataFrame(out[1:], columns=out[0])
+        df = _vehicles_to_pandas(W, save_completed=save_completed, retention_policy=retention_policy)
         df.to_parquet(f"{namefile_zones}_{name_iter}.parquet", index=False)
         del df
 
-        # # Find a Vehicle object that should be deleted  # FIXME (araiari): debug only
-        # sample_vehicle = next((v for k, v in W.VEHICLES.items() if k not in W.VEHICLES_LIVING), None)
-
-        # if sample_vehicle:
-        #     # Get its ID and key for reference
-        #     vehicle_id = id(sample_vehicle)
-        #     vehicle_key = next(k for k, v in W.VEHICLES.items() if id(v) == vehicle_id)
-            
-        #     print(f"Checking references to Vehicle {vehicle_key} (id: {vehicle_id})")
-            
-        #     # Show what's referencing this object BEFORE deletion
-        #     print("References before deletion:")
-        #     objgraph.show_backrefs([sample_vehicle], filename='references_before.png', max_depth=5)
-            
-        #     remove_keys = [i for i in W.VEHICLES.keys() if i not in W.VEHICLES_LIVING.keys()]
-        #     for key in remove_keys:
-        #         del W.VEHICLES[key] 
-        #     W.VEHICLES = W.VEHICLES_LIVING.copy()
-        #     gc.collect()    
-        #     vprint(text=f"Indeed now the vehicles in the world are {len(W.VEHICLES.values())}", verbose=verbose)
-        
-        #     # Find the object again if it still exists
-        #     for obj in gc.get_objects():
-        #         if id(obj) == vehicle_id:
-        #             print(f"Vehicle {vehicle_key} still exists after deletion")
-                    
-        #             # Show what's referencing this object AFTER deletion
-        #             print("References after deletion:")
-        #             objgraph.show_backrefs([obj], filename='references_after.png', max_depth=5)
-                    
-        #             # Get a more detailed count of referrers
-        #             print("\nObjects referencing this vehicle:")
-        #             for referrer in gc.get_referrers(obj):
-        #                 # Try to describe the referrer
-        #                 if hasattr(referrer, '__class__'):
-        #                     referrer_type = referrer.__class__.__name__
-        #                 else:
-        #                     referrer_type = type(referrer).__name__
-                        
-        #                 # If it's a dictionary, try to find which one
-        #                 if isinstance(referrer, dict):
-        #                     # Try to identify the dictionary
-        #                     container_info = "unknown dictionary"
-        #                     for name, value in globals().items():
-        #                         if value is referrer:
-        #                             container_info = f"global dict '{name}'"
-        #                             break
-                            
-        #                     # Attempt to find the key for our vehicle
-        #                     for k, v in referrer.items():
-        #                         if v is obj:
-        #                             container_info += f" with key '{k}'"
-        #                             break
-                                    
-        #                     print(f" - {referrer_type}: {container_info}")
-                            
-        #                 # Add this where you're printing the referrers
-        #                 elif isinstance(referrer, list):
-        #                     print(f" - list with {len(referrer)} items")
-
-        #                     print(referrer[164710])
-                            
-        #                     # Try to identify the list
-        #                     for name, value in globals().items():
-        #                         if value is referrer:
-        #                             print(f"   This appears to be the global list named '{name}'")
-                            
-        #                     # Print position of our vehicle in the list
-        #                     for i, item in enumerate(referrer):
-        #                         if item is obj:
-        #                             print(f"   Vehicle found at position {i}")
-                                    
-        #                     # Check if this list belongs to another object
-        #                     for container in gc.get_objects():
-        #                         for attr_name in dir(container):
-        #                             try:
-        #                                 if getattr(container, attr_name) is referrer:
-        #                                     print(f"   This list belongs to a {type(container).__name__} object as .{attr_name}")
-        #                                     break
-        #                             except:
-        #                                 pass
-        #                 else:
-        #                     print(f" - {referrer_type}")
-                    
-        #             break
-        #     else:
-        #         print(f"Vehicle {vehicle_key} was successfully deleted")                                            
-
-        '''
-        # Delete complete vehicles
-        if delete_ended:
-            vprint(text=f"{len_living} vehicles are kept among the total {len_all} vehicles", verbose=verbose)
-            for key in W.VEHICLES.keys():
-                if key not in W.VEHICLES_LIVING.keys():
-                    del W.VEHICLES[key] 
-            W.VEHICLES = W.VEHICLES_LIVING.copy()
-            gc.collect()    
-            vprint(text=f"Indeed now the vehicles in the world are {len(W.VEHICLES.values())}", verbose=verbose)
-        '''
+
+def _vehicles_to_pandas(
+    W: uxsim.World,
+    save_completed: bool = False,
+    retention_policy: uxsimulator.retention.RetentionPolicy|None = None
+) -> pd.DataFrame:
+    """
+    Returns the vehicle output table (see `uxsimulator.retention.vehicle_rows`) of the vehicles of the World,
+    preceded by the rows of the vehicles released by `retention_policy`, if given.
+    """
+    out = []
+    for veh in W.VEHICLES.values():
+        if save_completed and veh in W.VEHICLES_LIVING.values():
+            next
+        out += uxsimulator.retention.vehicle_rows(veh, dn=W.DELTAN)
+    df = pd.DataFrame(out, columns=uxsimulator.retention.VEHICLE_COLUMNS)
+    if retention_policy is not None and retention_policy.released:
+        released = retention_policy.released_vehicles()
+        # The attributes of the released vehicles are read back as written in the CSV file
+        df['attribute'] = df['attribute'].map(lambda attribute: None if attribute is None else str(attribute))
+        df = pd.concat([released, df], ignore_index=True) if len(df) else released
+    return df
+
+
+def save_to_dataset(
+    W: uxsim.World,
+    dataset: str,
+    run: str,
+    seed: int,
+    hour: int,
+    config = None,
+    save_edges: bool = True,
+    save_zones: bool = True,
+    save_completed: bool = False,
+    link_aggregator: LinkAggregator|None = None,
+    retention_policy: uxsimulator.retention.RetentionPolicy|None = None,
+    verbose: bool = False
+):
+    """
+    Saves the results of the simulation of an (hour, seed) pair as the "links" (or, with a `link_aggregator`,
+    "link_slots") and "vehicles" partitions of the partitioned dataset at `dataset` (see `uxsimulator.dataset`),
+    with their catalog entries.
+
+    Args:
+        `W` (`uxsim.World`): The simulated World.
+        `dataset` (`str`): Root directory of the dataset.
+        `run` (`str`): Name of the run, e.g. `single_hours_v7`.
+        `seed` (`int`): Simulation seed.
+        `hour` (`int`): Simulated hour.
+        `config` (optional): JSON-serializable configuration of the simulation, whose hash is recorded in the
+            catalog. Defaults to `None`.
+        `save_edges` (`bool`, optional): Whether to save the link table. Defaults to `True`.
+        `save_zones` (`bool`, optional): Whether to save the vehicle table. Defaults to `True`.
+        `save_completed` (`bool`, optional): As in `save`. Defaults to `False`.
+        `link_aggregator` (`LinkAggregator`, optional): Time-sliced link table accumulated during the
+            simulation, saved as the "link_slots" table instead of the link table of the analyzer. Defaults to `None`.
+        `retention_policy` (`RetentionPolicy`, optional): Retention policy attached to the World, whose released
+            vehicles are saved with the vehicles still in the World. Defaults to `None`.
+        `verbose` (`bool`, optional): Whether to print progress messages. Defaults to `False`.
+    """
+    vprint(text=f"------------------------- Saving in {dataset}, run {run} -------------------------", verbose=verbose)
+    if save_edges:
+        if link_aggregator is not None:
+            df = link_aggregator.to_pandas()
+            uxsimulator.dataset.write_partition(df, dataset, "link_slots", run=run, seed=seed, hour=hour, config=config)
+        else:
+            df = W.analyzer.link_to_pandas()
+            uxsimulator.dataset.write_partition(df, dataset, "links", run=run, seed=seed, hour=hour, config=config)
+        del df
+    if save_zones:
+        df = _vehicles_to_pandas(W, save_completed=save_completed, retention_policy=retention_policy)
+        uxsimulator.dataset.write_partition(df, dataset, "vehicles", run=run, seed=seed, hour=hour, config=config)
+        del df
+
 
 def print_analytics(
     W: uxsim.World,
+    retention_policy: uxsimulator.retention.RetentionPolicy|None = None,
     verbose: bool = False
 ):
+    """
+    Prints the basic statistics of the simulation (as `uxsim.Analyzer.print_simple_stats`). When a retention
+    policy released vehicles during the simulation, the trips are those accumulated by the policy before the
+    release plus those of the vehicles still in the World, since the analyzer only sees the latter.
+
+    Args:
+        `W` (`uxsim.World`): The simulated World.
+        `retention_policy` (`RetentionPolicy`, optional): Retention policy attached to the World. Defaults to `None`.
+        `verbose` (`bool`, optional): Whether to print the statistics. Defaults to `False`.
+    """
     if verbose:
         vprint("------------------------- Analysis -------------------------", verbose=verbose)
-        W.analyzer.print_simple_stats()
+        if retention_policy is None or not retention_policy.released:
+            W.analyzer.print_simple_stats()
+            return
+
+        df = _trip_stats(W, retention_policy)
+        completed = df['completed_trips'].sum()
+        total_distance_traveled = df['total_distance_traveled'].sum()
+        vprint(text="results:", verbose=verbose)
+        vprint(text=f" average speed:\t {W.analyzer.average_speed:.1f} m/s", verbose=verbose)
+        vprint(text=f" number of completed trips:\t {completed} / {df['total_trips'].sum()}", verbose=verbose)
+        if completed > 0:
+            total_travel_time = df['total_travel_time'].sum()
+            df = df[df['completed_trips'] > 0]
+            average_delay = (df['total_travel_time'] - df['completed_trips']*df['free_travel_time']).sum()/completed
+            vprint(text=f" total travel time:\t\t {total_travel_time:.1f} s", verbose=verbose)
+            vprint(text=f" average travel time of trips:\t {total_travel_time/completed:.1f} s", verbose=verbose)
+            vprint(text=f" average delay of trips:\t {average_delay:.1f} s", verbose=verbose)
+            vprint(text=f" delay ratio:\t\t\t {average_delay/(total_travel_time/completed):.3f}", verbose=verbose)
+        vprint(text=f" total distance traveled:\t {total_distance_traveled:.1f} m", verbose=verbose)
+
+
+def _trip_stats(
+    W: uxsim.World,
+    retention_policy: uxsimulator.retention.RetentionPolicy
+) -> pd.DataFrame:
+    """
+    Returns the trips by (origin, destination) of the vehicles released by `retention_policy` and of the vehicles
+    still in the World (see `uxsimulator.retention.accumulate_trip_stats`), with the free-flow travel time.
+    """
+    trip_stats = {od: list(stats) for od, stats in retention_policy.trip_stats.items()}
+    uxsimulator.retention.accumulate_trip_stats(W.VEHICLES.values(), dn=W.DELTAN, trip_stats=trip_stats)
+    df = pd.DataFrame([[orig, dest, *stats] for (orig, dest), stats in trip_stats.items()],
+                      columns=['orig', 'dest', 'total_trips', 'completed_trips', 'total_travel_time', 'total_distance_traveled'])
+
+    # Free-flow travel times between the nodes, as in `uxsim.Analyzer.od_analysis`
+    links = pd.DataFrame({
+        'u': [link.start_node.id for link in W.LINKS],
+        'v': [link.end_node.id for link in W.LINKS],
+        'free_travel_time': [link.length/link.u for link in W.LINKS],
+    }).groupby(['u', 'v'], as_index=False)['free_travel_time'].min()
+    adj_mat_time = sparse.csr_matrix((links['free_travel_time'], (links['u'], links['v'])), shape=(len(W.NODES), len(W.NODES)))
+    node_ids = {node.name: node.id for node in W.NODES}
+    orig = df['orig'].map(node_ids).to_numpy()
+    dest = df['dest'].map(node_ids).to_numpy()
+    origins = np.unique(orig)
+    dist_time = csgraph.dijkstra(adj_mat_time, directed=True, indices=origins)
+    df['free_travel_time'] = dist_time[np.searchsorted(origins, orig), dest]
+    return df
 
 
 def visualize(
@@ -376,55 +632,5 @@ def visualize(
 def online_save_end_vehicles(
     W: uxsim.World
 ):
-    namefile_output = W.meta_data["namefile_output2"]
-    vehicles_to_remove = []
-
-    # If the vehicle concluded the trip, save the vehicle data and store its name
-    for veh in W.VEHICLES.values():       
-        i_last = len(veh.log_t) - 1 
-        if veh.log_state[i_last] == "end" and veh.log_link[i_last] == -1: #WHY??
-            _save_single_veh(veh, dn=W.DELTAN, namefile_output=namefile_output)
-            vehicles_to_remove.append(veh.name)
-    
-    # Delete complete vehicles
-    for veh_name in vehicles_to_remove:
-        del W.VEHICLES[veh_name]
-    if vehicles_to_remove:
-        gc.collect()
-
-
-def _save_single_veh(
-    veh: uxsim.Vehicle, 
-    dn: int, 
-    namefile_output: str
-):
-    # Iterates over the vehicle status to process and store them
-    out = [["name", "dn", "orig", "dest", "t", "link", "x", "s", "v", "attribute"]]
-    linkname_old = "ImpossibleName"
-    for i in range(len(veh.log_t)):
-        if veh.log_state[i] in ("wait", "run", "end", "abort"):
-            if veh.log_link[i] != -1:
-                linkname = veh.log_link[i].name
-            else:
-                if veh.log_state[i] == "wait":
-                    linkname = "waiting_at_origin_node"
-                elif veh.log_state[i] == "abort":
-                    linkname = "trip_aborted"
-                else:
-                    linkname = "trip_end"
-            veh_dest_name = None
-            if veh.dest != None:
-                veh_dest_name = veh.dest.name
-            if linkname != linkname_old or i == len(veh.log_t)-1:
-                out.append([veh.name, dn, veh.orig.name, veh_dest_name, 
-                            veh.log_t[i], linkname, veh.log_x[i], veh.log_s[i], 
-                            veh.log_v[i], veh.attribute])
-            linkname_old = linkname
-    df = pd.DataFrame(out[1:], columns=out[0])
-
-    # Create a new file if not yet existing
-    if not os.path.exists(f"{namefile_output}.csv"):
-        df.to_csv(f"{namefile_output}.csv", index=False)
-    else:
-        # Append to the file otherwise
-        df.to_csv(f"{namefile_output}.csv", mode='a', header=False, index=False)
+    # If the vehicle concluded the trip, save the vehicle data and release the vehicle
+    uxsimulator.retention.release_ended_vehicles(W, namefile_output=W.meta_data["namefile_output2"])